@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+ai-fastapi 오프라인 벤치마크
+
+실제 체크포인트나 실행 중인 서버 없이, 합성 이미지와 결정적 스텁 모델로
+파이프라인의 CPU 구간(디코딩 / 마스킹 크롭 / 인코딩 / 마스크 RLE·다각형 / NMS / 신발 그룹화 / /analyze-all 전체 흐름)을 측정합니다.
+스텁 모델은 즉시 결과를 돌려주므로 /analyze-all 수치는 모델 추론을 제외한 서버 자체 오버헤드입니다.
+
+사용법:
+    python benchmark.py --save-baseline          # 변경 전: 기준값 저장
+    python benchmark.py                          # 변경 후: 기준값과 비교 리포트 출력
+    python benchmark.py --filter nms --repeat 50 # 일부 항목만, 반복 횟수 지정
+
+기준값은 실행한 머신에 종속적이므로 같은 머신에서 변경 전/후를 비교하세요.
+측정 전에 후처리 결과 검증(postprocess_checks)을 실행하며, 실패하면 종료 코드 1을 반환합니다.
+디코딩 / 마스크 / 후처리 항목은 NumPy / OpenCV / Pillow만 있으면 실행되고,
+/analyze-all 항목은 서버 의존성(fastapi, torch 등)이 설치되어 있을 때만 측정합니다.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+
+# GPU가 있어도 CPU 수치만 측정 (torch import 전에 설정해야 함)
+os.environ["CUDA_VISIBLE_DEVICES"] = ""
+# 단일 요청 측정에서 micro-batch 대기 시간(기본 5ms)이 섞이지 않도록
+os.environ.setdefault("YOLO_BATCH_WINDOW_MS", "0")
+
+import cv2
+import numpy as np
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+# (가로, 세로): 작은 업로드 / 일반 / 휴대폰 원본(12MP)
+RESOLUTIONS = [(640, 480), (1280, 960), (3024, 4032)]
+ITEM_COUNTS = [1, 3, 8]
+DETECTION_COUNTS = [8, 32, 128]
+
+
+# ----------------------------------------------------------------------
+# 합성 데이터
+# ----------------------------------------------------------------------
+def make_scene(width: int, height: int, items: int, seed: int = 0):
+    """
+    아이템 items개가 있는 합성 사진 (그라디언트 배경 + 노이즈 + 타원/사각형 아이템)
+    Returns:
+        tuple: (BGR 이미지, 아이템 박스 리스트 [x1, y1, x2, y2])
+    """
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(40, 220, width, dtype=np.float32)[None, :, None]
+    image = np.repeat(np.repeat(gradient, height, axis=0), 3, axis=2)
+    image += rng.normal(0, 12, size=image.shape).astype(np.float32)
+    image = np.clip(image, 0, 255).astype(np.uint8)
+
+    boxes = []
+    # 아이템을 격자에 배치 (겹치지 않게)
+    cols = int(np.ceil(np.sqrt(items)))
+    rows = int(np.ceil(items / cols))
+    cell_w, cell_h = width // cols, height // rows
+    for i in range(items):
+        cx, cy = (i % cols) * cell_w, (i // cols) * cell_h
+        x1 = cx + int(cell_w * rng.uniform(0.05, 0.2))
+        y1 = cy + int(cell_h * rng.uniform(0.05, 0.2))
+        x2 = cx + int(cell_w * rng.uniform(0.8, 0.95))
+        y2 = cy + int(cell_h * rng.uniform(0.8, 0.95))
+        color = tuple(int(c) for c in rng.integers(0, 256, size=3))
+        if i % 2:
+            cv2.rectangle(image, (x1, y1), (x2, y2), color, thickness=-1)
+        else:
+            center = ((x1 + x2) // 2, (y1 + y2) // 2)
+            cv2.ellipse(image, center, ((x2 - x1) // 2, (y2 - y1) // 2), 0, 0, 360, color, thickness=-1)
+        boxes.append([x1, y1, x2, y2])
+    return image, boxes
+
+
+def encode_jpeg(image: np.ndarray, quality: int = 90) -> bytes:
+    ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes()
+
+
+def ellipse_mask(height: int, width: int) -> np.ndarray:
+    """박스 크기의 타원 bool 마스크 (SAM2 마스크 대용)"""
+    mask = np.zeros((height, width), dtype=np.uint8)
+    cv2.ellipse(mask, (width // 2, height // 2), (max(1, width // 2), max(1, height // 2)), 0, 0, 360, 1, -1)
+    return mask.astype(bool)
+
+
+def make_detections(count: int, seed: int = 0, width: int = 1280, height: int = 960):
+    """
+    NMS / 신발 그룹화 입력: 아이템마다 약간씩 어긋난 중복 박스 3~4개 (YOLO 원시 출력과 비슷한 분포)
+    절반은 shoes, 절반은 clothing
+    """
+    rng = np.random.default_rng(seed)
+    detections = []
+    while len(detections) < count:
+        w, h = rng.uniform(80, 300), rng.uniform(80, 300)
+        x1, y1 = rng.uniform(0, width - w), rng.uniform(0, height - h)
+        label = "shoes" if len(detections) % 2 else "clothing"
+        for _ in range(int(rng.integers(3, 5))):
+            jitter = rng.normal(0, 8, size=4)
+            box = np.array([x1, y1, x1 + w, y1 + h], dtype=np.float32) + jitter.astype(np.float32)
+            detections.append({"label": label, "confidence": float(rng.uniform(0.5, 0.99)), "box": box})
+    return detections[:count]
+
+
+# ----------------------------------------------------------------------
+# 스텁 모델
+# ----------------------------------------------------------------------
+class StubModelManager:
+    """
+    ModelManager의 요청 경로 메서드를 결정적인 결과로 대체 (모델 로딩 / 추론 없음)
+    탐지 결과는 현재 장면(set_scene)의 실제 아이템 박스를 그대로 돌려줍니다.
+    """
+
+    device = "cpu"
+    model_versions = {"stub": "benchmark"}
+    clip_labels = []
+
+    def __init__(self):
+        self.boxes = []
+
+    def set_scene(self, boxes):
+        self.boxes = boxes
+
+    def predict_yolo_batch(self, images, conf=0.5):
+        return [
+            [
+                {"label": "shoes" if i % 2 else "clothing", "confidence": 0.9, "box": np.array(box, dtype=np.float32)}
+                for i, box in enumerate(self.boxes)
+            ]
+            for _ in images
+        ]
+
+    def loaded_sam2_variants(self):
+        return []
+
+    def predict_sam2(self, image, boxes, image_key=None, variant=None, with_info=False):
+        masks = [ellipse_mask(int(box[3]) - int(box[1]), int(box[2]) - int(box[0])) for box in boxes]
+        return (masks, {"variant": variant, "encoded": True}) if with_info else masks
+
+    def predict_sam2_with_points(self, image, points, labels=None, image_key=None, variant=None, with_info=False):
+        mask = ellipse_mask(*image.shape[:2])
+        return (mask, {"variant": variant, "encoded": True}) if with_info else mask
+
+    def extract_embeddings(self, images, batch_size=32):
+        vectors = []
+        for image in images:
+            rng = np.random.default_rng(image.shape[0] * 10007 + image.shape[1])
+            vector = rng.normal(size=768).astype(np.float32)
+            vectors.append((vector / np.linalg.norm(vector)).tolist())
+        return vectors
+
+    def detect_item_type_with_clip(self, image):
+        return {"item_type": "clothing", "confidence": 0.9, "scores": {}}
+
+
+# ----------------------------------------------------------------------
+# 측정
+# ----------------------------------------------------------------------
+def measure(fn, repeat: int, warmup: int = 2) -> dict:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "p90_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.9))], 4),
+        "min_ms": round(samples[0], 4),
+        "runs": repeat,
+    }
+
+
+def utils_cases():
+    import mask_codec
+    import utils
+
+    cases = []
+    for width, height in RESOLUTIONS:
+        image, boxes = make_scene(width, height, 3)
+        jpeg = encode_jpeg(image)
+        size = f"{width}x{height}"
+        cases.append((f"decode_image[{size}]", lambda b=jpeg: utils.decode_image(b)))
+        cases.append((f"decode_image[{size},max_dim=2048]", lambda b=jpeg: utils.decode_image(b, max_dim=2048)))
+
+        x1, y1, x2, y2 = boxes[0]
+        roi_mask = ellipse_mask(y2 - y1, x2 - x1)
+        full_mask = np.zeros((height, width), dtype=bool)
+        full_mask[y1:y2, x1:x2] = roi_mask
+        box = np.array(boxes[0], dtype=np.float32)
+        cases.append((f"apply_mask_and_crop[{size},roi_mask]", lambda i=image, m=roi_mask, b=box: utils.apply_mask_and_crop(i, m, b, roi=True)))
+        cases.append((f"apply_mask_and_crop[{size},full_mask]", lambda i=image, m=full_mask, b=box: utils.apply_mask_and_crop(i, m, b)))
+
+        crop = utils.apply_mask_and_crop(image, roi_mask, box, roi=True)
+        cases.append((f"encode_image_to_base64[{size},crop]", lambda c=crop: utils.encode_image_to_base64(c)))
+        for fmt in ("rle", "polygon"):
+            cases.append((
+                f"encode_mask[{size},{fmt}]",
+                lambda s=image.shape, m=roi_mask, b=box, f=fmt: mask_codec.encode_mask(s, m, b, f, roi=True),
+            ))
+    return cases
+
+
+def postprocess_cases():
+    import postprocess
+
+    cases = []
+    for count in DETECTION_COUNTS:
+        detections = make_detections(count)
+        shoes = [d for d in detections if d["label"] == "shoes"]
+        cases.append((f"_nms_by_label[{count}]", lambda d=detections: postprocess.nms_by_label(d, iou_threshold=0.3)))
+        cases.append((f"_group_nearby_shoes[{len(shoes)}]", lambda s=shoes: postprocess.group_nearby_shoes(s)))
+    return cases
+
+
+def decode_regressions(results: dict, max_dim: int = 2048, tolerance: float = 0.10) -> list:
+    """
+    축소 디코딩(MAX_DECODE_DIM)을 켠 디코딩이 원본 디코딩보다 느린 해상도
+    (옵션을 켜서 느려지면 안 됨, 긴 변이 max_dim 이하인 해상도는 같은 경로라 제외)
+    """
+    slower = []
+    for width, height in RESOLUTIONS:
+        if max(width, height) <= max_dim:
+            continue
+        size = f"{width}x{height}"
+        full = results.get(f"decode_image[{size}]")
+        reduced = results.get(f"decode_image[{size},max_dim={max_dim}]")
+        if full and reduced and reduced["median_ms"] > full["median_ms"] * (1 + tolerance):
+            slower.append(
+                f"decode_image[{size}]: max_dim={max_dim} {reduced['median_ms']:.1f}ms > 원본 {full['median_ms']:.1f}ms"
+            )
+    return slower
+
+
+def postprocess_checks() -> list:
+    """
+    측정 전에 확인하는 후처리 / 마스크 결과 검증 (최적화가 결과를 바꾸지 않았는지)
+    Returns:
+        list: 실패한 검증 설명 (비어 있으면 통과)
+    """
+    import postprocess
+
+    failures = []
+    # 신발장 / 진열대: 같은 간격으로 한 줄에 놓인 신발 N개 -> 한 켤레씩 N/2개 그룹 (전체가 하나로 합쳐지면 안 됨)
+    for count in (2, 12, 40):
+        shoes = [
+            {"label": "shoes", "confidence": 0.9, "box": np.array([150 * i, 0, 150 * i + 100, 100], dtype=np.float32)}
+            for i in range(count)
+        ]
+        groups = postprocess.group_nearby_shoes(shoes)
+        if len(groups) != count // 2 or any(len(group) != 2 for group in groups):
+            failures.append(
+                f"_group_nearby_shoes: 한 줄의 신발 {count}개 -> {count // 2}개 그룹 예상, "
+                f"실제 {[len(group) for group in groups]}"
+            )
+
+    import utils
+
+    # 해상도가 다른 전체 프레임 마스크: 정수배가 아닌 비율(173x231 -> 123x189)에서도 전체 리사이즈와 같은 알파
+    mask = np.random.default_rng(0).random((173, 231)) > 0.5
+    image = np.zeros((123, 189, 3), dtype=np.uint8)
+    x1, y1, x2, y2 = 7, 5, 180, 120
+    expected = cv2.resize(mask.astype(np.uint8), (189, 123), interpolation=cv2.INTER_NEAREST)[y1:y2, x1:x2] * 255
+    alpha = utils.apply_mask_and_crop(image, mask, [x1, y1, x2, y2])[:, :, 3]
+    if not np.array_equal(alpha, expected):
+        failures.append(
+            f"apply_mask_and_crop: 173x231 마스크 -> 123x189 이미지에서 cv2.resize(INTER_NEAREST)와 "
+            f"{int((alpha != expected).sum())}px 다름"
+        )
+    return failures
+
+
+def analyze_all_results(repeat: int, name_filter: str = "") -> dict:
+    """
+    스텁 모델로 /analyze-all 파이프라인 전체 (디코딩 → 탐지 → 마스킹 크롭 → 인코딩 → 임베딩 → JSON 직렬화)
+    main은 서버 의존성(fastapi, torch 등)을 import하므로 설치되어 있지 않으면 이 항목만 건너뜁니다.
+    """
+    try:
+        import main
+    except ImportError as e:
+        print(f"⚠️  /analyze-all 항목 건너뜀 (서버 의존성 없음: {e})")
+        return {}
+    import utils
+
+    stub = StubModelManager()
+    main.remote_manager = stub  # _get_manager()가 스텁을 반환 (모델 서버 모드와 같은 연결 지점)
+
+    results = {}
+
+    async def run_all():
+        # 실행기의 세마포어가 이벤트 루프에 묶이므로 하나의 루프에서 모두 실행
+        for width, height in RESOLUTIONS:
+            for items in ITEM_COUNTS:
+                name = f"analyze_all[{width}x{height},{items}items]"
+                if name_filter not in name:
+                    continue
+                image, boxes = make_scene(width, height, items, seed=items)
+                contents = encode_jpeg(image)
+                image_key = utils.content_hash(contents)
+                stub.set_scene(_scaled_boxes(boxes, (height, width), contents))
+
+                async def once():
+                    response = await main._run_analyze_all(contents, image_key)
+                    json.dumps(response)
+
+                for _ in range(2):
+                    await once()
+                samples = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    await once()
+                    samples.append((time.perf_counter() - start) * 1000)
+                samples.sort()
+                results[name] = {
+                    "median_ms": round(statistics.median(samples), 4),
+                    "p90_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.9))], 4),
+                    "min_ms": round(samples[0], 4),
+                    "runs": repeat,
+                }
+
+    asyncio.run(run_all())
+    main.executor.shutdown()
+    return results
+
+
+def _scaled_boxes(boxes, shape, contents):
+    """MAX_DECODE_DIM 축소 디코딩 시 박스를 디코딩된 이미지 좌표로 변환"""
+    import main
+    import utils
+
+    decoded = utils.decode_image(contents, max_dim=main.MAX_DECODE_DIM or None)
+    scale = decoded.shape[1] / shape[1]
+    return [[int(v * scale) for v in box] for box in boxes]
+
+
+# ----------------------------------------------------------------------
+# 기준값 / 리포트
+# ----------------------------------------------------------------------
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def print_report(current: dict, baseline: dict, threshold: float) -> int:
+    """기준값 대비 변화율 출력. threshold(비율)보다 느려진 항목 수를 반환"""
+    base_results = baseline.get("results", {}) if baseline else {}
+    if baseline and baseline.get("environment") != current["environment"]:
+        print("⚠️  기준값과 실행 환경이 다릅니다. 비교 결과는 참고용입니다.")
+        print(f"    기준값: {baseline.get('environment')}")
+        print(f"    현재:   {current['environment']}")
+
+    name_width = max(len(name) for name in current["results"]) + 2
+    print(f"{'항목':<{name_width}}{'기준(ms)':>12}{'현재(ms)':>12}{'변화':>10}  판정")
+    print("-" * (name_width + 44))
+
+    regressions = 0
+    for name, result in current["results"].items():
+        now = result["median_ms"]
+        if name not in base_results:
+            print(f"{name:<{name_width}}{'-':>12}{now:>12.3f}{'-':>10}  신규")
+            continue
+        before = base_results[name]["median_ms"]
+        change = (now - before) / before if before > 0 else 0.0
+        if change > threshold:
+            verdict = "느려짐"
+            regressions += 1
+        elif change < -threshold:
+            verdict = "빨라짐"
+        else:
+            verdict = "-"
+        print(f"{name:<{name_width}}{before:>12.3f}{now:>12.3f}{change:>+10.1%}  {verdict}")
+
+    print("-" * (name_width + 44))
+    print(f"중앙값 기준, ±{threshold:.0%} 이내는 오차로 간주. 느려진 항목: {regressions}개")
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="ai-fastapi 오프라인 벤치마크 (CPU)")
+    parser.add_argument("--repeat", type=int, default=20, help="항목별 측정 반복 횟수")
+    parser.add_argument("--filter", default="", help="이름에 이 문자열이 포함된 항목만 실행")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="기준값 JSON 경로")
+    parser.add_argument("--save-baseline", action="store_true", help="측정 결과를 기준값으로 저장")
+    parser.add_argument("--threshold", type=float, default=0.10, help="느려짐/빨라짐 판정 기준 비율")
+    parser.add_argument("--fail-on-regression", action="store_true", help="느려진 항목이 있으면 종료 코드 1")
+    args = parser.parse_args()
+    # 요청마다 남는 [TIMING] 등 INFO 로그가 측정에 섞이지 않도록
+    logging.disable(logging.INFO)
+
+    failures = postprocess_checks()
+    if failures:
+        for failure in failures:
+            print(f"❌ 결과 검증 실패: {failure}")
+        return 1
+
+    results = {}
+    for name, fn in utils_cases() + postprocess_cases():
+        if args.filter in name:
+            results[name] = measure(fn, args.repeat)
+            print(f"  {name}: {results[name]['median_ms']:.3f}ms")
+    for name, result in analyze_all_results(args.repeat, args.filter).items():
+        results[name] = result
+        print(f"  {name}: {result['median_ms']:.3f}ms")
+
+    # 축소 디코딩 옵션이 원본 디코딩보다 느려지지 않았는지 (기준값과 무관하게 같은 실행 안에서 비교)
+    slower_decodes = decode_regressions(results)
+    for message in slower_decodes:
+        print(f"❌ 축소 디코딩이 원본 디코딩보다 느림: {message}")
+
+    current = {"environment": environment(), "results": results}
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"기준값 저장: {args.baseline}")
+        return 0
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    else:
+        print(f"기준값 파일이 없습니다 ({args.baseline}). --save-baseline으로 먼저 저장하세요.")
+
+    regressions = print_report(current, baseline, args.threshold) + len(slower_decodes)
+    return 1 if args.fail_on_regression and regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
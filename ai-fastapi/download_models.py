@@ -7,15 +7,31 @@ AI 모델 다운로드 스크립트
 
 사용법:
     python download_models.py
+    SAM2_MODELS=tiny,large python download_models.py   # SAM2 크기 여러 개
 """
 
 import os
 import sys
 from pathlib import Path
 
+# SAM2 모델 크기 -> (Hugging Face 저장소, 대략적인 크기)
+SAM2_DOWNLOADS = {
+    "tiny": ("sam2-hiera-tiny", "155MB"),
+    "small": ("sam2-hiera-small", "184MB"),
+    "base_plus": ("sam2-hiera-base-plus", "323MB"),
+    "large": ("sam2-hiera-large", "857MB"),
+}
+
 def download_models():
     """필요한 모든 모델을 다운로드합니다."""
     
+    # 서버와 같은 SAM2_MODELS 환경 변수로 받을 SAM2 크기 결정
+    sam2_variants = [v.strip() for v in os.getenv("SAM2_MODELS", "large").split(",") if v.strip()]
+    unknown = [v for v in sam2_variants if v not in SAM2_DOWNLOADS]
+    if unknown:
+        print(f"❌ 알 수 없는 SAM2 모델: {unknown} (지원: {', '.join(SAM2_DOWNLOADS)})")
+        sys.exit(1)
+    
     # huggingface_hub 설치 확인
     try:
         from huggingface_hub import hf_hub_download
@@ -73,16 +89,21 @@ def download_models():
             print(f"         https://huggingface.co 에서 deepfashion2_yolov8s-seg.pt 를 검색하여")
             print(f"         {model2_path} 에 저장하세요.")
     
-    # 3. SAM2 (세그멘테이션)
-    model3_path = checkpoints_dir / "sam2_hiera_large.pt"
-    if model3_path.exists():
-        print(f"\n[3/3] ✅ sam2_hiera_large 이미 존재: {model3_path}")
-    else:
-        print(f"\n[3/3] 📥 sam2_hiera_large 다운로드 중... (약 857MB, 시간이 걸립니다)")
+    # 3. SAM2 (세그멘테이션) - SAM2_MODELS에 지정한 크기만 (기본: large)
+    sam2_paths = []
+    for variant in sam2_variants:
+        repo_name, size_text = SAM2_DOWNLOADS[variant]
+        filename = f"sam2_hiera_{variant}.pt"
+        model3_path = checkpoints_dir / filename
+        sam2_paths.append((f"sam2_hiera_{variant} (세그멘테이션)", model3_path))
+        if model3_path.exists():
+            print(f"\n[3/3] ✅ sam2_hiera_{variant} 이미 존재: {model3_path}")
+            continue
+        print(f"\n[3/3] 📥 sam2_hiera_{variant} 다운로드 중... (약 {size_text}, 시간이 걸립니다)")
         try:
             hf_hub_download(
-                repo_id="facebook/sam2-hiera-large",
-                filename="sam2_hiera_large.pt",
+                repo_id=f"facebook/{repo_name}",
+                filename=filename,
                 local_dir=str(checkpoints_dir),
                 local_dir_use_symlinks=False
             )
@@ -90,8 +111,8 @@ def download_models():
         except Exception as e:
             print(f"      ❌ 다운로드 실패: {e}")
             print(f"      📝 수동 다운로드:")
-            print(f"         https://huggingface.co/facebook/sam2-hiera-large")
-            print(f"         에서 sam2_hiera_large.pt 를 다운로드하여")
+            print(f"         https://huggingface.co/facebook/{repo_name}")
+            print(f"         에서 {filename} 를 다운로드하여")
             print(f"         {model3_path} 에 저장하세요.")
     
     print("\n" + "=" * 60)
@@ -103,7 +124,7 @@ def download_models():
     models = [
         ("yolov8n-clothing (Stage 1)", model1_path),
         ("deepfashion2_yolov8s-seg (Stage 2)", model2_path),
-        ("sam2_hiera_large (세그멘테이션)", model3_path),
+        *sam2_paths,
     ]
     
     all_ready = True
@@ -0,0 +1,112 @@
+"""
+CLIP 텍스트 임베딩용 LRU 캐시
+
+/embed-text로 들어오는 문자열("White Solid Casual Formal Spring" 등)은
+속성 조합으로 만들어진 작은 어휘라 사용자 간에 반복이 많습니다.
+정규화된 텍스트 + 모델 ID를 키로 임베딩을 보관해 트랜스포머 호출을 줄입니다.
+"""
+
+import os
+import re
+import pickle
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """CLIP 토크나이저와 동일하게 공백 정리 + 소문자화"""
+    return _WHITESPACE_RE.sub(" ", text).strip().lower()
+
+
+class TextEmbeddingCache:
+    """
+    프로세스 내 LRU 캐시 (선택적으로 디스크에 영속화)
+
+    - 키: (model_id, 정규화된 텍스트)
+    - 값: 정규화된 float32 임베딩 벡터
+    - hit/miss 카운터는 /status에서 확인
+    """
+
+    def __init__(self, max_entries: int = 10000, persist_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.persist_path = persist_path
+        self._entries: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model_id: str, text: str) -> tuple:
+        return (model_id, normalize_text(text))
+
+    def get(self, key: tuple) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key: tuple, vector: np.ndarray):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = np.asarray(vector, dtype=np.float32)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def load(self):
+        """디스크에 저장된 캐시 복원 (파일이 없으면 무시)"""
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, "rb") as f:
+                entries = pickle.load(f)
+            with self._lock:
+                for key, vector in entries:
+                    self._entries[key] = vector
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            logger.info(f"[TextCache] 디스크 캐시 로드: {len(self._entries)}개 ({self.persist_path})")
+        except Exception as e:
+            logger.error(f"[TextCache] 디스크 캐시 로드 실패: {e}")
+
+    def save(self):
+        """현재 캐시를 디스크에 저장 (임시 파일에 쓴 후 교체)"""
+        if not self.persist_path:
+            return
+        try:
+            with self._lock:
+                entries = list(self._entries.items())
+            directory = os.path.dirname(self.persist_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.persist_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.persist_path)
+            logger.info(f"[TextCache] 디스크 캐시 저장: {len(entries)}개 ({self.persist_path})")
+        except Exception as e:
+            logger.error(f"[TextCache] 디스크 캐시 저장 실패: {e}")
@@ -0,0 +1,46 @@
+"""
+임베딩 응답 인코딩
+
+기본값(json)은 기존과 같은 float 리스트이며, 요청 시 바이너리 인코딩으로 전송합니다.
+- json: [0.1, 0.2, ...]
+- f32:  little-endian float32 버퍼의 Base64 문자열
+- f16:  little-endian float16 버퍼의 Base64 문자열 (f32 대비 절반 크기)
+- i8:   {"data": int8 버퍼의 Base64, "scale": float}  (원래 값 ≈ int8 * scale)
+"""
+
+import base64
+
+import numpy as np
+
+EMBEDDING_FORMATS = ("json", "f32", "f16", "i8")
+
+_DTYPES = {
+    "f32": np.dtype("<f4"),
+    "f16": np.dtype("<f2"),
+}
+
+
+def encode_embedding(vector, fmt: str = "json"):
+    """임베딩 벡터 하나를 요청한 형식으로 변환"""
+    if fmt == "json":
+        return vector.tolist() if isinstance(vector, np.ndarray) else vector
+
+    array = np.asarray(vector, dtype=np.float32)
+    if fmt in _DTYPES:
+        return base64.b64encode(array.astype(_DTYPES[fmt]).tobytes()).decode("ascii")
+
+    if fmt == "i8":
+        # 벡터별 대칭 스케일: 최대 절댓값을 127에 매핑
+        max_abs = float(np.abs(array).max()) if array.size else 0.0
+        scale = max_abs / 127.0 if max_abs > 0 else 1.0
+        quantized = np.clip(np.rint(array / scale), -127, 127).astype(np.int8)
+        return {"data": base64.b64encode(quantized.tobytes()).decode("ascii"), "scale": scale}
+
+    raise ValueError(f"지원하지 않는 임베딩 형식입니다: {fmt} (지원: {', '.join(EMBEDDING_FORMATS)})")
+
+
+def encode_embeddings(matrix, fmt: str = "json") -> list:
+    """임베딩 행렬 [N, D] (또는 벡터 리스트)를 행 단위로 변환"""
+    if fmt == "json":
+        return matrix.tolist() if isinstance(matrix, np.ndarray) else list(matrix)
+    return [encode_embedding(row, fmt) for row in matrix]
@@ -0,0 +1,159 @@
+"""
+크롭 이미지 인코더
+
+기존 encode_image_to_base64는 항상 PNG를 먼저 인코딩하고, 크면 JPEG 품질을 85 → 75 → ... 로
+낮추며 전체 이미지를 반복 인코딩했습니다 (큰 크롭은 7회 이상).
+- 픽셀 수로 PNG 크기를 추정해 확실히 넘칠 PNG 인코딩은 건너뜀
+  (BGRA 크롭은 JPEG로 알파를 버리기 전에 MAX_LOSSY_DIM으로 축소한 PNG를 먼저 시도)
+- 손실 압축 품질은 이진 탐색 (최대 ~4회 인코딩)
+- WebP 선택 시 알파 채널을 유지한 채 손실 압축 (흰 배경 합성 불필요)
+- 한 요청의 모든 크롭을 스레드 풀에서 병렬 인코딩 (cv2.imencode는 GIL을 해제)
+"""
+
+import base64
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE_BYTES = 4 * 1024 * 1024  # Bedrock 5MB 제한에 여유
+MAX_LOSSY_DIM = 1024
+MIN_QUALITY = 30
+MAX_QUALITY = 85
+
+# 사진 크롭의 PNG 압축률 하한 추정치 (원본 바이트 대비). 이보다 커도 넘치면 PNG 시도를 생략
+PNG_MIN_RATIO = 0.3
+
+ENCODE_FORMATS = ("png", "webp")
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_workers = 4
+_default_format = "png"
+
+
+def configure(workers: int = None, fmt: str = None):
+    """병렬 인코딩 스레드 수 / 기본 형식 설정 (다음 호출부터 적용)"""
+    global _pool, _pool_workers, _default_format
+    if fmt is not None:
+        if fmt not in ENCODE_FORMATS:
+            raise ValueError(f"지원하지 않는 크롭 인코딩 형식입니다: {fmt} (지원: {', '.join(ENCODE_FORMATS)})")
+        _default_format = fmt
+    if workers is not None:
+        _pool_workers = max(1, workers)
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=_pool_workers, thread_name_prefix="crop-encode")
+    return _pool
+
+
+def _b64(buffer: np.ndarray) -> str:
+    return base64.b64encode(buffer).decode("utf-8")
+
+
+def _flatten_alpha(image: np.ndarray) -> np.ndarray:
+    """BGRA -> BGR (알파 채널로 흰 배경 합성, JPEG는 알파 미지원)"""
+    alpha = image[:, :, 3:4].astype(np.float32) / 255.0
+    rgb = image[:, :, :3].astype(np.float32)
+    return (rgb * alpha + 255.0 * (1.0 - alpha)).astype(np.uint8)
+
+
+def _resize_max_dim(image: np.ndarray, max_dim: int) -> np.ndarray:
+    h, w = image.shape[:2]
+    if max(h, w) <= max_dim:
+        return image
+    scale = max_dim / max(h, w)
+    return cv2.resize(image, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+
+
+def _encode_lossy(image: np.ndarray, ext: str, quality_flag: int, max_size_bytes: int) -> Optional[np.ndarray]:
+    """
+    max_size_bytes 이하가 되는 가장 높은 품질을 이진 탐색합니다.
+    대부분은 첫 시도(MAX_QUALITY)에서 끝나며, 최소 품질로도 넘치면 None.
+    """
+    ok, buffer = cv2.imencode(ext, image, [quality_flag, MAX_QUALITY])
+    if ok and len(buffer) <= max_size_bytes:
+        return buffer
+
+    best = None
+    lo, hi = MIN_QUALITY, MAX_QUALITY - 1
+    while lo <= hi:
+        quality = (lo + hi) // 2
+        ok, buffer = cv2.imencode(ext, image, [quality_flag, quality])
+        if ok and len(buffer) <= max_size_bytes:
+            best = buffer
+            lo = quality + 1
+        else:
+            hi = quality - 1
+    return best
+
+
+def encode_image(image: np.ndarray, max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES, fmt: str = None) -> str:
+    """
+    이미지 하나를 Base64 문자열로 인코딩합니다.
+    Args:
+        image (np.ndarray): BGR 또는 BGRA 이미지
+        max_size_bytes (int): 최대 허용 바이트
+        fmt (str): "png" (무손실 우선, 크면 JPEG) 또는 "webp" (알파 유지 손실 압축), 기본값은 configure()로 설정
+    Returns:
+        str: Base64 인코딩된 문자열
+    """
+    fmt = fmt or _default_format
+    h, w = image.shape[:2]
+    channels = image.shape[2] if image.ndim == 3 else 1
+
+    if fmt == "webp":
+        # 무손실 PNG 시도 없이 바로 알파 유지 손실 압축
+        resized = _resize_max_dim(image, MAX_LOSSY_DIM)
+        buffer = _encode_lossy(resized, ".webp", cv2.IMWRITE_WEBP_QUALITY, max_size_bytes)
+        if buffer is not None:
+            return _b64(buffer)
+        image = resized
+    else:
+        # 원본 크기 대비 PNG 추정 크기가 상한 이내일 때만 PNG 시도
+        png_tried = h * w * channels * PNG_MIN_RATIO <= max_size_bytes
+        if png_tried:
+            _, buffer = cv2.imencode(".png", image)
+            if len(buffer) <= max_size_bytes:
+                return _b64(buffer)
+
+        # 최대 1024px로 리사이즈 후 JPEG 품질 이진 탐색
+        resized = _resize_max_dim(image, MAX_LOSSY_DIM)
+        if resized.ndim == 3 and resized.shape[-1] == 4:
+            # JPEG로 알파 채널(투명 배경)을 잃기 전에 축소한 크기로 PNG 재시도
+            if resized is not image or not png_tried:
+                _, buffer = cv2.imencode(".png", resized)
+                if len(buffer) <= max_size_bytes:
+                    return _b64(buffer)
+            resized = _flatten_alpha(resized)
+        image = resized
+        buffer = _encode_lossy(image, ".jpg", cv2.IMWRITE_JPEG_QUALITY, max_size_bytes)
+        if buffer is not None:
+            return _b64(buffer)
+
+    # 여전히 크면 추가 리사이즈
+    h, w = image.shape[:2]
+    image = cv2.resize(image, (w // 2, h // 2), interpolation=cv2.INTER_AREA)
+    if fmt == "webp":
+        _, buffer = cv2.imencode(".webp", image, [cv2.IMWRITE_WEBP_QUALITY, 70])
+    else:
+        _, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 70])
+    return _b64(buffer)
+
+
+def encode_many(images: List[np.ndarray], max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES, fmt: str = None) -> List[str]:
+    """한 요청의 모든 크롭을 스레드 풀에서 병렬 인코딩 (입력 순서 유지)"""
+    if len(images) <= 1:
+        return [encode_image(image, max_size_bytes, fmt) for image in images]
+    pool = _get_pool()
+    futures = [pool.submit(encode_image, image, max_size_bytes, fmt) for image in images]
+    return [future.result() for future in futures]
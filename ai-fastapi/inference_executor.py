@@ -0,0 +1,123 @@
+"""
+블로킹 추론 작업용 전용 실행기
+
+엔드포인트는 async def지만 YOLO / SAM2 / 임베딩 / 인코딩은 동기 함수라
+이벤트 루프에서 직접 호출하면 /status, / 같은 헬스체크까지 멈춥니다.
+모든 무거운 작업을 이 실행기의 스레드 풀에서 실행하고 핸들러는 결과를 await 합니다.
+- 대기열 상한(max_queue)을 넘으면 QueueFullError (→ 503)
+- 모델별 동시 실행 수 제한 (예: SAM2 predictor는 상태를 가지므로 1)
+"""
+
+import asyncio
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 모델별 기본 동시 실행 수 (INFERENCE_CONCURRENCY로 덮어쓰기)
+DEFAULT_MODEL_CONCURRENCY = {
+    "yolo": 1,
+    "sam2": 1,        # set_image → predict 사이에 predictor 상태 공유 (ModelManager가 크기별 락으로 보호)
+    "embedding": 1,
+    "clip": 1,
+    "cpu": 4,         # 디코딩 / 크롭 / Base64 인코딩
+}
+
+
+# 모델 그룹(ModelManager.MODEL_GROUPS) -> 동시 실행 제한 이름
+MODEL_GROUP_LIMITS = {
+    "yolo": "yolo",
+    "sam2": "sam2",
+    "fashion_siglip": "embedding",
+    "clip": "clip",
+}
+
+
+class QueueFullError(Exception):
+    """추론 대기열이 가득 찬 경우"""
+
+
+def parse_concurrency(spec: str) -> Dict[str, int]:
+    """'yolo=1,sam2=1,cpu=4' 형식 문자열을 dict로 변환"""
+    limits = dict(DEFAULT_MODEL_CONCURRENCY)
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, value = part.partition("=")
+        limits[name.strip()] = max(1, int(value))
+    return limits
+
+
+class InferenceExecutor:
+    """스레드 풀 + 대기열 상한 + 모델별 세마포어"""
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 64, model_limits: Dict[str, int] = None):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.model_limits = dict(model_limits or DEFAULT_MODEL_CONCURRENCY)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.pending = 0   # 대기 + 실행 중인 작업 수
+        self.running = 0   # 실행 중인 작업 수
+        self._model_pending: Dict[str, int] = {}  # 모델별 대기 + 실행 중인 작업 수
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(model)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.model_limits.get(model, 1))
+            self._semaphores[model] = semaphore
+        return semaphore
+
+    async def run(self, model: str, fn: Callable, *args, **kwargs):
+        """
+        fn(*args, **kwargs)를 스레드 풀에서 실행하고 결과를 반환합니다.
+        Args:
+            model (str): 동시 실행 제한을 적용할 모델 이름 (yolo, sam2, embedding, clip, cpu)
+        """
+        if self.pending >= self.max_queue:
+            raise QueueFullError(f"추론 대기열이 가득 찼습니다 ({self.pending}/{self.max_queue})")
+
+        self.pending += 1
+        self._model_pending[model] = self._model_pending.get(model, 0) + 1
+        self._report_depth()
+        try:
+            async with self._semaphore(model):
+                self.running += 1
+                self._report_depth()
+                try:
+                    loop = asyncio.get_running_loop()
+                    return await loop.run_in_executor(
+                        self._pool, functools.partial(fn, *args, **kwargs)
+                    )
+                finally:
+                    self.running -= 1
+        finally:
+            self.pending -= 1
+            self._model_pending[model] -= 1
+            self._report_depth()
+
+    def _report_depth(self):
+        """대기 / 실행 중 작업 수를 Prometheus 게이지에 반영 (multiprocess livesum이 모든 워커의 현재 값을 합산)"""
+        metrics.set_queue_depth(self.pending - self.running, self.running)
+
+    def model_pending(self, model: str) -> int:
+        """모델별 대기 + 실행 중인 작업 수 (SAM2 모델 크기 라우팅에 사용)"""
+        return self._model_pending.get(model, 0)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "running": self.running,
+            "queued": self.pending - self.running,
+            "model_limits": self.model_limits,
+            "model_pending": dict(self._model_pending),
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -1,32 +1,343 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from model_manager import ModelManager
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from model_client import RemoteModelManager
+from embedding_cache import TextEmbeddingCache
+from session_cache import SessionCache
+from result_cache import AnalyzeResultCache, config_fingerprint
+from inference_executor import (
+    MODEL_GROUP_LIMITS,
+    InferenceExecutor,
+    QueueFullError,
+    parse_concurrency,
+)
+from micro_batcher import MicroBatcher
+from sam2_router import Sam2Router
+from quantization import QUANTIZATION_MODES
+from embedding_codec import EMBEDDING_FORMATS, encode_embedding, encode_embeddings
+from mask_codec import MASK_FORMATS, encode_mask
+from pydantic import BaseModel
 import utils
+import image_encoder
+import metrics
 import logging
+import json
+import base64
+import binascii
+import asyncio
+import multiprocessing
 import os
 import numpy as np
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:
+    # torch / ultralytics / open_clip을 불러오므로 실제 import는 로컬 모델 모드에서만 (_get_manager 참고)
+    from model_manager import ModelManager
 
 # 환경 변수 설정
 USE_SAM2 = os.getenv("USE_SAM2", "true").lower() == "true"
+# /embed-text에서 한 번의 CLIP encode_text에 넣을 최대 텍스트 수
+TEXT_EMBED_CHUNK_SIZE = int(os.getenv("TEXT_EMBED_CHUNK_SIZE", "64"))
+# CLIP 텍스트 임베딩 LRU 캐시 (0이면 비활성화, PATH 지정 시 디스크에 영속화)
+TEXT_EMBED_CACHE_SIZE = int(os.getenv("TEXT_EMBED_CACHE_SIZE", "10000"))
+TEXT_EMBED_CACHE_PATH = os.getenv("TEXT_EMBED_CACHE_PATH", "")
+# CLIP fallback 라벨 (JSON: [["shoes", "a pair of sneakers"], ...]), 비우면 기본값 사용
+CLIP_FALLBACK_LABELS = os.getenv("CLIP_FALLBACK_LABELS", "")
+# SAM2 이미지 임베딩 세션 캐시 (/refine-mask에서 재사용, 0이면 비활성화)
+SAM2_CACHE_MAX_MB = int(os.getenv("SAM2_CACHE_MAX_MB", "512"))
+SAM2_CACHE_TTL_SECONDS = int(os.getenv("SAM2_CACHE_TTL_SECONDS", "600"))
+# 함께 로드할 SAM2 모델 크기 (tiny, small, base_plus, large 콤마 구분) 및 요청별 선택 정책 (sam2_router 참고)
+# 기본 지연 시간 예산(ms, 0이면 항상 가장 큰 모델) / large를 쓰지 않을 작은 이미지의 긴 변 / large 호출 시간 초기 추정치(ms)
+SAM2_MODELS = [name.strip() for name in os.getenv("SAM2_MODELS", "large").split(",") if name.strip()]
+SAM2_LATENCY_BUDGET_MS = float(os.getenv("SAM2_LATENCY_BUDGET_MS", "0"))
+SAM2_SMALL_IMAGE_DIM = int(os.getenv("SAM2_SMALL_IMAGE_DIM", "640"))
+SAM2_LATENCY_PRIOR_MS = float(os.getenv("SAM2_LATENCY_PRIOR_MS", "500"))
+# YOLO 탐지 confidence 임계값
+YOLO_CONF_THRESHOLD = float(os.getenv("YOLO_CONF_THRESHOLD", "0.5"))
+# /analyze-all 결과 캐시 (메모리 0이면 비활성화, DIR 지정 시 디스크 tier 사용)
+RESULT_CACHE_MAX_MB = int(os.getenv("RESULT_CACHE_MAX_MB", "256"))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", "3600"))
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "")
+# 추론 실행기: 스레드 수, 대기열 상한, 모델별 동시 실행 수 ("yolo=1,sam2=1,embedding=1,clip=1,cpu=4")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "4"))
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "64"))
+INFERENCE_CONCURRENCY = os.getenv("INFERENCE_CONCURRENCY", "")
+# YOLO 요청 간 micro-batching: 최대 배치 크기 / 최대 대기 시간(ms)
+YOLO_BATCH_MAX_SIZE = int(os.getenv("YOLO_BATCH_MAX_SIZE", "8"))
+YOLO_BATCH_WINDOW_MS = float(os.getenv("YOLO_BATCH_WINDOW_MS", "5"))
+# 크롭 인코딩: 병렬 스레드 수 / 형식 (png: 무손실 우선 + JPEG fallback, webp: 알파 유지 손실 압축)
+CROP_ENCODE_WORKERS = int(os.getenv("CROP_ENCODE_WORKERS", "4"))
+CROP_ENCODE_FORMAT = os.getenv("CROP_ENCODE_FORMAT", "png")
+# mask_format=polygon 응답의 외곽선 단순화 허용 오차 (px, 0이면 단순화하지 않음)
+MASK_POLYGON_TOLERANCE = float(os.getenv("MASK_POLYGON_TOLERANCE", "1.0"))
+# 업로드/디코딩 상한: 업로드 바이트, 헤더상 픽셀 수(압축 폭탄 방지), 디코딩 후 최대 긴 변 (0이면 원본 해상도)
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "25"))
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(100_000_000)))
+MAX_DECODE_DIM = int(os.getenv("MAX_DECODE_DIM", "0"))
+# 시작 시 병렬 로드에서 뺄 모델 그룹 (yolo, sam2, fashion_siglip, clip, 기본값 없음)
+# 서버가 열린 뒤 워밍업 태스크가 백그라운드에서 로드하며 (/ready는 그 후 200), 그 전 요청은 첫 사용 시 로드
+# SAM2 비활성화 시 sam2는 /refine-mask에서만 쓰이므로 자동으로 지연 로딩
+LAZY_MODELS = [name.strip() for name in os.getenv("LAZY_MODELS", "").split(",") if name.strip()]
+if not USE_SAM2 and "sam2" not in LAZY_MODELS:
+    LAZY_MODELS.append("sam2")
+# YOLO Stage 1 백엔드 (torch: ultralytics PyTorch / onnx: ONNX Runtime CPU, 없으면 .pt에서 자동 내보내기)
+YOLO_BACKEND = os.getenv("YOLO_BACKEND", "torch").lower()
+YOLO_ONNX_PATH = os.getenv("YOLO_ONNX_PATH", "./checkpoints/yolov8n-clothing/best.onnx")
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+# 임베딩 모델(FashionSigLIP, CLIP) 양자화: none / int8 (CPU 전용, 로딩 시 fp32 대비 코사인 유사도 검증)
+EMBED_QUANTIZE = os.getenv("EMBED_QUANTIZE", "none").lower()
+QUANTIZE_MIN_COSINE = float(os.getenv("QUANTIZE_MIN_COSINE", "0.99"))
+QUANTIZE_SAMPLE_DIR = os.getenv("QUANTIZE_SAMPLE_DIR", "")
+# 시작 후 워밍업: 합성 이미지 크기 목록 ("가로x세로", 비우면 워밍업 생략) / 반복 횟수
+WARMUP_SIZES = [
+    tuple(int(v) for v in size.lower().split("x"))
+    for size in os.getenv("WARMUP_SIZES", "640x480,1280x960").split(",")
+    if size.strip()
+]
+WARMUP_ROUNDS = int(os.getenv("WARMUP_ROUNDS", "1"))
+# 모델 서버 모드: 모델 서버 주소 (Unix 소켓 경로 또는 host:port, 콤마 구분). 설정 시 이 프로세스는 모델을 로드하지 않음
+# (python model_server.py 로 실행하면 자동 설정)
+MODEL_SERVER_ADDRESSES = [a.strip() for a in os.getenv("MODEL_SERVER_ADDRESSES", "").split(",") if a.strip()]
+MODEL_SERVER_AUTHKEY = os.getenv("MODEL_SERVER_AUTHKEY", "").encode()
+# 모델 서버가 (로딩 + 워밍업 후) 응답할 때까지 기다릴 최대 시간. 넘기면 /ready는 failed(503)
+MODEL_SERVER_CONNECT_TIMEOUT_SECONDS = float(os.getenv("MODEL_SERVER_CONNECT_TIMEOUT_SECONDS", "600"))
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 logger.info(f"SAM2 사용 설정: {'활성화' if USE_SAM2 else '비활성화 (단순 크롭)'}")
 
+image_encoder.configure(workers=CROP_ENCODE_WORKERS, fmt=CROP_ENCODE_FORMAT)
+if EMBED_QUANTIZE not in QUANTIZATION_MODES:
+    raise ValueError(
+        f"지원하지 않는 EMBED_QUANTIZE 값입니다: {EMBED_QUANTIZE} (지원: {', '.join(QUANTIZATION_MODES)})"
+    )
+
+
+# 요청별 SAM2 모델 크기 선택
+sam2_router = Sam2Router(
+    SAM2_MODELS,
+    default_budget_ms=SAM2_LATENCY_BUDGET_MS,
+    small_image_dim=SAM2_SMALL_IMAGE_DIM,
+    prior_ms=SAM2_LATENCY_PRIOR_MS,
+)
+
+
+# /analyze-all 결과 캐시 (lifespan에서 생성)
+result_cache = None
+# 모델 서버 모드의 원격 ModelManager (lifespan에서 생성)
+remote_manager = None
+
+
+def _get_manager():
+    """요청 경로에서 사용할 ModelManager (모델 서버 모드면 원격 프록시)"""
+    if remote_manager is not None:
+        return remote_manager
+    # 모델 서버 모드의 HTTP 워커가 torch 등을 로드하지 않도록 로컬 모델 모드에서만 import
+    from model_manager import ModelManager
+
+    return ModelManager()
+# 블로킹 추론 작업 실행기 (이벤트 루프를 막지 않도록 모든 모델 호출은 여기서 실행)
+executor = InferenceExecutor(
+    max_workers=INFERENCE_WORKERS,
+    max_queue=INFERENCE_QUEUE_SIZE,
+    model_limits=parse_concurrency(INFERENCE_CONCURRENCY),
+)
+
+
+async def _run_yolo_batch(conf, images):
+    """micro-batcher가 모은 이미지들을 한 번의 YOLO 호출로 탐지"""
+    manager = _get_manager()
+    return await executor.run("yolo", manager.predict_yolo_batch, images, conf=conf)
+
+
+# 동시에 들어온 요청의 YOLO 탐지를 모아서 배치 실행 (conf 값별로 묶음)
+yolo_batcher = MicroBatcher(
+    _run_yolo_batch,
+    max_batch_size=YOLO_BATCH_MAX_SIZE,
+    max_wait_ms=YOLO_BATCH_WINDOW_MS,
+    name="YOLOBatcher",
+)
+
+# 워밍업 상태 (/ready는 status == "done"일 때만 200)
+warmup_state = {"status": "pending", "duration_seconds": None, "error": None}
+
+
+def _background_load_groups() -> list:
+    """
+    /ready 전에 백그라운드에서 로드할 지연 로딩 그룹
+    (USE_SAM2=false로 자동 추가된 sam2는 /refine-mask 첫 사용 시 로드)
+    """
+    return [group for group in LAZY_MODELS if USE_SAM2 or group != "sam2"]
+
+
+async def _warmup(manager: "ModelManager"):
+    """
+    지연 로딩(LAZY_MODELS) 모델을 백그라운드에서 로드한 뒤, 로드된 모든 모델에 대표 크기의 합성 이미지를 통과시켜
+    cuDNN 오토튜닝 / 메모리 할당 / 라이브러리 지연 초기화를 첫 사용자 요청 전에 끝냅니다.
+    지연 로딩은 시작(포트 열기)만 앞당기며, /ready는 이 작업이 끝난 뒤에 200을 반환합니다.
+    """
+    import time
+    from model_manager import MODEL_GROUPS, synthetic_image
+
+    start = time.time()
+    warmup_state["status"] = "running"
+    try:
+        for group in _background_load_groups():
+            step_start = time.time()
+            await executor.run(MODEL_GROUP_LIMITS[group], manager.ensure_loaded, group)
+            logger.info(f"[Warmup] {group} 로딩: {time.time() - step_start:.2f}초")
+        groups = [group for group in MODEL_GROUPS if manager.is_loaded(group)]
+        logger.info(f"[Warmup] 시작: 모델 {groups}, 크기 {WARMUP_SIZES}, {WARMUP_ROUNDS}회")
+        for _ in range(WARMUP_ROUNDS):
+            for width, height in WARMUP_SIZES:
+                image = synthetic_image(height, width)
+                for group in groups:
+                    step_start = time.time()
+                    await executor.run(
+                        MODEL_GROUP_LIMITS[group], manager.warmup_model, group, image
+                    )
+                    logger.info(
+                        f"[Warmup] {group} {width}x{height}: {time.time() - step_start:.2f}초"
+                    )
+                # 크롭 인코딩 스레드 풀 / 코덱 초기화
+                await executor.run("cpu", image_encoder.encode_many, [image, image])
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"[Warmup] 실패: {e}")
+        warmup_state.update(status="failed", error=str(e))
+        return
+
+    warmup_state.update(status="done", duration_seconds=round(time.time() - start, 3))
+    logger.info(f"[Warmup] 완료: {warmup_state['duration_seconds']}초")
+
+
+async def _wait_for_model_servers(manager: RemoteModelManager):
+    """모델 서버 모드: 모든 모델 서버가 (로딩 + 워밍업 후) 응답할 때까지 대기"""
+    import time
+
+    start = time.time()
+    warmup_state["status"] = "running"
+    while True:
+        try:
+            await executor.run("cpu", manager.refresh)
+            break
+        except asyncio.CancelledError:
+            raise
+        except (EOFError, OSError, multiprocessing.AuthenticationError) as e:
+            # 서버가 아직 로딩 중이거나 인증 키가 맞지 않음 (키 불일치는 재시도해도 풀리지 않으므로 제한 시간까지만)
+            if time.time() - start >= MODEL_SERVER_CONNECT_TIMEOUT_SECONDS:
+                logger.error(f"모델 서버 연결 실패 ({MODEL_SERVER_CONNECT_TIMEOUT_SECONDS:.0f}초 초과): {type(e).__name__}: {e}")
+                warmup_state.update(status="failed", error=f"{type(e).__name__}: {e}")
+                return
+            logger.debug(f"모델 서버 응답 대기 중: {type(e).__name__}: {e}")
+            await asyncio.sleep(1.0)
+        except Exception as e:
+            logger.error(f"모델 서버 연결 실패: {type(e).__name__}: {e}")
+            warmup_state.update(status="failed", error=f"{type(e).__name__}: {e}")
+            return
+    warmup_state.update(status="done", duration_seconds=round(time.time() - start, 3))
+    logger.info(f"모델 서버 연결 완료: {MODEL_SERVER_ADDRESSES}")
+
+
+def setup_model_manager() -> "ModelManager":
+    """환경 변수 설정대로 ModelManager를 구성하고 모델 / 캐시를 준비 (모델 서버 프로세스도 사용)"""
+    manager = _get_manager()
+    if CLIP_FALLBACK_LABELS:
+        manager.set_clip_labels(json.loads(CLIP_FALLBACK_LABELS))
+    manager.yolo_backend = YOLO_BACKEND
+    manager.yolo_onnx_path = YOLO_ONNX_PATH
+    manager.onnx_threads = ONNX_THREADS
+    manager.embed_quantization = EMBED_QUANTIZE
+    manager.quantize_min_cosine = QUANTIZE_MIN_COSINE
+    manager.quantize_sample_dir = QUANTIZE_SAMPLE_DIR or None
+    manager.sam2_variants = sam2_router.variants
+    manager.load_models(lazy=LAZY_MODELS)
+    if TEXT_EMBED_CACHE_SIZE > 0:
+        manager.text_cache = TextEmbeddingCache(
+            max_entries=TEXT_EMBED_CACHE_SIZE,
+            persist_path=TEXT_EMBED_CACHE_PATH or None,
+        )
+        manager.text_cache.load()
+    if SAM2_CACHE_MAX_MB > 0:
+        manager.sam2_cache = SessionCache(
+            max_bytes=SAM2_CACHE_MAX_MB * 1024 * 1024,
+            ttl_seconds=SAM2_CACHE_TTL_SECONDS,
+            name="SAM2Cache",
+        )
+    return manager
+
+
+def teardown_model_manager(manager: "ModelManager"):
+    if manager.text_cache is not None:
+        manager.text_cache.save()
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # 시작 시 실행: 모델 로드
-    logger.info("서버 시작: 모델 로딩을 초기화합니다.")
-    manager = ModelManager()
-    manager.load_models()
+    global result_cache, remote_manager
+    manager = None
+    if MODEL_SERVER_ADDRESSES:
+        # 모델 서버 모드: 모델은 모델 서버가 소유, 이 워커는 HTTP / 전후처리만 담당
+        logger.info(f"서버 시작: 모델 서버 모드 ({MODEL_SERVER_ADDRESSES})")
+        remote_manager = RemoteModelManager(MODEL_SERVER_ADDRESSES, MODEL_SERVER_AUTHKEY)
+    else:
+        # 시작 시 실행: 모델 로드
+        logger.info("서버 시작: 모델 로딩을 초기화합니다.")
+        manager = setup_model_manager()
+    if RESULT_CACHE_MAX_MB > 0:
+        result_cache = AnalyzeResultCache(
+            memory_max_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024,
+            ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+            disk_dir=RESULT_CACHE_DIR or None,
+        )
+    # 워밍업은 백그라운드에서 실행 (그동안 /status는 응답하고 /ready는 503)
+    # 모델 서버 모드에서는 모델 서버가 워밍업 후 요청을 받기 시작하므로 연결될 때까지만 대기
+    warmup_task = None
+    if remote_manager is not None:
+        warmup_task = asyncio.create_task(_wait_for_model_servers(remote_manager))
+    else:
+        warmup_task = asyncio.create_task(_warmup(manager))
     yield
     # 종료 시 실행 (필요한 경우 리소스 정리)
     logger.info("서버 종료: 리소스를 정리합니다.")
+    if warmup_task is not None:
+        warmup_task.cancel()
+    executor.shutdown()
+    if manager is not None:
+        teardown_model_manager(manager)
 
 
 app = FastAPI(lifespan=lifespan)
+# 처리 중 요청 수 집계 대상 경로 (그 외 경로는 "other"로 묶어 라벨 수 제한)
+_METRIC_ENDPOINTS = {"/analyze", "/analyze-all", "/embed-text", "/refine-mask"}
+
+
+@app.middleware("http")
+async def track_inflight_requests(request: Request, call_next):
+    path = request.url.path
+    endpoint = path if path in _METRIC_ENDPOINTS else "other"
+    gauge = metrics.INFLIGHT_REQUESTS.labels(endpoint=endpoint)
+    gauge.inc()
+    try:
+        response = await call_next(request)
+    except BaseException:
+        gauge.dec()
+        raise
+
+    # 본문(stream=true의 NDJSON 포함)을 모두 보낸 뒤에 감소
+    body_iterator = response.body_iterator
+
+    async def track_body():
+        try:
+            async for chunk in body_iterator:
+                yield chunk
+        finally:
+            gauge.dec()
+
+    response.body_iterator = track_body()
+    return response
 
 
 @app.get("/")
@@ -36,10 +347,86 @@ def read_root():
 
 @app.get("/status")
 def get_status():
-    manager = ModelManager()
-    # 로드된 모델 목록 확인
-    loaded_models = list(manager.models.keys())
-    return {"device": manager.device, "loaded_models": loaded_models}
+    manager = _get_manager()
+    if warmup_state["status"] != "done" and remote_manager is not None:
+        # 모델 서버가 아직 준비되지 않음
+        model_status = {"model_servers": MODEL_SERVER_ADDRESSES}
+    else:
+        # 로드된 모델 목록 / 캐시 상태 확인
+        model_status = manager.status()
+    return {
+        **model_status,
+        "result_cache": result_cache.stats() if result_cache is not None else None,
+        "inference_queue": executor.stats(),
+        "yolo_batching": yolo_batcher.stats(),
+        "sam2_routing": sam2_router.stats(),
+        "warmup": warmup_state,
+    }
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus 수집용 메트릭 (단계별 히스토그램, fallback / SAM2 실패 카운터, 대기열 게이지)"""
+    body, content_type = metrics.render(yolo_batcher.stats())
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/ready")
+def get_ready():
+    """
+    준비 상태 확인 (로드 밸런서 / readiness probe용)
+    모델 로딩과 워밍업이 끝난 뒤에만 200, 그 전이나 워밍업 실패 시 503을 반환합니다.
+    """
+    if warmup_state["status"] != "done":
+        return JSONResponse(status_code=503, content={"ready": False, "warmup": warmup_state})
+    return {"ready": True, "warmup": warmup_state}
+
+
+async def _read_upload(file: UploadFile, chunk_size: int = 1024 * 1024) -> bytes:
+    """업로드를 청크 단위로 읽으며 MAX_UPLOAD_MB를 넘으면 413"""
+    limit = MAX_UPLOAD_MB * 1024 * 1024
+    chunks = []
+    total = 0
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > limit:
+            raise HTTPException(
+                status_code=413, detail=f"업로드 파일이 너무 큽니다 (최대 {MAX_UPLOAD_MB}MB)."
+            )
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _decode_base64_upload(data: str) -> bytes:
+    """JSON 본문의 Base64 이미지를 검증하며 디코딩 (잘못된 Base64는 400, MAX_UPLOAD_MB 초과는 413)"""
+    limit = MAX_UPLOAD_MB * 1024 * 1024
+    # 디코딩 전에 길이로 먼저 거르고 (Base64는 4글자당 3바이트), 디코딩 후 실제 크기로 다시 확인
+    if len(data) // 4 * 3 > limit + 3:
+        raise HTTPException(status_code=413, detail=f"업로드 파일이 너무 큽니다 (최대 {MAX_UPLOAD_MB}MB).")
+    try:
+        contents = base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="image_base64가 올바른 Base64 문자열이 아닙니다.")
+    if len(contents) > limit:
+        raise HTTPException(status_code=413, detail=f"업로드 파일이 너무 큽니다 (최대 {MAX_UPLOAD_MB}MB).")
+    return contents
+
+
+async def _decode_upload(contents: bytes):
+    """헤더 검사 + 축소 디코딩 (실행기에서 실행), 거부된 이미지는 400"""
+    try:
+        return await executor.run(
+            "cpu",
+            utils.decode_image,
+            contents,
+            max_dim=MAX_DECODE_DIM or None,
+            max_pixels=MAX_IMAGE_PIXELS,
+        )
+    except utils.ImageDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.post("/analyze")
@@ -49,17 +436,17 @@ async def analyze_image(file: UploadFile = File(...)):
     """
     try:
         # 1. 이미지 읽기 및 디코딩
-        contents = await file.read()
-        image = utils.decode_image(contents)
+        contents = await _read_upload(file)
+        image = await _decode_upload(contents)
         if image is None:
             raise HTTPException(
                 status_code=400, detail="유효하지 않은 이미지 파일입니다."
             )
 
-        manager = ModelManager()
+        manager = _get_manager()
 
         # 2. YOLO 객체 탐지
-        detections = manager.predict_yolo(image)
+        detections = await yolo_batcher.submit(image, key=0.5)
         if not detections:
             return []  # 탐지된 객체 없음
 
@@ -67,76 +454,349 @@ async def analyze_image(file: UploadFile = File(...)):
         boxes = [d["box"] for d in detections]
 
         # 4. SAM2 세그멘테이션
-        masks = manager.predict_sam2(image, boxes)
+        variant = _choose_sam2_variant(image, len(boxes))
+        masks, _ = await executor.run(
+            "sam2", _timed_sam2, variant, len(boxes), manager.predict_sam2, image, boxes
+        )
+
+        return await executor.run("cpu", _build_analyze_results, image, detections, masks)
+
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"분석 중 오류 발생: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        results = []
-        for i, detection in enumerate(detections):
-            label = detection["label"]
-            confidence = detection["confidence"]
-            box = detection["box"]
-
-            # 마스크가 있으면 적용, 없으면 원본 이미지에서 박스만 크롭 (또는 투명 처리 불가)
-            # SAM2 로딩 실패 시 masks는 None일 수 있음
-            if masks and len(masks) > i:
-                mask = masks[i]
-                processed_image = utils.apply_mask_and_crop(image, mask, box)
-            else:
-                # 마스크가 없는 경우 (SAM2 미로드 등), 박스 영역만 단순 크롭 (배경 투명화 X)
-                # 여기서는 마스크가 없으면 투명 처리가 안 되므로,
-                # 단순히 박스 영역만 잘라서 보낼 수도 있고, 에러를 낼 수도 있음.
-                # 요구사항: "배경을 투명하게 처리한 의류 조각 이미지"
-                # SAM2가 없으면 이 요구사항을 충족 못하므로 경고 로그 남기고 박스 크롭만 반환 시도
-                x1, y1, x2, y2 = map(int, box)
-                processed_image = image[y1:y2, x1:x2]
-                logger.warning(
-                    f"마스크 생성 실패로 인해 단순 크롭 이미지를 반환합니다: {label}"
-                )
 
-            # Base64 인코딩
-            image_base64 = utils.encode_image_to_base64(processed_image)
+def _build_analyze_results(image, detections, masks):
+    """/analyze 아이템별 마스크 적용 + Base64 인코딩 (실행기 스레드에서 실행)"""
+    results = []
+    for i, detection in enumerate(detections):
+        label = detection["label"]
+        confidence = detection["confidence"]
+        box = detection["box"]
 
-            results.append(
-                {
-                    "label": label,
-                    "confidence": confidence,
-                    "box": box.tolist(),  # JSON 직렬화를 위해 리스트 변환
-                    "image_base64": image_base64,
-                }
+        # 마스크가 있으면 적용, 없으면 원본 이미지에서 박스만 크롭 (또는 투명 처리 불가)
+        # SAM2 로딩 실패 시 masks는 None일 수 있음
+        if masks and len(masks) > i:
+            mask = masks[i]
+            processed_image = utils.apply_mask_and_crop(image, mask, box, roi=True)
+        else:
+            # 마스크가 없는 경우 (SAM2 미로드 등), 박스 영역만 단순 크롭 (배경 투명화 X)
+            # 여기서는 마스크가 없으면 투명 처리가 안 되므로,
+            # 단순히 박스 영역만 잘라서 보낼 수도 있고, 에러를 낼 수도 있음.
+            # 요구사항: "배경을 투명하게 처리한 의류 조각 이미지"
+            # SAM2가 없으면 이 요구사항을 충족 못하므로 경고 로그 남기고 박스 크롭만 반환 시도
+            x1, y1, x2, y2 = map(int, box)
+            processed_image = image[y1:y2, x1:x2]
+            logger.warning(
+                f"마스크 생성 실패로 인해 단순 크롭 이미지를 반환합니다: {label}"
             )
 
-        return results
+        # Base64 인코딩
+        image_base64 = utils.encode_image_to_base64(processed_image)
 
-    except Exception as e:
-        logger.error(f"분석 중 오류 발생: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        results.append(
+            {
+                "label": label,
+                "confidence": confidence,
+                "box": box.tolist(),  # JSON 직렬화를 위해 리스트 변환
+                "image_base64": image_base64,
+            }
+        )
+
+    return results
+
+
+def _analyze_pipeline_config(manager, sam2_model: str = None, mask_format: str = "png") -> dict:
+    """
+    /analyze-all 결과에 영향을 주는 설정 (결과 캐시 키에 포함)
+    SAM2 모델을 지정한 요청만 키를 나누고, 라우터가 고른 결과는 예산과 관계없이 공유합니다.
+    """
+    return {
+        "use_sam2": USE_SAM2,
+        "sam2_models": sam2_router.variants,
+        "sam2_model": sam2_model,
+        "mask_format": mask_format,
+        "mask_polygon_tolerance": MASK_POLYGON_TOLERANCE if mask_format == "polygon" else None,
+        "crop_format": CROP_ENCODE_FORMAT,
+        "max_decode_dim": MAX_DECODE_DIM,
+        "yolo_conf": YOLO_CONF_THRESHOLD,
+        "model_versions": manager.model_versions,
+        "clip_labels": manager.clip_labels,
+    }
 
 
 @app.post("/analyze-all")
-async def analyze_all_images(file: UploadFile = File(...)):
+async def analyze_all_images(
+    file: UploadFile = File(...),
+    stream: bool = False,
+    embedding_format: str = "json",
+    sam2_model: Optional[str] = None,
+    sam2_budget_ms: Optional[float] = None,
+    mask_format: str = "png",
+):
     """
     이미지를 받아 YOLO 탐지 -> SAM2 세그멘테이션 -> FashionSigLIP 임베딩 추출을 수행하고
     각 객체별 이미지 조각(Base64)과 임베딩 벡터를 반환합니다.
+    같은 이미지 + 같은 파이프라인 설정의 결과는 캐시에서 반환하며,
+    동시에 들어온 동일 업로드는 하나의 계산을 공유합니다.
+    stream=true이면 NDJSON으로 탐지 결과와 아이템을 완료되는 대로 전송합니다.
+    embedding_format: json(기본) | f32 | f16 | i8 (embedding_codec 참고)
+    sam2_model: SAM2 모델 크기 지정 (SAM2_MODELS 중), sam2_budget_ms: SAM2 지연 시간 예산 (sam2_router 참고)
+    mask_format: png(기본, sam2_image_base64) | rle | polygon (mask 필드, mask_codec 참고)
+    """
+    _check_embedding_format(embedding_format)
+    _check_sam2_model(sam2_model)
+    _check_mask_format(mask_format)
+    sam2_options = {"requested": sam2_model, "budget_ms": sam2_budget_ms}
+    contents = await _read_upload(file)
+    image_key = utils.content_hash(contents)  # 결과 캐시 / SAM2 세션 캐시 / /refine-mask 키
+
+    cache_key = None
+    if result_cache is not None:
+        manager = _get_manager()
+        cache_key = AnalyzeResultCache.make_key(
+            image_key, config_fingerprint(_analyze_pipeline_config(manager, sam2_model, mask_format))
+        )
+
+    if stream:
+        cached = await result_cache.get(cache_key) if cache_key is not None else None
+        return StreamingResponse(
+            _stream_analyze_all(contents, image_key, sam2_options, mask_format, cached, embedding_format),
+            media_type="application/x-ndjson",
+        )
+
+    if cache_key is None:
+        results = await _run_analyze_all(contents, image_key, sam2_options, mask_format)
+    else:
+        results = await result_cache.get_or_compute(
+            cache_key, lambda: _run_analyze_all(contents, image_key, sam2_options, mask_format)
+        )
+
+    if embedding_format == "json":
+        return results
+    # 캐시에 보관된 결과는 수정하지 않고 복사본의 임베딩만 변환
+    return [_encode_item_embedding(item, embedding_format) for item in results]
+
+
+def _check_embedding_format(embedding_format: str):
+    if embedding_format not in EMBEDDING_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"지원하지 않는 embedding_format입니다: {embedding_format} (지원: {', '.join(EMBEDDING_FORMATS)})",
+        )
+
+
+def _check_mask_format(mask_format: str):
+    if mask_format not in MASK_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"지원하지 않는 mask_format입니다: {mask_format} (지원: {', '.join(MASK_FORMATS)})",
+        )
+
+
+def _check_sam2_model(sam2_model: Optional[str]):
+    if sam2_model is not None and sam2_model not in sam2_router.variants:
+        raise HTTPException(
+            status_code=400,
+            detail=f"사용할 수 없는 SAM2 모델입니다: {sam2_model} (사용 가능: {', '.join(sam2_router.variants)})",
+        )
+
+
+def _choose_sam2_variant(image, items: int, sam2_options: dict = None) -> str:
+    """이미지 크기 / 아이템 수 / 예산 / 현재 SAM2 대기열로 이번 요청의 SAM2 모델 크기 선택"""
+    h, w = image.shape[:2]
+    variant = sam2_router.choose(
+        w,
+        h,
+        items,
+        queue_depth=executor.model_pending("sam2"),
+        concurrency=executor.model_limits.get("sam2", 1),
+        available=_get_manager().loaded_sam2_variants(),
+        **(sam2_options or {}),
+    )
+    metrics.SAM2_SELECTED.labels(model=variant).inc()
+    logger.info(f"[SAM2] 모델 선택: {variant} ({w}x{h}, {items} items)")
+    return variant
+
+
+def _timed_sam2(variant: str, items: int, fn, *args, **kwargs):
+    """
+    실행기 스레드에서 SAM2 호출 시간(대기열 대기 제외)을 재어 라우터 추정치에 반영
+    세션 캐시 hit(이미지 인코더 생략)은 추정치를 낮추지 않도록 기록하지 않습니다.
+    Returns:
+        tuple: (결과, 실제로 사용한 모델 크기 - 선택한 모델이 로드되지 않았으면 다른 크기)
+    """
+    import time
+
+    start = time.time()
+    result, info = fn(*args, variant=variant, with_info=True, **kwargs)
+    if result is not None and info["encoded"]:
+        sam2_router.record(info["variant"], items, (time.time() - start) * 1000)
+    return result, info["variant"]
+
+
+def _encode_item_embedding(item: dict, embedding_format: str) -> dict:
+    if embedding_format == "json":
+        return item
+    return {
+        **item,
+        "embedding": encode_embedding(item["embedding"], embedding_format),
+        "embedding_format": embedding_format,
+    }
+
+
+def _ndjson(payload: dict) -> str:
+    return json.dumps(payload, ensure_ascii=False) + "\n"
+
+
+def _detections_event(items: list, image_key: str) -> dict:
+    """스트리밍 첫 이벤트: 크롭/임베딩 없이 탐지 결과만"""
+    return {
+        "type": "detections",
+        "image_key": image_key,
+        "items": [
+            {
+                "index": i,
+                "label": item["label"],
+                "confidence": item["confidence"],
+                "box": item["box"],
+            }
+            for i, item in enumerate(items)
+        ],
+    }
+
+
+async def _stream_analyze_all(
+    contents: bytes,
+    image_key: str,
+    sam2_options: dict,
+    mask_format: str = "png",
+    cached: list = None,
+    embedding_format: str = "json",
+):
+    """
+    /analyze-all 스트리밍 모드 (NDJSON)
+    - {"type": "detections", ...}  YOLO 직후 (라벨 / confidence / box)
+    - {"type": "item", "index": i, ...}  아이템별 크롭 + 임베딩이 끝날 때마다
+    - {"type": "done", "count": n}  또는 {"type": "error", "status_code": ..., "detail": ...}
+      (status_code / detail은 일반 모드에서 같은 오류가 났을 때의 HTTP 응답과 동일)
+    전체 결과를 메모리에 모으지 않으므로 결과 캐시에는 저장하지 않습니다 (조회만 사용).
     """
     import time
 
     total_start = time.time()
 
     try:
-        # 1. 이미지 읽기 및 디코딩
+        # 캐시 hit 또는 CLIP fallback: 완성된 결과를 같은 이벤트 형식으로 전송
+        if cached is not None:
+            items = cached
+        else:
+            items = None
+            with metrics.stage_timer("decode"):
+                image = await _decode_upload(contents)
+            if image is None:
+                yield _ndjson({"type": "error", "status_code": 400, "detail": "유효하지 않은 이미지 파일입니다."})
+                return
+
+            manager = _get_manager()
+            yolo_start = time.time()
+            detections = await yolo_batcher.submit(image, key=YOLO_CONF_THRESHOLD)
+            metrics.observe("yolo", time.time() - yolo_start)
+            logger.info(
+                f"[TIMING] (stream) YOLO detection: {(time.time() - total_start)*1000:.1f}ms, found {len(detections)} items"
+            )
+            if not detections:
+                items = await _run_clip_fallback(image, image_key, total_start, sam2_options, mask_format)
+
+        if items is not None:
+            yield _ndjson(_detections_event(items, image_key))
+            for i, item in enumerate(items):
+                item = _encode_item_embedding(item, embedding_format)
+                yield _ndjson({"type": "item", "index": i, **item})
+            yield _ndjson({"type": "done", "count": len(items)})
+            return
+
+        yield _ndjson(
+            _detections_event(
+                [{**d, "box": d["box"].tolist()} for d in detections], image_key
+            )
+        )
+
+        # SAM2는 모든 박스를 한 번에 디코딩
+        masks = None
+        variant = None
+        if USE_SAM2:
+            boxes = [d["box"] for d in detections]
+            variant = _choose_sam2_variant(image, len(boxes), sam2_options)
+            with metrics.stage_timer("sam2"):
+                masks, variant = await executor.run(
+                    "sam2", _timed_sam2, variant, len(boxes),
+                    manager.predict_sam2, image, boxes, image_key=image_key,
+                )
+            if masks is None:
+                metrics.SAM2_FAILURES.labels(path="analyze_all").inc()
+
+        # 아이템별 크롭/인코딩 + 임베딩이 끝나는 대로 전송
+        for i, detection in enumerate(detections):
+            mask = masks[i] if masks and len(masks) > i else None
+            with metrics.stage_timer("crop_encode_item"):
+                result, processed_image = await executor.run(
+                    "cpu", _build_item, image, detection, mask, i, image_key, variant, mask_format
+                )
+            with metrics.stage_timer("embedding_item"):
+                embeddings = await executor.run(
+                    "embedding", manager.extract_embeddings, [processed_image]
+                )
+            result["embedding"] = embeddings[0]
+            result = _encode_item_embedding(result, embedding_format)
+            yield _ndjson({"type": "item", "index": i, **result})
+
+        yield _ndjson({"type": "done", "count": len(detections)})
+        metrics.observe("total", time.time() - total_start)
+        logger.info(
+            f"[TIMING] Total FastAPI processing (stream): {(time.time() - total_start)*1000:.1f}ms"
+        )
+
+    except HTTPException as e:
+        logger.error(f"스트리밍 분석 중 오류 발생: {e.status_code} {e.detail}")
+        yield _ndjson({"type": "error", "status_code": e.status_code, "detail": e.detail})
+    except QueueFullError as e:
+        logger.error(f"스트리밍 분석 중 오류 발생: {e}")
+        yield _ndjson({"type": "error", "status_code": 503, "detail": str(e)})
+    except Exception as e:
+        logger.error(f"스트리밍 분석 중 오류 발생: {e}")
+        yield _ndjson({"type": "error", "status_code": 500, "detail": str(e)})
+
+
+async def _run_analyze_all(
+    contents: bytes, image_key: str, sam2_options: dict = None, mask_format: str = "png"
+):
+    """/analyze-all 파이프라인 본체 (캐시 미스 시 실행)"""
+    import time
+
+    total_start = time.time()
+
+    try:
+        # 1. 이미지 디코딩
         decode_start = time.time()
-        contents = await file.read()
-        image = utils.decode_image(contents)
+        image = await _decode_upload(contents)
         if image is None:
             raise HTTPException(
                 status_code=400, detail="유효하지 않은 이미지 파일입니다."
             )
+        metrics.observe("decode", time.time() - decode_start)
         logger.info(f"[TIMING] Image decode: {(time.time() - decode_start)*1000:.1f}ms")
 
-        manager = ModelManager()
+        manager = _get_manager()
 
         # 2. YOLO 객체 탐지
         yolo_start = time.time()
-        detections = manager.predict_yolo(image)
+        detections = await yolo_batcher.submit(image, key=YOLO_CONF_THRESHOLD)
+        metrics.observe("yolo", time.time() - yolo_start)
         logger.info(
             f"[TIMING] YOLO detection: {(time.time() - yolo_start)*1000:.1f}ms, found {len(detections)} items"
         )
@@ -157,168 +817,323 @@ async def analyze_all_images(file: UploadFile = File(...)):
         # YOLO Fallback: CLIP으로 신발/의류 감지 → SAM2 중앙점 프롬프트
         # ============================================================
         if not detections:
-            logger.warning(
-                "[YOLO FALLBACK] 탐지된 객체 없음 - CLIP으로 아이템 타입 확인"
-            )
-
-            # 1. CLIP으로 신발/의류 여부 확인
-            clip_result = manager.detect_item_type_with_clip(image)
-            item_type = clip_result["item_type"]
-
-            if item_type == "unknown":
-                logger.warning(
-                    "[YOLO FALLBACK] CLIP도 패션 아이템으로 인식하지 못함 - 빈 결과 반환"
-                )
-                return []
-
-            logger.info(
-                f"[YOLO FALLBACK] CLIP 감지: {item_type} (confidence: {clip_result['confidence']:.2%})"
-            )
-
-            h, w = image.shape[:2]
-            # 신발 한 쌍을 위해 3개 포인트 사용 (왼쪽, 중앙, 오른쪽)
-            points = [
-                [w // 4, h // 2],  # 왼쪽 1/4 지점
-                [w // 2, h // 2],  # 중앙
-                [3 * w // 4, h // 2],  # 오른쪽 3/4 지점
-            ]
-            full_box = np.array([0, 0, w, h])
-
-            # 2. SAM2로 여러 포인트 기준 세그멘테이션
-            # CLIP fallback의 경우 원본 이미지가 YOLO 크롭 역할
-            yolo_image_base64 = utils.encode_image_to_base64(image)
-            sam2_image_base64 = None
-            processed_image = image
-
-            if USE_SAM2:
-                try:
-                    sam_start = time.time()
-                    # 여러 포인트 프롬프트로 SAM2 호출 (신발 한 쌍 모두 마스킹)
-                    mask = manager.predict_sam2_with_points(image, points)
-                    logger.info(
-                        f"[TIMING] SAM2 multi-point segmentation: {(time.time() - sam_start)*1000:.1f}ms"
-                    )
-
-                    if mask is not None:
-                        processed_image = utils.apply_mask_and_crop(
-                            image, mask, full_box
-                        )
-                        sam2_image_base64 = utils.encode_image_to_base64(processed_image)
-                        logger.info("[YOLO FALLBACK] SAM2 마스크 적용 성공 (3-points)")
-                    else:
-                        logger.warning(
-                            "[YOLO FALLBACK] SAM2 마스크 생성 실패, 원본 이미지 사용"
-                        )
-                except Exception as e:
-                    logger.error(f"[YOLO FALLBACK] SAM2 실패: {e}")
-
-            # 3. Base64 인코딩 (SAM2 우선, 없으면 YOLO)
-            image_base64 = sam2_image_base64 if sam2_image_base64 else yolo_image_base64
-
-            # 4. FashionSigLIP 임베딩 추출
-            embed_start = time.time()
-            embedding = manager.extract_embedding(processed_image)
-            logger.info(
-                f"[TIMING] Embedding (fallback): {(time.time() - embed_start)*1000:.1f}ms"
-            )
-
-            # 5. CLIP 감지 결과를 label로 전달 (Bedrock 힌트용)
-            result = [
-                {
-                    "label": item_type,  # 'shoes' 또는 'clothing' - Bedrock 힌트
-                    "confidence": clip_result["confidence"],
-                    "box": full_box.tolist(),
-                    "yolo_image_base64": yolo_image_base64,      # 원본 이미지 (YOLO 역할)
-                    "sam2_image_base64": sam2_image_base64,      # SAM2 배경 제거 (없으면 None)
-                    "image_base64": image_base64,                # 기존 호환용
-                    "embedding": embedding,
-                }
-            ]
-
-            logger.info(
-                f"[TIMING] Total FastAPI processing (CLIP fallback): {(time.time() - total_start)*1000:.1f}ms"
-            )
-            return result
+            return await _run_clip_fallback(image, image_key, total_start, sam2_options, mask_format)
 
         # 3. 바운딩 박스 추출
         boxes = [d["box"] for d in detections]
 
         # 4. SAM2 세그멘테이션 (USE_SAM2=true일 때만 실행)
         masks = None
+        variant = None
         if USE_SAM2:
+            variant = _choose_sam2_variant(image, len(boxes), sam2_options)
             sam_start = time.time()
-            masks = manager.predict_sam2(image, boxes)
+            masks, variant = await executor.run(
+                "sam2", _timed_sam2, variant, len(boxes),
+                manager.predict_sam2, image, boxes, image_key=image_key,
+            )
+            metrics.observe("sam2", time.time() - sam_start)
+            if masks is None:
+                metrics.SAM2_FAILURES.labels(path="analyze_all").inc()
             logger.info(
-                f"[TIMING] SAM2 segmentation: {(time.time() - sam_start)*1000:.1f}ms"
+                f"[TIMING] SAM2 segmentation ({variant}): {(time.time() - sam_start)*1000:.1f}ms"
             )
         else:
             logger.info("[TIMING] SAM2 비활성화 - 단순 크롭 사용")
 
-        results = []
-        for i, detection in enumerate(detections):
-            item_start = time.time()
-            label = detection["label"]
-            confidence = detection["confidence"]
-            box = detection["box"]
-
-            # YOLO 바운딩박스 크롭 이미지 (항상 생성)
-            x1, y1, x2, y2 = map(int, box)
-            yolo_cropped_image = image[y1:y2, x1:x2]
-            yolo_image_base64 = utils.encode_image_to_base64(yolo_cropped_image)
-
-            # SAM2 마스킹 이미지 (마스크가 있을 때만 생성)
-            sam2_image_base64 = None
-            if USE_SAM2 and masks and len(masks) > i:
-                mask = masks[i]
-                sam2_masked_image = utils.apply_mask_and_crop(image, mask, box)
-                sam2_image_base64 = utils.encode_image_to_base64(sam2_masked_image)
-                processed_image = sam2_masked_image  # 임베딩용
-            else:
-                processed_image = yolo_cropped_image  # 임베딩용
-                logger.warning(f"마스크 생성 실패, 단순 크롭 사용: {label}")
-
-            # 5. Base64 인코딩 (기존 호환용 - SAM2 우선, 없으면 YOLO)
-            encode_start = time.time()
-            image_base64 = sam2_image_base64 if sam2_image_base64 else yolo_image_base64
-            logger.info(
-                f"[TIMING] Item {i} base64 encode: {(time.time() - encode_start)*1000:.1f}ms, size={len(image_base64)} chars"
-            )
-
-            # 6. FashionSigLIP 임베딩 추출
-            embed_start = time.time()
-            embedding = manager.extract_embedding(processed_image)
-            logger.info(
-                f"[TIMING] Item {i} embedding: {(time.time() - embed_start)*1000:.1f}ms"
-            )
-
-            logger.info(
-                f"[TIMING] Item {i} total: {(time.time() - item_start)*1000:.1f}ms"
+        with metrics.stage_timer("crop_encode"):
+            results, processed_images = await executor.run(
+                "cpu", _build_item_results, image, detections, masks, image_key, variant, mask_format
             )
 
-            results.append(
-                {
-                    "label": label,
-                    "confidence": confidence,
-                    "box": box.tolist(),
-                    "yolo_image_base64": yolo_image_base64,      # YOLO 바운딩박스 크롭
-                    "sam2_image_base64": sam2_image_base64,      # SAM2 배경 제거 (없으면 None)
-                    "image_base64": image_base64,                # 기존 호환용
-                    "embedding": embedding,
-                }
-            )
+        # 6. FashionSigLIP 임베딩 추출 (모든 아이템을 한 번의 forward pass로)
+        embed_start = time.time()
+        embeddings = await executor.run(
+            "embedding", manager.extract_embeddings, processed_images
+        )
+        for result, embedding in zip(results, embeddings):
+            result["embedding"] = embedding
+        metrics.observe("embedding", time.time() - embed_start)
+        logger.info(
+            f"[TIMING] Batched embedding ({len(processed_images)} items): {(time.time() - embed_start)*1000:.1f}ms"
+        )
 
+        metrics.observe("total", time.time() - total_start)
         logger.info(
             f"[TIMING] Total FastAPI processing: {(time.time() - total_start)*1000:.1f}ms"
         )
         return results
 
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"통합 분석 중 오류 발생: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-from pydantic import BaseModel
-from typing import List
+async def _run_clip_fallback(
+    image, image_key: str, total_start: float, sam2_options: dict = None, mask_format: str = "png"
+):
+    """
+    YOLO Fallback: CLIP으로 신발/의류 감지 → SAM2 멀티 포인트 프롬프트
+    YOLO가 아무것도 찾지 못했을 때 이미지 전체를 하나의 아이템으로 처리합니다.
+    """
+    import time
+
+    manager = _get_manager()
+
+    logger.warning(
+        "[YOLO FALLBACK] 탐지된 객체 없음 - CLIP으로 아이템 타입 확인"
+    )
+
+    # 1. CLIP으로 신발/의류 여부 확인
+    with metrics.stage_timer("clip"):
+        clip_result = await executor.run(
+            "clip", manager.detect_item_type_with_clip, image
+        )
+    item_type = clip_result["item_type"]
+    metrics.YOLO_FALLBACK.labels(item_type=item_type).inc()
+
+    if item_type == "unknown":
+        logger.warning(
+            "[YOLO FALLBACK] CLIP도 패션 아이템으로 인식하지 못함 - 빈 결과 반환"
+        )
+        return []
+
+    logger.info(
+        f"[YOLO FALLBACK] CLIP 감지: {item_type} (confidence: {clip_result['confidence']:.2%})"
+    )
+
+    h, w = image.shape[:2]
+    # 신발 한 쌍을 위해 3개 포인트 사용 (왼쪽, 중앙, 오른쪽)
+    points = [
+        [w // 4, h // 2],  # 왼쪽 1/4 지점
+        [w // 2, h // 2],  # 중앙
+        [3 * w // 4, h // 2],  # 오른쪽 3/4 지점
+    ]
+    full_box = np.array([0, 0, w, h])
+
+    # 2. SAM2로 여러 포인트 기준 세그멘테이션
+    # CLIP fallback의 경우 원본 이미지가 YOLO 크롭 역할
+    yolo_image_base64 = await executor.run(
+        "cpu", utils.encode_image_to_base64, image
+    )
+    sam2_image_base64 = None
+    sam2_model = None
+    compact_mask = None
+    processed_image = image
+
+    if USE_SAM2:
+        try:
+            variant = _choose_sam2_variant(image, 1, sam2_options)
+            sam_start = time.time()
+            # 여러 포인트 프롬프트로 SAM2 호출 (신발 한 쌍 모두 마스킹)
+            mask, variant = await executor.run(
+                "sam2",
+                _timed_sam2,
+                variant,
+                1,
+                manager.predict_sam2_with_points,
+                image,
+                points,
+                image_key=image_key,
+            )
+            metrics.observe("sam2", time.time() - sam_start)
+            logger.info(
+                f"[TIMING] SAM2 multi-point segmentation: {(time.time() - sam_start)*1000:.1f}ms"
+            )
+
+            if mask is not None:
+                processed_image = await executor.run(
+                    "cpu", utils.apply_mask_and_crop, image, mask, full_box
+                )
+                if mask_format == "png":
+                    sam2_image_base64 = await executor.run(
+                        "cpu", utils.encode_image_to_base64, processed_image
+                    )
+                else:
+                    compact_mask = await executor.run(
+                        "cpu", encode_mask, image.shape, mask, full_box, mask_format, MASK_POLYGON_TOLERANCE
+                    )
+                sam2_model = variant
+                logger.info("[YOLO FALLBACK] SAM2 마스크 적용 성공 (3-points)")
+            else:
+                metrics.SAM2_FAILURES.labels(path="clip_fallback").inc()
+                logger.warning(
+                    "[YOLO FALLBACK] SAM2 마스크 생성 실패, 원본 이미지 사용"
+                )
+        except QueueFullError:
+            raise
+        except Exception as e:
+            metrics.SAM2_FAILURES.labels(path="clip_fallback").inc()
+            logger.error(f"[YOLO FALLBACK] SAM2 실패: {e}")
+
+    # 3. Base64 인코딩 (SAM2 우선, 없으면 YOLO)
+    image_base64 = sam2_image_base64 if sam2_image_base64 else yolo_image_base64
+
+    # 4. FashionSigLIP 임베딩 추출
+    embed_start = time.time()
+    embeddings = await executor.run(
+        "embedding", manager.extract_embeddings, [processed_image]
+    )
+    embedding = embeddings[0]
+    metrics.observe("embedding", time.time() - embed_start)
+    logger.info(
+        f"[TIMING] Embedding (fallback): {(time.time() - embed_start)*1000:.1f}ms"
+    )
+
+    # 5. CLIP 감지 결과를 label로 전달 (Bedrock 힌트용)
+    result = [
+        {
+            "label": item_type,  # 'shoes' 또는 'clothing' - Bedrock 힌트
+            "confidence": clip_result["confidence"],
+            "box": full_box.tolist(),
+            "yolo_image_base64": yolo_image_base64,      # 원본 이미지 (YOLO 역할)
+            "sam2_image_base64": sam2_image_base64,      # SAM2 배경 제거 (없으면 None)
+            "sam2_model": sam2_model,                    # 마스크를 만든 SAM2 모델 크기 (없으면 None)
+            "image_base64": image_base64,                # 기존 호환용
+            "embedding": embedding,
+            "image_key": image_key,                      # /refine-mask 세션 키
+        }
+    ]
+    if compact_mask is not None:
+        result[0]["mask"] = compact_mask  # 박스 영역 RLE / 다각형 (mask_format=rle|polygon)
+
+    metrics.observe("total", time.time() - total_start)
+    logger.info(
+        f"[TIMING] Total FastAPI processing (CLIP fallback): {(time.time() - total_start)*1000:.1f}ms"
+    )
+    return result
+
+
+def _build_item_results(image, detections, masks, image_key, sam2_model=None, mask_format="png"):
+    """
+    /analyze-all 아이템별 YOLO 크롭 / SAM2 마스킹 / Base64 인코딩 (실행기 스레드에서 실행)
+    모든 아이템의 크롭을 모은 뒤 한 번에 병렬 인코딩합니다.
+    Returns:
+        tuple: (결과 dict 리스트 - embedding은 None, 임베딩용 이미지 리스트)
+    """
+    import time
+
+    crops = []
+    item_masks = []
+    for i, detection in enumerate(detections):
+        mask = masks[i] if masks and len(masks) > i else None
+        crops.append(_crop_item(image, detection, mask))
+        item_masks.append(mask)
+
+    encode_start = time.time()
+    encoded = _encode_crops(crops, mask_format)
+    logger.info(
+        f"[TIMING] Crop encode ({len(detections)} items, parallel): {(time.time() - encode_start)*1000:.1f}ms"
+    )
+
+    results = [
+        _item_result(
+            detection, yolo_image_base64, sam2_image_base64, image_key,
+            sam2_model if crop[1] is not None else None,
+            _compact_mask(image, detection, mask, crop, mask_format),
+        )
+        for detection, crop, mask, (yolo_image_base64, sam2_image_base64)
+        in zip(detections, crops, item_masks, encoded)
+    ]
+    processed_images = [_embedding_input(crop) for crop in crops]
+    return results, processed_images
+
+
+def _build_item(image, detection, mask, index, image_key, sam2_model=None, mask_format="png"):
+    """
+    아이템 하나의 YOLO 크롭 / SAM2 마스킹 / Base64 인코딩 (실행기 스레드에서 실행)
+    Returns:
+        tuple: (결과 dict - embedding은 None, 임베딩용 이미지)
+    """
+    import time
+
+    item_start = time.time()
+    crop = _crop_item(image, detection, mask)
+    yolo_image_base64, sam2_image_base64 = _encode_crops([crop], mask_format)[0]
+    logger.info(
+        f"[TIMING] Item {index} total: {(time.time() - item_start)*1000:.1f}ms"
+    )
+    result = _item_result(
+        detection, yolo_image_base64, sam2_image_base64, image_key,
+        sam2_model if crop[1] is not None else None,
+        _compact_mask(image, detection, mask, crop, mask_format),
+    )
+    return result, _embedding_input(crop)
+
+
+def _crop_item(image, detection, mask):
+    """
+    YOLO 바운딩박스 크롭(항상)과 SAM2 마스킹 이미지(마스크가 있을 때만)를 생성합니다.
+    mask는 predict_sam2가 반환한 박스 크기 마스크입니다.
+    Returns:
+        tuple: (yolo_cropped_image, sam2_masked_image 또는 None)
+    """
+    box = detection["box"]
+
+    # YOLO 바운딩박스 크롭 이미지 (항상 생성)
+    x1, y1, x2, y2 = map(int, box)
+    yolo_cropped_image = image[y1:y2, x1:x2]
+
+    # SAM2 마스킹 이미지 (마스크가 있을 때만 생성)
+    sam2_masked_image = None
+    if USE_SAM2 and mask is not None:
+        sam2_masked_image = utils.apply_mask_and_crop(image, mask, box, roi=True)
+    else:
+        logger.warning(f"마스크 생성 실패, 단순 크롭 사용: {detection['label']}")
+    return yolo_cropped_image, sam2_masked_image
+
+
+def _embedding_input(crop):
+    """임베딩용 이미지: SAM2 마스킹 이미지 우선, 없으면 YOLO 크롭"""
+    yolo_cropped_image, sam2_masked_image = crop
+    return sam2_masked_image if sam2_masked_image is not None else yolo_cropped_image
+
+
+def _encode_crops(crops, mask_format="png"):
+    """
+    [(yolo, sam2 또는 None), ...] 크롭들을 병렬 인코딩하여 같은 구조의 Base64로 반환
+    mask_format이 rle / polygon이면 SAM2 마스킹 이미지는 인코딩하지 않음 (마스크는 mask 필드로 전송)
+    """
+    if mask_format != "png":
+        crops = [(yolo_cropped_image, None) for yolo_cropped_image, _ in crops]
+    images = [image for crop in crops for image in crop if image is not None]
+    encoded = iter(image_encoder.encode_many(images))
+    return [
+        tuple(next(encoded) if image is not None else None for image in crop)
+        for crop in crops
+    ]
+
+
+def _compact_mask(image, detection, mask, crop, mask_format):
+    """mask_format이 rle / polygon일 때 박스 영역 마스크 (png이거나 마스크가 없으면 None)"""
+    if mask_format == "png" or crop[1] is None:
+        return None
+    return encode_mask(image.shape, mask, detection["box"], mask_format, MASK_POLYGON_TOLERANCE, roi=True)
+
+
+def _item_result(
+    detection, yolo_image_base64, sam2_image_base64, image_key, sam2_model=None, mask=None
+):
+    # Base64 (기존 호환용 - SAM2 우선, 없으면 YOLO)
+    image_base64 = sam2_image_base64 if sam2_image_base64 else yolo_image_base64
+    result = {
+        "label": detection["label"],
+        "confidence": detection["confidence"],
+        "box": detection["box"].tolist(),
+        "yolo_image_base64": yolo_image_base64,      # YOLO 바운딩박스 크롭
+        "sam2_image_base64": sam2_image_base64,      # SAM2 배경 제거 (없으면 None)
+        "sam2_model": sam2_model,                    # 마스크를 만든 SAM2 모델 크기 (없으면 None)
+        "image_base64": image_base64,                # 기존 호환용
+        "embedding": None,                           # 호출부에서 채움
+        "image_key": image_key,                      # /refine-mask 세션 키
+    }
+    if mask is not None:
+        result["mask"] = mask                        # 박스 영역 RLE / 다각형 (mask_format=rle|polygon)
+    return result
 
 
 class TextEmbeddingRequest(BaseModel):
@@ -326,27 +1141,153 @@ class TextEmbeddingRequest(BaseModel):
 
 
 @app.post("/embed-text")
-async def embed_text(request: TextEmbeddingRequest):
+async def embed_text(request: TextEmbeddingRequest, embedding_format: str = "json"):
     """
     텍스트 리스트를 받아 각각의 임베딩 벡터를 반환합니다.
     Request body: {"texts": ["White Solid Casual", "Black Stripe Formal"]}
     Response: {"embeddings": [[0.1, 0.2, ...], [0.3, 0.4, ...]]}
+    embedding_format=f32|f16|i8이면 각 임베딩을 Base64 바이너리로 반환합니다. (embedding_codec 참고)
     """
+    _check_embedding_format(embedding_format)
     try:
-        manager = ModelManager()
-        embeddings = []
-
-        for text in request.texts:
-            embedding = manager.extract_text_embedding(text)
-            embeddings.append(embedding)
+        manager = _get_manager()
+        # 전체 리스트를 한 번에 토큰화하고 청크 단위로 인코딩
+        with metrics.stage_timer("text_embedding"):
+            embeddings = await executor.run(
+                "clip",
+                manager.extract_text_embeddings,
+                request.texts,
+                chunk_size=TEXT_EMBED_CHUNK_SIZE,
+            )
 
-        return {"embeddings": embeddings}
+        if embedding_format == "json":
+            return {"embeddings": embeddings.tolist()}
+        return {
+            "embeddings": encode_embeddings(embeddings, embedding_format),
+            "embedding_format": embedding_format,
+        }
 
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"텍스트 임베딩 중 오류 발생: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class RefineMaskRequest(BaseModel):
+    image_key: Optional[str] = None  # /analyze-all 응답의 image_key
+    image_base64: Optional[str] = None  # 세션이 만료된 경우 원본 이미지 재전송
+    points: List[List[float]] = []  # [[x, y], ...] 추가 클릭 좌표
+    labels: List[int] = []  # 각 클릭의 라벨 (1=positive, 0=negative)
+    box: Optional[List[float]] = None  # 선택적 [x1, y1, x2, y2] 박스 프롬프트
+    sam2_model: Optional[str] = None  # SAM2 모델 크기 (없으면 /analyze-all과 같은 모델)
+    mask_format: str = "png"  # png: sam2_image_base64 / rle | polygon: 박스 영역 mask
+
+
+@app.post("/refine-mask")
+async def refine_mask(request: RefineMaskRequest):
+    """
+    라벨링 UI에서 잘못된 마스크를 추가 클릭으로 보정합니다.
+    /analyze-all에서 계산한 SAM2 이미지 임베딩을 세션 캐시에서 재사용하므로
+    이미지 인코더를 다시 실행하지 않고 마스크 디코더만 실행합니다.
+    Request body: {"image_key": "...", "points": [[120, 340]], "labels": [0], "box": [x1, y1, x2, y2]}
+    """
+    import time
+
+    start = time.time()
+    if len(request.points) != len(request.labels):
+        raise HTTPException(
+            status_code=400, detail="points와 labels의 길이가 일치해야 합니다."
+        )
+    if not request.points and request.box is None:
+        raise HTTPException(
+            status_code=400, detail="points 또는 box 중 하나는 필요합니다."
+        )
+    _check_sam2_model(request.sam2_model)
+    _check_mask_format(request.mask_format)
+
+    manager = _get_manager()
+    try:
+        # 지연 로딩 설정이면 첫 요청에서 로드
+        if not await executor.run("sam2", manager.ensure_loaded, "sam2"):
+            raise HTTPException(status_code=503, detail="SAM2 모델이 로드되지 않았습니다.")
+
+        if request.image_base64:
+            contents = _decode_base64_upload(request.image_base64)
+            image_key = utils.content_hash(contents)
+            # 모델 서버 모드에서는 원격 호출이므로 실행기에서 조회
+            image = await executor.run("cpu", manager.get_sam2_session_image, image_key)
+            if image is None:
+                image = await _decode_upload(contents)
+        else:
+            image_key = request.image_key
+            image = (
+                await executor.run("cpu", manager.get_sam2_session_image, image_key)
+                if image_key
+                else None
+            )
+
+        if image is None:
+            # 세션 만료 또는 잘못된 키: 클라이언트가 image_base64로 다시 보내야 함
+            raise HTTPException(
+                status_code=404,
+                detail="세션이 만료되었거나 이미지가 없습니다. image_base64를 함께 보내주세요.",
+            )
+
+        mask = await executor.run(
+            "sam2",
+            manager.refine_sam2_mask,
+            image,
+            image_key,
+            request.points,
+            request.labels,
+            box=request.box,
+            variant=request.sam2_model,
+        )
+        if mask is None or not mask.any():
+            metrics.SAM2_FAILURES.labels(path="refine_mask").inc()
+            raise HTTPException(status_code=422, detail="마스크를 생성하지 못했습니다.")
+
+        # 박스 프롬프트가 있으면 박스, 없으면 마스크 외곽 사각형으로 크롭
+        if request.box is not None:
+            box = np.array(request.box)
+        else:
+            ys, xs = np.nonzero(mask)
+            box = np.array([xs.min(), ys.min(), xs.max() + 1, ys.max() + 1])
+
+        if request.mask_format != "png":
+            compact_mask = await executor.run(
+                "cpu", encode_mask, image.shape, mask, box, request.mask_format, MASK_POLYGON_TOLERANCE
+            )
+            metrics.observe("refine_mask", time.time() - start)
+            logger.info(f"[TIMING] Refine mask ({request.mask_format}): {(time.time() - start)*1000:.1f}ms")
+            return {
+                "image_key": image_key,
+                "box": box.tolist(),
+                "sam2_image_base64": None,
+                "mask": compact_mask,
+            }
+
+        masked_image = await executor.run("cpu", utils.apply_mask_and_crop, image, mask, box)
+        sam2_image_base64 = await executor.run("cpu", utils.encode_image_to_base64, masked_image)
+        metrics.observe("refine_mask", time.time() - start)
+        logger.info(f"[TIMING] Refine mask: {(time.time() - start)*1000:.1f}ms")
+
+        return {
+            "image_key": image_key,
+            "box": box.tolist(),
+            "sam2_image_base64": sam2_image_base64,
+        }
+
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"마스크 보정 중 오류 발생: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # =============================================================================
 # IDM-VTON 전처리 엔드포인트 (향후 실제 모델 통합 예정)
 # =============================================================================
@@ -0,0 +1,132 @@
+"""
+SAM2 마스크 응답 인코딩
+
+기본값(png)은 기존과 같이 마스크를 BGRA PNG(sam2_image_base64)에 적용해 보내고,
+요청 시 마스크 자체를 박스 영역으로 잘라 가벼운 형식으로 보냅니다. (클라이언트가 원본 / YOLO 크롭에 직접 합성)
+- rle:     {"format": "rle", "origin": [x1, y1], "size": [h, w], "counts": "..."}
+           COCO 압축 RLE (column-major, pycocotools.mask.decode({"size", "counts"})로 복원 가능)
+- polygon: {"format": "polygon", "origin": [x1, y1], "size": [h, w], "polygons": [[x, y, x, y, ...], ...]}
+           외곽선을 Douglas-Peucker로 단순화한 다각형 (좌표는 origin 기준, 구멍은 표현하지 않음)
+"""
+
+import cv2
+import numpy as np
+
+import utils
+
+MASK_FORMATS = ("png", "rle", "polygon")
+
+
+def rle_counts(mask: np.ndarray) -> list:
+    """마스크의 column-major run-length (0의 길이부터 시작, COCO 규칙)"""
+    flat = np.asarray(mask, dtype=bool).ravel(order="F")
+    if flat.size == 0:
+        return []
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    counts = np.diff(np.concatenate(([0], changes, [flat.size])))
+    if flat[0]:
+        counts = np.concatenate(([0], counts))
+    return counts.tolist()
+
+
+def _counts_to_string(counts: list) -> str:
+    """pycocotools rleToString과 같은 LEB128 변형 (5비트 단위, 2칸 전 값과의 차분)"""
+    chars = []
+    for i, count in enumerate(counts):
+        x = count - counts[i - 2] if i > 2 else count
+        more = True
+        while more:
+            c = x & 0x1F
+            x >>= 5
+            more = x != -1 if c & 0x10 else x != 0
+            if more:
+                c |= 0x20
+            chars.append(chr(c + 48))
+    return "".join(chars)
+
+
+def _string_to_counts(text: str) -> list:
+    """_counts_to_string의 역변환 (pycocotools rleFrString)"""
+    counts = []
+    pos = 0
+    while pos < len(text):
+        x = 0
+        shift = 0
+        more = True
+        while more:
+            c = ord(text[pos]) - 48
+            x |= (c & 0x1F) << shift
+            more = bool(c & 0x20)
+            pos += 1
+            shift += 5
+            if not more and c & 0x10:
+                x |= -1 << shift
+        if len(counts) > 2:
+            x += counts[-2]
+        counts.append(x)
+    return counts
+
+
+def encode_rle(mask: np.ndarray) -> dict:
+    """bool 마스크 (H, W) -> COCO 압축 RLE"""
+    return {"size": list(mask.shape[:2]), "counts": _counts_to_string(rle_counts(mask))}
+
+
+def decode_rle(rle: dict) -> np.ndarray:
+    """COCO 압축 RLE -> bool 마스크 (H, W)"""
+    h, w = rle["size"]
+    counts = _string_to_counts(rle["counts"])
+    values = np.zeros(len(counts), dtype=bool)
+    values[1::2] = True
+    flat = np.repeat(values, counts)
+    return flat.reshape((w, h)).T
+
+
+def encode_polygons(mask: np.ndarray, tolerance: float = 1.0, min_area: float = 4.0) -> list:
+    """
+    bool 마스크 (H, W) -> 외곽선 다각형 리스트
+    Args:
+        tolerance (float): Douglas-Peucker 허용 오차 (px, 0이면 단순화하지 않음)
+        min_area (float): 이보다 작은 조각(노이즈)은 제외 (px²)
+    Returns:
+        list: [[x1, y1, x2, y2, ...], ...] (꼭짓점 3개 이상인 다각형만)
+    """
+    contours, _ = cv2.findContours(
+        np.ascontiguousarray(mask, dtype=np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+    )
+    polygons = []
+    for contour in contours:
+        if cv2.contourArea(contour) < min_area:
+            continue
+        if tolerance > 0:
+            contour = cv2.approxPolyDP(contour, tolerance, True)
+        if len(contour) >= 3:
+            polygons.append(contour.reshape(-1).tolist())
+    return polygons
+
+
+def encode_mask(
+    image_shape: tuple, mask: np.ndarray, box, fmt: str, tolerance: float = 1.0, roi: bool = False
+) -> dict:
+    """
+    마스크를 박스 영역으로 잘라 요청한 형식으로 변환 (png는 호출부에서 기존 방식으로 처리)
+    Args:
+        image_shape (tuple): 원본 이미지 shape
+        mask (np.ndarray): 전체 프레임 또는 박스 크기 마스크
+        box (list): [x1, y1, x2, y2] 바운딩 박스
+        fmt (str): rle | polygon
+        tolerance (float): polygon 단순화 허용 오차 (px)
+        roi (bool): mask가 박스 크기로 크롭된 마스크인지 여부 (predict_sam2 반환값이면 True)
+    """
+    mask_roi, (x1, y1, _, _) = utils.crop_mask_to_box(mask, image_shape, box, roi)
+    mask_roi = mask_roi > 0
+    if fmt == "rle":
+        return {"format": "rle", "origin": [x1, y1], **encode_rle(mask_roi)}
+    if fmt == "polygon":
+        return {
+            "format": "polygon",
+            "origin": [x1, y1],
+            "size": list(mask_roi.shape[:2]),
+            "polygons": encode_polygons(mask_roi, tolerance),
+        }
+    raise ValueError(f"지원하지 않는 마스크 형식입니다: {fmt} (지원: {', '.join(MASK_FORMATS)})")
@@ -0,0 +1,115 @@
+"""
+Prometheus 메트릭 (/metrics)
+
+[TIMING] 로그와 같은 구간을 히스토그램으로 기록하여 대시보드에서 단계별 p50/p99를 볼 수 있게 합니다.
+- ai_stage_duration_seconds{stage}: 파이프라인 단계별 소요 시간
+  (crop_encode / embedding은 요청 전체 배치, stream=true의 아이템별 시간은 crop_encode_item / embedding_item)
+- ai_yolo_fallback_total{item_type}: YOLO 미탐지 → CLIP fallback 경로 (CLIP 판정 결과별)
+- ai_sam2_failures_total{path}: SAM2 마스크 생성 실패
+- ai_sam2_model_selected_total{model}: 요청별로 선택된 SAM2 모델 크기
+- ai_inflight_requests{endpoint}: 처리 중인 HTTP 요청 수 (응답 본문 전송이 끝날 때까지)
+- ai_inference_queue_depth{state}: 추론 대기열 (InferenceExecutor가 작업이 들어오고 시작 / 끝날 때마다 갱신)
+- ai_yolo_batch_waiting: micro-batch 대기 (수집 시점 값)
+
+여러 HTTP 워커(uvicorn --workers, model_server.py)로 실행할 때는 PROMETHEUS_MULTIPROC_DIR을 지정하면
+prometheus_client multiprocess 모드로 모든 워커의 값을 합쳐 노출합니다.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# 수 ms(디코딩)부터 수십 초(SAM2 CPU, 큰 배치)까지
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_DURATION = Histogram(
+    "ai_stage_duration_seconds",
+    "파이프라인 단계별 소요 시간",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+YOLO_FALLBACK = Counter(
+    "ai_yolo_fallback_total",
+    "YOLO 미탐지로 CLIP fallback을 실행한 횟수",
+    ["item_type"],
+)
+SAM2_FAILURES = Counter(
+    "ai_sam2_failures_total",
+    "SAM2 마스크 생성 실패 횟수",
+    ["path"],
+)
+SAM2_SELECTED = Counter(
+    "ai_sam2_model_selected_total",
+    "요청별로 선택된 SAM2 모델 크기",
+    ["model"],
+)
+INFLIGHT_REQUESTS = Gauge(
+    "ai_inflight_requests",
+    "처리 중인 HTTP 요청 수",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+)
+QUEUE_DEPTH = Gauge(
+    "ai_inference_queue_depth",
+    "추론 실행기 작업 수 (queued: 대기, running: 실행 중)",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+YOLO_BATCH_WAITING = Gauge(
+    "ai_yolo_batch_waiting",
+    "YOLO micro-batch 대기 중인 이미지 수",
+    multiprocess_mode="livesum",
+)
+
+
+def observe(stage: str, seconds: float):
+    STAGE_DURATION.labels(stage=stage).observe(seconds)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """with 블록 소요 시간을 stage 히스토그램에 기록"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def set_queue_depth(queued: int, running: int):
+    """
+    추론 실행기 대기열 게이지 갱신
+    수집 시점에만 설정하면 multiprocess 모드(livesum)에서 /metrics를 받은 워커 외에는 값이 갱신되지 않으므로
+    실행기가 상태가 바뀔 때마다 호출합니다.
+    """
+    QUEUE_DEPTH.labels(state="queued").set(queued)
+    QUEUE_DEPTH.labels(state="running").set(running)
+
+
+def render(batcher_stats: dict):
+    """
+    수집 시점의 micro-batch 대기 값을 반영한 뒤 Prometheus 텍스트 형식으로 출력
+    (ai_inference_queue_depth는 InferenceExecutor가 직접 갱신)
+    Returns:
+        tuple: (본문 bytes, Content-Type)
+    """
+    YOLO_BATCH_WAITING.set(batcher_stats["waiting"])
+
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,200 @@
+"""
+모델 서버 클라이언트 (HTTP 워커 쪽)
+
+MODEL_SERVER_ADDRESSES가 설정되면 HTTP 워커는 모델을 직접 로드하지 않고,
+ModelManager와 같은 메서드를 가진 RemoteModelManager로 모델 서버(model_server.py)를 호출합니다.
+- 큰 numpy 배열(디코딩된 이미지, 크롭, 마스크)은 shm_transport로 공유 메모리를 통해 전달
+- 스레드마다 서버별 연결을 하나씩 유지 (추론 실행기 스레드가 동시에 호출)
+- 모델 서버가 여러 개(디바이스별)면 SAM2 세션 호출은 image_key 해시로 같은 서버에 보내고
+  나머지는 라운드 로빈으로 분산
+- multiprocessing.connection은 받은 메시지를 unpickle하므로 인증 키 없이는 연결하지 않음
+  (python model_server.py로 실행하면 실행마다 임의의 키를 생성해 자식 프로세스에 전달)
+"""
+
+import itertools
+import logging
+import threading
+import zlib
+from multiprocessing.connection import Client
+from typing import List
+
+import numpy as np
+
+import shm_transport
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteInferenceError(RuntimeError):
+    """모델 서버에서 호출이 실패한 경우"""
+
+
+def require_authkey(authkey: bytes) -> bytes:
+    """인증 키가 비어 있으면 시작 거부 (키를 아는 쪽만 모델 서버 프로세스에 pickle을 보낼 수 있어야 함)"""
+    if not authkey:
+        raise ValueError(
+            "MODEL_SERVER_AUTHKEY가 설정되지 않았습니다. python model_server.py로 실행하면 자동 생성되며, "
+            "모델 서버 주소를 직접 지정할 때(특히 TCP)는 추측할 수 없는 긴 키를 양쪽에 같은 값으로 설정하세요."
+        )
+    return authkey
+
+
+def parse_address(address: str):
+    """'host:port' -> (host, port), 그 외에는 Unix 소켓 경로"""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and not address.startswith("/"):
+        return (host, int(port))
+    return address
+
+
+class RemoteModelManager:
+    """ModelManager 중 요청 경로에서 쓰는 메서드를 모델 서버로 전달하는 프록시"""
+
+    def __init__(self, addresses: List[str], authkey: bytes):
+        self.addresses = [parse_address(address) for address in addresses]
+        self.authkey = require_authkey(authkey)
+        self._local = threading.local()
+        self._round_robin = itertools.count()
+        self._snapshot = None
+
+    # ------------------------------------------------------------------
+    # 연결 / 호출
+    # ------------------------------------------------------------------
+    def _connections(self) -> dict:
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = {}
+        return connections
+
+    def _drop(self, index: int):
+        connection = self._connections().pop(index, None)
+        if connection is not None:
+            try:
+                connection.close()
+            except OSError:
+                pass
+
+    def _server_index(self, route_key: str = None) -> int:
+        if len(self.addresses) == 1:
+            return 0
+        if route_key:
+            return zlib.crc32(route_key.encode()) % len(self.addresses)
+        return next(self._round_robin) % len(self.addresses)
+
+    def _call_server(self, index: int, method: str, *args, **kwargs):
+        owned = []
+        try:
+            request = (method, shm_transport.pack(args, owned), shm_transport.pack(kwargs, owned))
+            # 서버 재시작 등으로 끊긴 연결은 한 번 다시 연결해서 재시도
+            for attempt in range(2):
+                connections = self._connections()
+                try:
+                    if index not in connections:
+                        connections[index] = Client(self.addresses[index], authkey=self.authkey)
+                    connections[index].send(request)
+                    status, payload = connections[index].recv()
+                    break
+                except (EOFError, OSError):
+                    self._drop(index)
+                    if attempt:
+                        raise
+        finally:
+            # 요청 버퍼는 서버가 응답하기 전에 다 읽었으므로 여기서 삭제
+            shm_transport.release(owned)
+
+        if status == "error":
+            raise RemoteInferenceError(f"{method}: {payload}")
+        return shm_transport.unpack(payload, unlink=True)
+
+    def _call(self, method: str, *args, route_key: str = None, **kwargs):
+        return self._call_server(self._server_index(route_key), method, *args, **kwargs)
+
+    # ------------------------------------------------------------------
+    # 설정 스냅샷 (결과 캐시 키, 준비 상태)
+    # ------------------------------------------------------------------
+    def refresh(self) -> dict:
+        """모델 서버 설정 스냅샷 갱신 (모든 서버는 같은 설정으로 실행되므로 첫 번째 서버 기준)"""
+        for index in range(1, len(self.addresses)):
+            self._call_server(index, "describe")  # 나머지 서버도 준비되었는지 확인
+        self._snapshot = self._call_server(0, "describe")
+        return self._snapshot
+
+    def _describe(self) -> dict:
+        return self._snapshot if self._snapshot is not None else self.refresh()
+
+    @property
+    def device(self) -> str:
+        return self._describe()["device"]
+
+    @property
+    def model_versions(self) -> dict:
+        return self._describe()["model_versions"]
+
+    @property
+    def clip_labels(self) -> list:
+        return self._describe()["clip_labels"]
+
+    def is_loaded(self, group: str) -> bool:
+        return group in self._describe()["loaded_groups"]
+
+    def loaded_sam2_variants(self) -> list:
+        return self._describe()["sam2_variants"]
+
+    def status(self) -> dict:
+        statuses = [self._call_server(index, "status") for index in range(len(self.addresses))]
+        if len(statuses) == 1:
+            return statuses[0]
+        return {"device": statuses[0]["device"], "model_servers": statuses}
+
+    # ------------------------------------------------------------------
+    # ModelManager 메서드
+    # ------------------------------------------------------------------
+    def ensure_loaded(self, group: str) -> bool:
+        # 지연 로딩은 모든 서버에 적용 (SAM2 세션은 어느 서버로든 라우팅될 수 있음)
+        loaded = all(
+            self._call_server(index, "ensure_loaded", group) for index in range(len(self.addresses))
+        )
+        self.refresh()
+        return loaded
+
+    def predict_yolo_batch(self, images: list, conf=0.5):
+        return self._call("predict_yolo_batch", images, conf=conf)
+
+    def predict_sam2(self, image, boxes, image_key: str = None, variant: str = None, with_info: bool = False):
+        return self._call(
+            "predict_sam2", image, boxes,
+            image_key=image_key, variant=variant, with_info=with_info, route_key=image_key,
+        )
+
+    def predict_sam2_with_points(
+        self,
+        image: np.ndarray,
+        points: list,
+        labels: list = None,
+        image_key: str = None,
+        variant: str = None,
+        with_info: bool = False,
+    ):
+        return self._call(
+            "predict_sam2_with_points", image, points, labels,
+            image_key=image_key, variant=variant, with_info=with_info, route_key=image_key,
+        )
+
+    def get_sam2_session_image(self, image_key: str):
+        return self._call("get_sam2_session_image", image_key, route_key=image_key)
+
+    def refine_sam2_mask(
+        self, image: np.ndarray, image_key: str, points: list, labels: list, box=None, variant: str = None
+    ):
+        return self._call(
+            "refine_sam2_mask", image, image_key, points, labels, box=box, variant=variant, route_key=image_key
+        )
+
+    def extract_embeddings(self, images: list, batch_size: int = 32):
+        return self._call("extract_embeddings", images, batch_size=batch_size)
+
+    def extract_text_embeddings(self, texts: list, chunk_size: int = 64) -> np.ndarray:
+        return self._call("extract_text_embeddings", texts, chunk_size=chunk_size)
+
+    def detect_item_type_with_clip(self, image: np.ndarray) -> dict:
+        return self._call("detect_item_type_with_clip", image)
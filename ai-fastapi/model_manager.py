@@ -1,4 +1,8 @@
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import torch
 import cv2
 from ultralytics import YOLO
@@ -20,12 +24,59 @@ import open_clip
 from PIL import Image
 import numpy as np
 
-import open_clip
+from embedding_cache import TextEmbeddingCache
+from onnx_detector import DetectionResult, OnnxYoloDetector, export_onnx
+from quantization import compare_embeddings, load_sample_images, quantize_dynamic_int8
+import postprocess
+import utils
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# CLIP Zero-Shot fallback 라벨: (item_type, 프롬프트) 쌍
+# 같은 item_type에 여러 프롬프트를 둘 수 있으며, 점수는 item_type별로 합산됩니다.
+DEFAULT_CLIP_ITEM_TYPE_LABELS = [
+    ('shoes', "a pair of shoes, sneakers, footwear"),
+    ('clothing', "a clothing item, shirt, pants, jacket"),
+    ('unknown', "a random object, not fashion item"),
+]
+
+# 체크포인트 / 허브 모델 ID
+YOLO_STAGE1_CHECKPOINT = './checkpoints/yolov8n-clothing/best.pt'
+YOLO_STAGE2_CHECKPOINT = './checkpoints/deepfashion2_yolov8s-seg.pt'
+YOLO_STAGE1_ONNX = './checkpoints/yolov8n-clothing/best.onnx'
+# SAM2 모델 크기 -> (체크포인트, SAM2.0 config), 빠른 순서 (sam2_router.SAM2_VARIANT_ORDER와 같음)
+SAM2_VARIANTS = {
+    'tiny': ("./checkpoints/sam2_hiera_tiny.pt", "configs/sam2/sam2_hiera_t"),
+    'small': ("./checkpoints/sam2_hiera_small.pt", "configs/sam2/sam2_hiera_s"),
+    'base_plus': ("./checkpoints/sam2_hiera_base_plus.pt", "configs/sam2/sam2_hiera_b+"),
+    'large': ("./checkpoints/sam2_hiera_large.pt", "configs/sam2/sam2_hiera_l"),
+}
+FASHION_SIGLIP_MODEL_ID = 'hf-hub:Marqo/marqo-fashionSigLIP'
+CLIP_MODEL_ID = 'ViT-B-32/openai'
+
+# INT8 양자화 정확도 검증용 텍스트 (CLIP fallback 라벨 프롬프트와 함께 사용)
+QUANTIZE_SAMPLE_TEXTS = [
+    "black leather jacket", "white sneakers", "blue denim jeans", "red floral summer dress",
+    "grey wool coat", "brown ankle boots", "striped cotton t-shirt", "navy blazer",
+]
+
+# 로딩 단위(그룹) -> self.models 키. 그룹별로 _load_<그룹> 메서드가 있어야 함
+MODEL_GROUPS = {
+    'yolo': ('yolo_stage1', 'yolo_stage2'),
+    'sam2': tuple(f'sam2_{variant}' for variant in SAM2_VARIANTS),
+    'fashion_siglip': ('fashion_siglip',),
+    'clip': ('clip',),
+}
+
+def synthetic_image(height: int, width: int, seed: int = 0) -> np.ndarray:
+    """워밍업용 합성 이미지 (그라디언트 + 노이즈, BGR uint8)"""
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    noise = rng.normal(0, 20, size=(height, width, 3)).astype(np.float32)
+    return np.clip(gradient + noise, 0, 255).astype(np.uint8)
+
 class ModelManager:
     _instance = None
 
@@ -34,88 +85,263 @@ class ModelManager:
             cls._instance = super(ModelManager, cls).__new__(cls)
             cls._instance.models = {}
             cls._instance.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+            # CLIP 텍스트 임베딩 LRU 캐시 (main.py lifespan에서 설정)
+            cls._instance.text_cache = None
+            # CLIP fallback 라벨 및 미리 계산된 텍스트 특징
+            cls._instance.clip_labels = list(DEFAULT_CLIP_ITEM_TYPE_LABELS)
+            # SAM2 이미지 임베딩 세션 캐시 (업로드 해시 -> set_image 결과, main.py lifespan에서 설정)
+            cls._instance.sam2_cache = None
+            # 로드할 SAM2 모델 크기 (SAM2_VARIANTS 중, main.py lifespan에서 설정)
+            cls._instance.sam2_variants = ['large']
+            # SAM2 predictor는 set_image → predict 사이에 이미지 임베딩을 내부 상태로 들고 있으므로
+            # 모델 크기별 락으로 직렬화 (INFERENCE_CONCURRENCY의 sam2>1은 서로 다른 크기끼리만 병렬)
+            cls._instance._sam2_locks = {variant: threading.Lock() for variant in SAM2_VARIANTS}
+            # 로드된 모델 버전 (체크포인트 경로/크기/수정시각 또는 허브 ID, 결과 캐시 키에 사용)
+            cls._instance.model_versions = {}
+            # 지연 로딩 상태: 그룹별 락과 로드 시도 여부
+            cls._instance._load_locks = {group: threading.Lock() for group in MODEL_GROUPS}
+            cls._instance._load_attempted = set()
+            # Stage 1 탐지 백엔드 ('torch' | 'onnx', main.py lifespan에서 설정)
+            cls._instance.yolo_backend = 'torch'
+            cls._instance.yolo_onnx_path = YOLO_STAGE1_ONNX
+            cls._instance.onnx_threads = 0
+            # 임베딩 모델 양자화 ('none' | 'int8', CPU 전용) 및 정확도 검증 결과
+            cls._instance.embed_quantization = 'none'
+            cls._instance.quantize_min_cosine = 0.99
+            cls._instance.quantize_sample_dir = None
+            cls._instance.quantization_report = {}
             logger.info(f"ModelManager 인스턴스 생성됨. 사용 장치: {cls._instance.device}")
         return cls._instance
 
-    def load_models(self):
+    def load_models(self, lazy=()):
         """
-        필요한 모든 모델(YOLOv11, SAM2, FashionSigLIP, CLIP)을 로드합니다.
+        필요한 모델(YOLOv11, SAM2, FashionSigLIP, CLIP)을 병렬로 로드합니다.
+        서로 독립적인 모델이라 스레드 풀에서 동시에 로드하며 (체크포인트 읽기 / 허브 다운로드 / GPU 업로드가 겹침),
+        lazy에 포함된 모델은 첫 사용 시 ensure_loaded()로 로드합니다.
+        Args:
+            lazy (iterable): 지연 로딩할 모델 그룹 이름 (MODEL_GROUPS 중, 예: ['clip'])
         """
-        logger.info("모델 로딩 시작...")
-        
-        # 1. YOLOv11 로드
-        self._load_yolo()
+        lazy = set(lazy)
+        unknown = lazy - set(MODEL_GROUPS)
+        if unknown:
+            raise ValueError(f"알 수 없는 모델 그룹입니다: {sorted(unknown)} (지원: {', '.join(MODEL_GROUPS)})")
 
-        # 2. SAM2 로드
-        self._load_sam2()
+        eager = [group for group in MODEL_GROUPS if group not in lazy]
+        logger.info(f"모델 로딩 시작... (즉시: {eager}, 지연: {sorted(lazy)})")
+        start = time.time()
 
-        # 3. Marqo-FashionSigLIP 로드 (이미지 임베딩용)
-        self._load_fashion_siglip()
+        with ThreadPoolExecutor(max_workers=max(1, len(eager)), thread_name_prefix="model-load") as pool:
+            list(pool.map(self.ensure_loaded, eager))
 
-        # 4. CLIP 로드 (텍스트 임베딩용)
-        self._load_clip()
+        # 지연 로딩 모델도 버전은 미리 기록 (첫 사용 시 결과 캐시 키가 바뀌지 않도록)
+        for group in lazy:
+            self.model_versions.update(self._expected_versions(group))
 
-        logger.info("모든 모델 로딩 완료.")
+        logger.info(f"모델 로딩 완료: {time.time() - start:.2f}초")
+
+    def ensure_loaded(self, group: str) -> bool:
+        """
+        모델 그룹이 아직 로드되지 않았으면 로드합니다 (그룹별 락으로 한 번만 시도).
+        실패한 로드는 재시도하지 않으며, 요청 경로에서는 기존처럼 '모델 없음' 분기로 처리됩니다.
+        Args:
+            group (str): 'yolo' | 'sam2' | 'fashion_siglip' | 'clip'
+        Returns:
+            bool: 그룹의 모델이 하나라도 로드되어 있으면 True
+        """
+        keys = MODEL_GROUPS[group]
+        if group not in self._load_attempted:
+            with self._load_locks[group]:
+                if group not in self._load_attempted:
+                    start = time.time()
+                    getattr(self, f"_load_{group}")()
+                    self._load_attempted.add(group)
+                    logger.info(f"[{group}] 로딩 소요 시간: {time.time() - start:.2f}초")
+        return any(key in self.models for key in keys)
+
+    def is_loaded(self, group: str) -> bool:
+        """모델 그룹이 로드되어 있는지 (지연 로딩을 트리거하지 않음)"""
+        return any(key in self.models for key in MODEL_GROUPS[group])
+
+    def warmup_model(self, group: str, image: np.ndarray):
+        """
+        합성 이미지로 모델 그룹을 한 번 실행합니다 (cuDNN 알고리즘 선택, 메모리 할당, 라이브러리 내부 지연 초기화).
+        실제 요청 경로의 함수를 그대로 호출하되 세션/텍스트 캐시에는 기록하지 않습니다.
+        Args:
+            group (str): 'yolo' | 'sam2' | 'fashion_siglip' | 'clip'
+            image (numpy.ndarray): 합성 이미지 (H, W, 3)
+        """
+        h, w = image.shape[:2]
+        if group == 'yolo':
+            self.predict_yolo_batch([image])
+        elif group == 'sam2':
+            # 탐지 결과가 여러 개인 경우를 흉내 내어 박스 2개로 실행
+            boxes = [[w * 0.1, h * 0.1, w * 0.6, h * 0.9], [w * 0.4, h * 0.2, w * 0.9, h * 0.7]]
+            for variant in self.loaded_sam2_variants():
+                self.predict_sam2(image, boxes, variant=variant)
+        elif group == 'fashion_siglip':
+            self.extract_embeddings([image, image[: h // 2, : w // 2]])
+        elif group == 'clip':
+            self.detect_item_type_with_clip(image)
+            self._encode_texts(["warm-up"], chunk_size=1)
+
+    def describe(self) -> dict:
+        """결과 캐시 키 / 준비 상태 확인에 쓰는 설정 스냅샷 (모델 서버 모드에서 HTTP 워커가 조회)"""
+        return {
+            'device': self.device,
+            'model_versions': dict(self.model_versions),
+            'clip_labels': list(self.clip_labels),
+            'loaded_groups': [group for group in MODEL_GROUPS if self.is_loaded(group)],
+            'sam2_variants': self.loaded_sam2_variants(),
+        }
+
+    def status(self) -> dict:
+        """/status용 모델 / 캐시 상태"""
+        return {
+            'device': self.device,
+            'loaded_models': list(self.models.keys()),
+            'text_embedding_cache': self.text_cache.stats() if self.text_cache is not None else None,
+            'sam2_session_cache': self.sam2_cache.stats() if self.sam2_cache is not None else None,
+            'quantization': self.quantization_report,
+        }
+
+    def _expected_versions(self, group: str) -> dict:
+        """로드하지 않고 알 수 있는 모델 버전 (지연 로딩 모델용)"""
+        if group == 'yolo':
+            return {'yolo_stage1': self._yolo_stage1_version(self.yolo_backend)}
+        if group == 'sam2':
+            return {
+                f'sam2_{variant}': self._checkpoint_version(SAM2_VARIANTS[variant][0])
+                for variant in self.sam2_variants
+            }
+        suffix = ':int8' if self._quantization_enabled() else ''
+        if group == 'fashion_siglip':
+            return {'fashion_siglip': FASHION_SIGLIP_MODEL_ID + suffix}
+        return {'clip': CLIP_MODEL_ID + suffix}
+
+    @staticmethod
+    def _checkpoint_version(path: str) -> str:
+        """체크포인트 파일 식별자 (경로:크기:수정시각) - 가중치가 교체되면 값이 바뀜"""
+        import os
+        try:
+            stat = os.stat(path)
+            return f"{path}:{stat.st_size}:{int(stat.st_mtime)}"
+        except OSError:
+            return path
 
     def _load_yolo(self):
-        """2-Stage Cascade Detection 모델 로딩"""
+        """
+        2-Stage Cascade Detection 모델 로딩
+        predict_yolo_batch는 Stage 1이 있으면 Stage 2를 쓰지 않으므로,
+        Stage 2(DeepFashion2)는 Stage 1 로딩이 실패했을 때만 fallback으로 로드합니다.
+        """
+        if self.yolo_backend not in ('torch', 'onnx'):
+            logger.warning(f"알 수 없는 YOLO_BACKEND입니다: {self.yolo_backend} (지원: torch, onnx) - PyTorch 백엔드 사용")
+            self.yolo_backend = 'torch'
+        if self.yolo_backend == 'onnx' and self._load_yolo_onnx():
+            return
+
         try:
             # Stage 1: yolov8n-clothing-detection (의류/신발/가방/액세서리 분류)
             logger.info("[Stage 1] yolov8n-clothing-detection 모델 로딩 중...")
-            stage1_path = './checkpoints/yolov8n-clothing/best.pt'
-            self.models['yolo_stage1'] = YOLO(stage1_path)
+            self.models['yolo_stage1'] = YOLO(YOLO_STAGE1_CHECKPOINT)
+            self.model_versions['yolo_stage1'] = self._yolo_stage1_version('torch')
             if self.device == 'cuda':
                 self.models['yolo_stage1'].to('cuda')
             logger.info("[Stage 1] yolov8n-clothing-detection 모델 로딩 성공.")
             # 클래스: 0=Clothing, 1=Shoes, 2=Bags, 3=Accessories
             
-            # Stage 2: DeepFashion2 (의류 상세 분류)
-            logger.info("[Stage 2] DeepFashion2 YOLOv8s-seg 모델 로딩 중...")
-            stage2_path = './checkpoints/deepfashion2_yolov8s-seg.pt'
-            self.models['yolo_stage2'] = YOLO(stage2_path)
-            if self.device == 'cuda':
-                self.models['yolo_stage2'].to('cuda')
-            logger.info("[Stage 2] DeepFashion2 YOLOv8s-seg 모델 로딩 성공.")
-            # 클래스: short_sleeve_top, long_sleeve_top, shorts, trousers 등 13종
-            
         except Exception as e:
-            logger.error(f"2-Stage YOLO 모델 로딩 실패: {e}")
+            logger.error(f"Stage 1 YOLO 모델 로딩 실패: {e}")
+            self.models.pop('yolo_stage1', None)
+            self.model_versions.pop('yolo_stage1', None)
             # Fallback to single model
             logger.info("Fallback: 기본 DeepFashion2 모델만 사용...")
             try:
-                stage2_path = './checkpoints/deepfashion2_yolov8s-seg.pt'
-                self.models['yolo_stage2'] = YOLO(stage2_path)
+                self.models['yolo_stage2'] = YOLO(YOLO_STAGE2_CHECKPOINT)
+                self.model_versions['yolo_stage2'] = self._checkpoint_version(YOLO_STAGE2_CHECKPOINT)
                 if self.device == 'cuda':
                     self.models['yolo_stage2'].to('cuda')
                 logger.info("Fallback 성공: DeepFashion2 모델 로드됨.")
+                # 클래스: short_sleeve_top, long_sleeve_top, shorts, trousers 등 13종
             except Exception as e2:
                 logger.error(f"Fallback 모델 로딩도 실패: {e2}")
 
-    def _load_sam2(self):
+    def _load_yolo_onnx(self) -> bool:
+        """Stage 1을 ONNX Runtime(CPU)으로 로드. 실패하면 False (PyTorch 백엔드로 진행)"""
         try:
-            logger.info("SAM2 모델 로딩 중...")
-            if build_sam2 is None or SAM2ImagePredictor is None:
-                raise ImportError("sam2 라이브러리를 찾을 수 없습니다. pip install sam2 실행 필요")
-
-            # SAM2 체크포인트와 설정 파일 경로 설정
-            checkpoint = "./checkpoints/sam2_hiera_large.pt"
-            # SAM2.0 config (체크포인트 버전과 일치)
-            model_cfg = "configs/sam2/sam2_hiera_l"
-            
-            # 체크포인트 파일 존재 확인
-            import os
-            if not os.path.exists(checkpoint):
-                raise FileNotFoundError(f"SAM2 체크포인트 파일이 없습니다: {checkpoint}")
-            
-            # SAM2 모델 빌드 및 ImagePredictor 생성
-            sam2_model = build_sam2(model_cfg, checkpoint, device=self.device)
-            self.models['sam2'] = SAM2ImagePredictor(sam2_model)
-            
-            logger.info("SAM2 모델 로딩 성공.")
-            
+            logger.info("[Stage 1] yolov8n-clothing-detection ONNX Runtime 백엔드 로딩 중...")
+            onnx_path = export_onnx(YOLO_STAGE1_CHECKPOINT, self.yolo_onnx_path)
+            self.models['yolo_stage1'] = OnnxYoloDetector(onnx_path, threads=self.onnx_threads)
+            self.model_versions['yolo_stage1'] = self._yolo_stage1_version('onnx')
+            logger.info("[Stage 1] ONNX Runtime 백엔드 로딩 성공.")
+            return True
         except Exception as e:
-            logger.error(f"SAM2 모델 로딩 실패: {e}")
+            logger.error(f"[Stage 1] ONNX Runtime 백엔드 로딩 실패, PyTorch 모델 사용: {e}")
+            # 실제로 쓰는 백엔드로 되돌림 (모델 버전 / 결과 캐시 키에 :onnx가 붙지 않도록)
+            self.yolo_backend = 'torch'
+            return False
+
+    def _yolo_stage1_version(self, backend: str) -> str:
+        """Stage 1 버전 (백엔드마다 박스 좌표가 미세하게 다르므로 결과 캐시 키에 백엔드 포함)"""
+        version = self._checkpoint_version(YOLO_STAGE1_CHECKPOINT)
+        return f"{version}:onnx" if backend == 'onnx' else version
+
+    def _load_sam2(self):
+        """sam2_variants의 모델 크기를 모두 로드 (하나가 실패해도 나머지는 사용)"""
+        if build_sam2 is None or SAM2ImagePredictor is None:
+            logger.error("SAM2 모델 로딩 실패: sam2 라이브러리를 찾을 수 없습니다. pip install sam2 실행 필요")
             logger.warning("SAM2 없이 진행합니다. 세그멘테이션 대신 단순 크롭 사용.")
+            return
+
+        for variant in self.sam2_variants:
+            try:
+                logger.info(f"SAM2 ({variant}) 모델 로딩 중...")
+                # SAM2 체크포인트와 설정 파일 경로 (SAM2.0 config, 체크포인트 버전과 일치)
+                checkpoint, model_cfg = SAM2_VARIANTS[variant]
+
+                # 체크포인트 파일 존재 확인
+                import os
+                if not os.path.exists(checkpoint):
+                    raise FileNotFoundError(f"SAM2 체크포인트 파일이 없습니다: {checkpoint}")
+
+                # SAM2 모델 빌드 및 ImagePredictor 생성
+                sam2_model = build_sam2(model_cfg, checkpoint, device=self.device)
+                self.models[f'sam2_{variant}'] = SAM2ImagePredictor(sam2_model)
+                self.model_versions[f'sam2_{variant}'] = self._checkpoint_version(checkpoint)
+
+                logger.info(f"SAM2 ({variant}) 모델 로딩 성공.")
+
+            except Exception as e:
+                logger.error(f"SAM2 ({variant}) 모델 로딩 실패: {e}")
+
+        if not self.loaded_sam2_variants():
+            logger.warning("SAM2 없이 진행합니다. 세그멘테이션 대신 단순 크롭 사용.")
+
+    def loaded_sam2_variants(self) -> list:
+        """로드된 SAM2 모델 크기 (빠른 순서)"""
+        return [variant for variant in SAM2_VARIANTS if f'sam2_{variant}' in self.models]
+
+    def _resolve_sam2_variant(self, variant: str = None, image_key: str = None) -> str:
+        """
+        사용할 SAM2 모델 크기를 정합니다.
+        지정한 크기가 로드되어 있으면 그대로, 없으면 image_key의 세션이 있는 크기(/refine-mask가
+        /analyze-all과 같은 모델을 쓰도록), 그것도 없으면 로드된 가장 큰 모델
+        """
+        loaded = self.loaded_sam2_variants()
+        if variant in loaded:
+            return variant
+        if variant is not None:
+            logger.warning(f"[SAM2] {variant} 모델이 로드되지 않아 다른 크기를 사용합니다. (로드됨: {loaded})")
+        if image_key and self.sam2_cache is not None:
+            for candidate in reversed(loaded):
+                if self.sam2_cache.get(self._sam2_session_key(candidate, image_key)) is not None:
+                    return candidate
+        return loaded[-1]
+
+    @staticmethod
+    def _sam2_session_key(variant: str, image_key: str) -> str:
+        # 이미지 임베딩은 모델 크기마다 다르므로 크기별로 보관
+        return f"{variant}:{image_key}"
 
     def _load_fashion_siglip(self):
         try:
@@ -125,12 +351,16 @@ class ModelManager:
             # create_model_and_transforms('ViT-B-16-SigLIP', pretrained='hf-hub:Marqo/marqo-fashionSigLIP') 방식 사용
             
             # 일반적인 hf-hub 로딩 방식
-            model, _, preprocess = open_clip.create_model_and_transforms('hf-hub:Marqo/marqo-fashionSigLIP', device=self.device)
+            model, _, preprocess = open_clip.create_model_and_transforms(FASHION_SIGLIP_MODEL_ID, device=self.device)
+            model, quantized = self._maybe_quantize('fashion_siglip', model, {
+                'image': lambda m, samples: m.encode_image(self._sample_image_batch(preprocess, samples)),
+            })
             
             self.models['fashion_siglip'] = {
                 'model': model,
                 'preprocess': preprocess
             }
+            self.model_versions['fashion_siglip'] = FASHION_SIGLIP_MODEL_ID + (':int8' if quantized else '')
             logger.info("Marqo-FashionSigLIP 모델 로딩 성공.")
             
         except Exception as e:
@@ -147,17 +377,102 @@ class ModelManager:
                 device=self.device
             )
             tokenizer = open_clip.get_tokenizer('ViT-B-32')
+            sample_texts = [prompt for _, prompt in self.clip_labels] + QUANTIZE_SAMPLE_TEXTS
+            model, quantized = self._maybe_quantize('clip', model, {
+                'image': lambda m, samples: m.encode_image(self._sample_image_batch(preprocess, samples)),
+                'text': lambda m, samples: m.encode_text(tokenizer(sample_texts)),
+            })
+            model_id = CLIP_MODEL_ID + (':int8' if quantized else '')
             
             self.models['clip'] = {
                 'model': model,
                 'preprocess': preprocess,
-                'tokenizer': tokenizer
+                'tokenizer': tokenizer,
+                'model_id': model_id,  # 텍스트 캐시 키 (양자화 여부 포함)
             }
+            self.model_versions['clip'] = model_id
+            self._build_clip_label_features()
             logger.info("CLIP 모델 로딩 성공 (ViT-B-32, 512차원).")
             
         except Exception as e:
             logger.error(f"CLIP 모델 로딩 실패: {e}")
 
+    def _quantization_enabled(self) -> bool:
+        return self.embed_quantization == 'int8' and self.device == 'cpu'
+
+    @staticmethod
+    def _sample_image_batch(preprocess, samples):
+        return torch.stack([
+            preprocess(Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))) for image in samples
+        ])
+
+    def _maybe_quantize(self, group: str, model, checks: dict):
+        """
+        embed_quantization == 'int8'이고 CPU이면 모델을 INT8 동적 양자화하고 fp32 대비 정확도를 검증합니다.
+        모든 검증 항목의 평균 코사인 유사도가 quantize_min_cosine 이상일 때만 양자화 모델을 사용합니다.
+        Args:
+            group (str): 'fashion_siglip' | 'clip'
+            model: fp32 open_clip 모델
+            checks (dict): 항목 이름 -> fn(model, sample_images) -> 임베딩 [N, D]
+        Returns:
+            tuple: (사용할 모델, 양자화 여부)
+        """
+        if self.embed_quantization != 'int8':
+            return model, False
+        if self.device != 'cpu':
+            logger.warning(f"[{group}] INT8 동적 양자화는 CPU 전용입니다. fp32 모델을 사용합니다.")
+            return model, False
+
+        try:
+            quantized = quantize_dynamic_int8(model)
+            samples = load_sample_images(self.quantize_sample_dir)
+            report = {
+                name: compare_embeddings(lambda: fn(model, samples), lambda: fn(quantized, samples))
+                for name, fn in checks.items()
+            }
+        except Exception as e:
+            logger.error(f"[{group}] INT8 양자화 실패, fp32 모델 사용: {e}")
+            return model, False
+
+        accepted = all(result['cosine_mean'] >= self.quantize_min_cosine for result in report.values())
+        self.quantization_report[group] = {
+            'accepted': accepted,
+            'min_cosine': self.quantize_min_cosine,
+            'samples': len(samples),
+            **report,
+        }
+        logger.info(f"[{group}] INT8 양자화 검증: {report}")
+        if not accepted:
+            logger.warning(
+                f"[{group}] 코사인 유사도가 기준({self.quantize_min_cosine}) 미만이라 fp32 모델을 사용합니다."
+            )
+            return model, False
+        return quantized, True
+
+    def set_clip_labels(self, labels: list):
+        """
+        CLIP fallback 라벨 집합을 교체합니다. CLIP이 이미 로드되어 있으면 텍스트 특징을 다시 계산합니다.
+        Args:
+            labels (list): [(item_type, prompt), ...] 리스트
+        """
+        self.clip_labels = [(str(item_type), str(prompt)) for item_type, prompt in labels]
+        if 'clip' in self.models:
+            self._build_clip_label_features()
+
+    def _build_clip_label_features(self):
+        """CLIP fallback 라벨 프롬프트를 한 번만 인코딩하여 디바이스에 보관"""
+        model_dict = self.models['clip']
+        prompts = [prompt for _, prompt in self.clip_labels]
+        text_tokens = model_dict['tokenizer'](prompts).to(self.device)
+
+        with torch.no_grad():
+            text_features = model_dict['model'].encode_text(text_tokens)
+            text_features /= text_features.norm(dim=-1, keepdim=True)
+
+        model_dict['label_features'] = text_features
+        model_dict['label_types'] = [item_type for item_type, _ in self.clip_labels]
+        logger.info(f"[CLIP] Fallback 라벨 특징 계산 완료: {len(prompts)}개 프롬프트")
+
     def extract_embedding(self, image: np.ndarray):
         """
         이미지(numpy array)를 받아 FashionSigLIP 모델을 통해 임베딩을 추출합니다.
@@ -166,41 +481,58 @@ class ModelManager:
         Returns:
             list: 정규화된 임베딩 벡터 (float 리스트, 길이 768)
         """
-        if 'fashion_siglip' not in self.models:
+        return self.extract_embeddings([image])[0]
+
+    def extract_embeddings(self, images: list, batch_size: int = 32):
+        """
+        여러 이미지(YOLO 크롭 또는 SAM2 마스킹 이미지)를 한 번의 forward pass로 임베딩합니다.
+        전처리된 크롭을 하나의 텐서로 쌓아 encode_image를 한 번만 호출하고,
+        GPU→CPU 복사도 배치당 한 번만 수행합니다.
+        Args:
+            images (list): numpy 배열(BGR/BGRA) 또는 PIL 이미지 리스트
+            batch_size (int): 한 번에 인코딩할 최대 이미지 수 (메모리 보호용)
+        Returns:
+            list: 정규화된 임베딩 벡터 리스트 (각 float 리스트, 길이 768)
+        """
+        if not images:
+            return []
+
+        if not self.ensure_loaded('fashion_siglip'):
             logger.error("FashionSigLIP 모델이 로드되지 않았습니다.")
             # 더미 벡터 반환 또는 에러 처리 (여기서는 0벡터 반환)
-            return [0.0] * 768
+            return [[0.0] * 768 for _ in images]
 
         try:
             model_dict = self.models['fashion_siglip']
             model = model_dict['model']
             preprocess = model_dict['preprocess']
 
-            # OpenCV (BGR) -> PIL Image (RGB) 변환
-            # 입력이 이미 RGB인지 BGR인지 확인 필요. 보통 cv2.imread는 BGR.
-            # 하지만 utils.decode_image는 BGR을 리턴함. 
-            # safe assumption: convert convert BGR to RGB for PIL
-            if isinstance(image, np.ndarray):
-                image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                image_pil = Image.fromarray(image)
-            else:
-                image_pil = image # 이미 PIL 이미지라면
-
-            # 전처리 및 배치 차원 추가
-            image_input = preprocess(image_pil).unsqueeze(0).to(self.device)
-
+            # OpenCV (BGR/BGRA) -> PIL Image (RGB) 변환 후 전처리
+            # utils.decode_image는 BGR, apply_mask_and_crop은 BGRA를 리턴함
+            tensors = []
+            for image in images:
+                if isinstance(image, np.ndarray):
+                    image_pil = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+                else:
+                    image_pil = image  # 이미 PIL 이미지라면
+                tensors.append(preprocess(image_pil))
+
+            embeddings = []
             with torch.no_grad():
-                # 이미지 인코딩
-                image_features = model.encode_image(image_input)
-                # 정규화
-                image_features /= image_features.norm(dim=-1, keepdim=True)
-            
-            # CPU로 이동 및 리스트 변환
-            return image_features.cpu().numpy()[0].tolist()
+                for start in range(0, len(tensors), batch_size):
+                    image_input = torch.stack(tensors[start:start + batch_size]).to(self.device)
+                    # 이미지 인코딩 (배치 단위)
+                    image_features = model.encode_image(image_input)
+                    # 정규화 (in-place)
+                    image_features /= image_features.norm(dim=-1, keepdim=True)
+                    # CPU로 한 번에 이동 및 리스트 변환
+                    embeddings.extend(image_features.cpu().numpy().tolist())
+
+            return embeddings
 
         except Exception as e:
             logger.error(f"임베딩 추출 실패: {e}")
-            return [0.0] * 768
+            return [[0.0] * 768 for _ in images]
 
     def extract_text_embedding(self, text: str):
         """
@@ -210,30 +542,78 @@ class ModelManager:
         Returns:
             list: 정규화된 임베딩 벡터 (float 리스트, 길이 512)
         """
-        if 'clip' not in self.models:
+        return self.extract_text_embeddings([text])[0].tolist()
+
+    def extract_text_embeddings(self, texts: list, chunk_size: int = 64) -> np.ndarray:
+        """
+        텍스트 리스트를 한 번에 토큰화하고 chunk_size 단위로 CLIP 텍스트 타워를 실행합니다.
+        Args:
+            texts (list): 임베딩할 텍스트 리스트
+            chunk_size (int): 한 번의 encode_text에 넣을 최대 텍스트 수
+        Returns:
+            numpy.ndarray: 정규화된 임베딩 행렬 (float32, shape: [len(texts), 512])
+        """
+        if not texts:
+            return np.zeros((0, 512), dtype=np.float32)
+
+        if not self.ensure_loaded('clip'):
             logger.error("CLIP 모델이 로드되지 않았습니다.")
-            return [0.0] * 512
+            return np.zeros((len(texts), 512), dtype=np.float32)
 
         try:
             model_dict = self.models['clip']
-            model = model_dict['model']
-            tokenizer = model_dict['tokenizer']
+            model_id = model_dict['model_id']
+            cache = self.text_cache
+
+            result = np.zeros((len(texts), 512), dtype=np.float32)
+
+            # 캐시 조회: 미스된 텍스트만 모아서 (중복 제거) 인코딩
+            missing = {}  # 캐시 키 -> 결과 행 인덱스 리스트
+            for i, text in enumerate(texts):
+                key = TextEmbeddingCache.make_key(model_id, text)
+                vector = cache.get(key) if cache is not None else None
+                if vector is not None:
+                    result[i] = vector
+                else:
+                    missing.setdefault(key, []).append(i)
+
+            if missing:
+                keys = list(missing.keys())
+                # 정규화된 텍스트로 인코딩 (CLIP 토크나이저도 소문자/공백 정리를 수행)
+                features = self._encode_texts([key[1] for key in keys], chunk_size)
+                for key, vector in zip(keys, features):
+                    result[missing[key]] = vector
+                    if cache is not None:
+                        cache.put(key, vector)
+
+            return result
 
-            # 텍스트 토큰화
-            text_tokens = tokenizer([text]).to(self.device)
-
-            with torch.no_grad():
+        except Exception as e:
+            logger.error(f"텍스트 임베딩 추출 실패: {e}")
+            return np.zeros((len(texts), 512), dtype=np.float32)
+
+    def _encode_texts(self, texts: list, chunk_size: int) -> np.ndarray:
+        """CLIP 텍스트 타워 실행 (캐시 없이): 한 번에 토큰화 후 청크 단위 인코딩"""
+        model_dict = self.models['clip']
+        model = model_dict['model']
+        tokenizer = model_dict['tokenizer']
+
+        # 전체 텍스트를 한 번에 토큰화 (CPU), 청크 단위로만 디바이스로 이동
+        text_tokens = tokenizer(list(texts))
+        chunk_size = max(1, chunk_size)
+
+        chunks = []
+        with torch.no_grad():
+            for start in range(0, len(texts), chunk_size):
+                tokens = text_tokens[start:start + chunk_size].to(self.device)
                 # 텍스트 인코딩
-                text_features = model.encode_text(text_tokens)
+                text_features = model.encode_text(tokens)
                 # 정규화
                 text_features /= text_features.norm(dim=-1, keepdim=True)
-            
-            # CPU로 이동 및 리스트 변환
-            return text_features.cpu().numpy()[0].tolist()
+                chunks.append(text_features.float().cpu().numpy())
 
-        except Exception as e:
-            logger.error(f"텍스트 임베딩 추출 실패: {e}")
-            return [0.0] * 512
+        # CPU로 이동 후 하나의 행렬로 결합
+        return np.concatenate(chunks, axis=0)
 
     def detect_item_type_with_clip(self, image: np.ndarray) -> dict:
         """
@@ -245,12 +625,12 @@ class ModelManager:
         
         Returns:
             dict: {
-                'item_type': 'shoes' | 'clothing' | 'unknown',
+                'item_type': clip_labels의 item_type (기본: 'shoes' | 'clothing' | 'unknown'),
                 'confidence': float,
                 'scores': dict
             }
         """
-        if 'clip' not in self.models:
+        if not self.ensure_loaded('clip'):
             logger.warning("CLIP 모델이 로드되지 않았습니다.")
             return {'item_type': 'unknown', 'confidence': 0.0, 'scores': {}}
 
@@ -258,51 +638,36 @@ class ModelManager:
             model_dict = self.models['clip']
             model = model_dict['model']
             preprocess = model_dict['preprocess']
-            tokenizer = model_dict['tokenizer']
+            # 라벨 텍스트 특징은 모델 로드 시 미리 계산됨 (정규화 완료, 디바이스 상주)
+            text_features = model_dict['label_features']
+            label_types = model_dict['label_types']
 
             # BGR -> RGB -> PIL
             image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
             image_pil = Image.fromarray(image_rgb)
 
-            # 분류 라벨 정의
-            labels = [
-                "a pair of shoes, sneakers, footwear",
-                "a clothing item, shirt, pants, jacket",
-                "a random object, not fashion item",
-            ]
-            
-            label_to_type = {
-                0: 'shoes',
-                1: 'clothing',
-                2: 'unknown',
-            }
-
-            # 이미지 인코딩
+            # 이미지 인코딩 (fallback에서 수행하는 유일한 CLIP 연산)
             image_input = preprocess(image_pil).unsqueeze(0).to(self.device)
-            text_tokens = tokenizer(labels).to(self.device)
 
             with torch.no_grad():
                 image_features = model.encode_image(image_input)
-                text_features = model.encode_text(text_tokens)
-                
                 image_features /= image_features.norm(dim=-1, keepdim=True)
-                text_features /= text_features.norm(dim=-1, keepdim=True)
                 
                 similarity = (100.0 * image_features @ text_features.T).softmax(dim=-1)
                 scores = similarity[0].cpu().numpy()
 
-            all_scores = {
-                'shoes': float(scores[0]),
-                'clothing': float(scores[1]),
-                'unknown': float(scores[2])
-            }
+            # 같은 item_type의 프롬프트 점수를 합산
+            all_scores = {}
+            for item_type, score in zip(label_types, scores):
+                all_scores[item_type] = all_scores.get(item_type, 0.0) + float(score)
             
-            best_idx = int(scores.argmax())
-            item_type = label_to_type[best_idx]
-            confidence = float(scores[best_idx])
+            item_type = max(all_scores, key=all_scores.get)
+            confidence = all_scores[item_type]
             
             logger.info(f"[CLIP] Item type detection: {item_type} (confidence: {confidence:.2%})")
-            logger.info(f"[CLIP] scores: shoes={scores[0]:.2%}, clothing={scores[1]:.2%}, unknown={scores[2]:.2%}")
+            logger.info(
+                "[CLIP] scores: " + ", ".join(f"{t}={v:.2%}" for t, v in all_scores.items())
+            )
             
             return {
                 'item_type': item_type,
@@ -314,7 +679,105 @@ class ModelManager:
             logger.error(f"CLIP 아이템 타입 감지 실패: {e}")
             return {'item_type': 'unknown', 'confidence': 0.0, 'scores': {}}
 
-    def predict_sam2_with_points(self, image: np.ndarray, points: list, labels: list = None):
+    def _set_sam2_image(self, image: np.ndarray, image_key: str = None, variant: str = 'large', info: dict = None):
+        """
+        SAM2 predictor에 이미지를 설정하고 predictor를 반환합니다.
+        호출자는 self._sam2_locks[variant]를 잡은 채로 set_image와 predict를 함께 실행해야 합니다.
+        image_key(업로드 해시)가 세션 캐시에 있으면 무거운 이미지 인코더(set_image)를 건너뛰고
+        저장된 임베딩을 predictor에 복원합니다.
+        info가 주어지면 사용한 모델 크기와 이미지 인코더 실행 여부('variant', 'encoded')를 기록합니다.
+        """
+        if info is not None:
+            info.update(variant=variant, encoded=False)
+        predictor = self.models[f'sam2_{variant}']
+        cache = self.sam2_cache if image_key else None
+        session_key = self._sam2_session_key(variant, image_key) if image_key else None
+
+        if cache is not None:
+            entry = cache.get(session_key)
+            if entry is not None:
+                # SAM2ImagePredictor.set_image가 채우는 내부 상태를 그대로 복원
+                predictor.reset_predictor()
+                predictor._features = entry['features']
+                predictor._orig_hw = entry['orig_hw']
+                predictor._is_image_set = True
+                predictor._is_batch = False
+                logger.info(f"[SAM2] 세션 캐시 hit ({variant}): {image_key[:12]}")
+                return predictor
+
+        predictor.set_image(image)
+        if info is not None:
+            info['encoded'] = True
+
+        if cache is not None:
+            cache.put(session_key, {
+                'features': predictor._features,
+                'orig_hw': predictor._orig_hw,
+                'image': image,  # /refine-mask에서 크롭 생성용
+            })
+        return predictor
+
+    def get_sam2_session_image(self, image_key: str):
+        """세션 캐시에 보관된 원본 이미지 반환 (어느 모델 크기의 세션이든, 없으면 None)"""
+        if self.sam2_cache is None:
+            return None
+        for variant in reversed(self.sam2_variants):
+            entry = self.sam2_cache.get(self._sam2_session_key(variant, image_key))
+            if entry is not None:
+                return entry['image']
+        return None
+
+    def refine_sam2_mask(
+        self, image: np.ndarray, image_key: str, points: list, labels: list, box=None, variant: str = None
+    ):
+        """
+        라벨링 UI의 추가 클릭(positive/negative)으로 마스크를 다시 예측합니다.
+        같은 image_key의 임베딩이 캐시에 있으면 마스크 디코더만 실행됩니다.
+        
+        Args:
+            image (numpy.ndarray): 입력 이미지
+            image_key (str): 업로드 콘텐츠 해시
+            points (list): [[x, y], ...] 클릭 좌표
+            labels (list): 각 클릭의 라벨 (1=foreground, 0=background)
+            box (list): 선택적 [x1, y1, x2, y2] 박스 프롬프트
+            variant (str): SAM2 모델 크기 (None이면 image_key 세션을 만든 모델)
+        
+        Returns:
+            numpy.ndarray: 마스크 (H, W) 또는 None
+        """
+        if not self.ensure_loaded('sam2'):
+            logger.warning("SAM2 모델이 로드되지 않았습니다.")
+            return None
+
+        try:
+            variant = self._resolve_sam2_variant(variant, image_key)
+            with self._sam2_locks[variant]:
+                predictor = self._set_sam2_image(image, image_key, variant)
+                mask, _, _ = predictor.predict(
+                    point_coords=np.array(points) if points else None,
+                    point_labels=np.array(labels) if points else None,
+                    box=np.asarray(box, dtype=np.float32) if box is not None else None,
+                    multimask_output=False
+                )
+
+            logger.info(
+                f"[SAM2] Mask refinement completed ({variant}): {len(points)} points, box={box is not None}"
+            )
+            return mask.squeeze() > 0
+
+        except Exception as e:
+            logger.error(f"SAM2 마스크 보정 실패: {e}")
+            return None
+
+    def predict_sam2_with_points(
+        self,
+        image: np.ndarray,
+        points: list,
+        labels: list = None,
+        image_key: str = None,
+        variant: str = None,
+        with_info: bool = False,
+    ):
         """
         SAM2 모델을 사용하여 여러 포인트 프롬프트로 세그멘테이션 마스크를 생성합니다.
         여러 포인트를 주면 모든 포인트의 객체가 하나의 마스크로 합쳐집니다.
@@ -323,11 +786,19 @@ class ModelManager:
             image (numpy.ndarray): 입력 이미지 (RGB)
             points (list): [[x1, y1], [x2, y2], ...] 포인트 좌표 리스트
             labels (list): [1, 1, ...] 각 포인트의 라벨 (1=foreground, 0=background)
+            image_key (str): 업로드 콘텐츠 해시 (지정 시 SAM2 이미지 임베딩을 세션 캐시에 보관/재사용)
+            variant (str): SAM2 모델 크기 (None이면 로드된 가장 큰 모델)
+            with_info (bool): True면 (마스크, info) 반환 (info: 실제 사용한 'variant', 이미지 인코더 실행 여부 'encoded')
         
         Returns:
             numpy.ndarray: 마스크 (H, W) 또는 None
         """
-        if 'sam2' not in self.models:
+        info = {'variant': None, 'encoded': False}
+        mask = self._predict_sam2_with_points(image, points, labels, image_key, variant, info)
+        return (mask, info) if with_info else mask
+
+    def _predict_sam2_with_points(self, image, points, labels, image_key, variant, info):
+        if not self.ensure_loaded('sam2'):
             logger.warning("SAM2 모델이 로드되지 않았습니다.")
             return None
         
@@ -335,21 +806,21 @@ class ModelManager:
             labels = [1] * len(points)  # 모든 포인트를 foreground로
         
         try:
-            predictor = self.models['sam2']
-            predictor.set_image(image)
-            
+            variant = self._resolve_sam2_variant(variant)
             point_coords = np.array(points)
             point_labels = np.array(labels)
             
-            mask, _, _ = predictor.predict(
-                point_coords=point_coords,
-                point_labels=point_labels,
-                box=None,
-                multimask_output=False
-            )
+            with self._sam2_locks[variant]:
+                predictor = self._set_sam2_image(image, image_key, variant, info)
+                mask, _, _ = predictor.predict(
+                    point_coords=point_coords,
+                    point_labels=point_labels,
+                    box=None,
+                    multimask_output=False
+                )
             
-            logger.info(f"[SAM2] Multi-point segmentation completed: {len(points)} points")
-            return mask.squeeze()
+            logger.info(f"[SAM2] Multi-point segmentation completed ({variant}): {len(points)} points")
+            return mask.squeeze() > 0  # float32 대신 bool로 보관 (메모리 1/4)
             
         except Exception as e:
             logger.error(f"SAM2 포인트 프롬프트 실패: {e}")
@@ -367,223 +838,146 @@ class ModelManager:
         Returns:
             list: 탐지된 객체 정보 리스트 (label, confidence, xyxy box)
         """
-        detections = []
-        h, w = image.shape[:2]
+        return self.predict_yolo_batch([image], conf=conf)[0]
+
+    def predict_yolo_batch(self, images: list, conf=0.5):
+        """
+        여러 이미지를 한 번의 YOLO 호출로 탐지합니다. (요청 간 micro-batching용)
+        
+        Args:
+            images (list): 입력 이미지 리스트 (크기가 달라도 됨)
+            conf (float): 자신감 임계값
+        Returns:
+            list: 이미지별 탐지 결과 리스트 (각 항목은 predict_yolo 반환 형식)
+        """
+        batch_detections = [[] for _ in images]
+        if not images:
+            return batch_detections
+        self.ensure_loaded('yolo')
         
         # Stage 1: 의류/신발/가방/액세서리 분류
         if 'yolo_stage1' in self.models:
             try:
-                stage1_results = self.models['yolo_stage1'](image, conf=conf)
-                
-                for result in stage1_results:
-                    boxes = result.boxes
-                    for box in boxes:
-                        cls_id = int(box.cls[0])
-                        label = result.names[cls_id]
-                        confidence = float(box.conf[0])
-                        xyxy = box.xyxy[0].cpu().numpy()
-                        
-                        # Shoes는 그대로 추가
-                        if label.lower() == 'shoes':
-                            detections.append({
-                                "label": "shoes",
-                                "confidence": confidence,
-                                "box": xyxy
-                            })
-                        
-                        # Clothing은 Stage 2 비활성화 - Bedrock에서 상세 분류 담당
-                        elif label.lower() == 'clothing':
-                            # Stage 2 비활성화: 일반 clothing으로 추가
-                            # Bedrock Claude가 상세 분류 (category, sub_category 등) 처리
-                            detections.append({
-                                "label": "clothing",
-                                "confidence": confidence,
-                                "box": xyxy
-                            })
-                        
-                        # Bags, Accessories는 무시 (의류 앱이므로)
-                        
+                stage1_results = self.models['yolo_stage1'](images, conf=conf)
+                for detections, result in zip(batch_detections, stage1_results):
+                    detections.extend(self._parse_stage1_result(result))
             except Exception as e:
                 logger.error(f"Stage 1 YOLO 예측 실패: {e}")
         
         # Fallback: Stage 1이 없으면 Stage 2만 사용
         elif 'yolo_stage2' in self.models:
             try:
-                results = self.models['yolo_stage2'](image, conf=conf)
-                for result in results:
-                    boxes = result.boxes
-                    for box in boxes:
-                        cls_id = int(box.cls[0])
-                        label = result.names[cls_id]
-                        confidence = float(box.conf[0])
-                        xyxy = box.xyxy[0].cpu().numpy()
-                        
-                        detections.append({
-                            "label": label,
-                            "confidence": confidence,
-                            "box": xyxy
-                        })
+                results = self.models['yolo_stage2'](images, conf=conf)
+                for detections, result in zip(batch_detections, results):
+                    detections.extend(self._parse_stage2_result(result))
             except Exception as e:
                 logger.error(f"Stage 2 YOLO 예측 실패: {e}")
         
         # 중복 제거: 같은 라벨의 겹치는 박스 병합 (IoU > 0.3)
-        detections = self._nms_by_label(detections, iou_threshold=0.3)
-        
-        return detections
+        return [self._nms_by_label(detections, iou_threshold=0.3) for detections in batch_detections]
+
+    @staticmethod
+    def _result_to_numpy(result):
+        """
+        YOLO 결과의 박스/신뢰도/클래스를 한 번의 device→host 복사로 가져옵니다.
+        Returns:
+            tuple: (xyxy [N, 4], confidences [N], class_ids [N])
+        """
+        # boxes.data: [N, 6] = (x1, y1, x2, y2, conf, cls), 트래킹 시 [N, 7]
+        if isinstance(result, DetectionResult):  # ONNX Runtime 백엔드 (이미 numpy)
+            data = result.data
+        else:
+            data = result.boxes.data.cpu().numpy()
+        return data[:, :4], data[:, -2], data[:, -1].astype(np.int64)
+
+    def _parse_stage1_result(self, result):
+        """Stage 1 결과에서 shoes / clothing 박스만 추출"""
+        xyxy, confidences, class_ids = self._result_to_numpy(result)
+
+        # Shoes / Clothing만 사용 (Clothing은 Stage 2 비활성화 - Bedrock Claude가 상세 분류 담당)
+        # Bags, Accessories는 무시 (의류 앱이므로)
+        label_by_class = {
+            cls_id: name.lower()
+            for cls_id, name in result.names.items()
+            if name.lower() in ('shoes', 'clothing')
+        }
+        keep = np.isin(class_ids, list(label_by_class))
+
+        return [
+            {"label": label_by_class[int(cls_id)], "confidence": float(confidence), "box": box}
+            for box, confidence, cls_id in zip(xyxy[keep], confidences[keep], class_ids[keep])
+        ]
+
+    def _parse_stage2_result(self, result):
+        """Stage 2 (DeepFashion2) 결과를 그대로 변환"""
+        xyxy, confidences, class_ids = self._result_to_numpy(result)
+        return [
+            {"label": result.names[int(cls_id)], "confidence": float(confidence), "box": box}
+            for box, confidence, cls_id in zip(xyxy, confidences, class_ids)
+        ]
     
-    def _calculate_iou(self, box1, box2):
-        """두 박스의 IoU(Intersection over Union) 계산"""
-        x1 = max(box1[0], box2[0])
-        y1 = max(box1[1], box2[1])
-        x2 = min(box1[2], box2[2])
-        y2 = min(box1[3], box2[3])
-        
-        inter_area = max(0, x2 - x1) * max(0, y2 - y1)
-        box1_area = (box1[2] - box1[0]) * (box1[3] - box1[1])
-        box2_area = (box2[2] - box2[0]) * (box2[3] - box2[1])
-        union_area = box1_area + box2_area - inter_area
-        
-        return inter_area / union_area if union_area > 0 else 0
+    @staticmethod
+    def _iou_matrix(boxes: np.ndarray) -> np.ndarray:
+        """[N, 4] xyxy 박스들의 쌍별 IoU 행렬 [N, N] 계산 (postprocess.iou_matrix)"""
+        return postprocess.iou_matrix(boxes)
     
     def _nms_by_label(self, detections, iou_threshold=0.3):
-        """같은 라벨끼리 NMS 적용하여 중복 박스 제거
-        - shoes 라벨은 가까운 박스들을 하나의 union box로 합침 (한 쌍의 신발 처리)
-        - 다른 라벨은 IoU 기반 NMS 적용
-        """
-        if not detections:
-            return detections
-        
-        # 라벨별로 그룹화
-        from collections import defaultdict
-        label_groups = defaultdict(list)
-        for d in detections:
-            label_groups[d['label']].append(d)
-        
-        result = []
-        for label, group in label_groups.items():
-            
-            # shoes는 가까운 박스들을 그룹으로 합침 (한 쌍의 신발 처리)
-            if label.lower() == 'shoes':
-                shoe_groups = self._group_nearby_shoes(group)
-                for shoe_group in shoe_groups:
-                    if len(shoe_group) >= 1:
-                        # 그룹 내 모든 박스를 포함하는 union box 계산
-                        all_boxes = [d['box'] for d in shoe_group]
-                        x1 = min(b[0] for b in all_boxes)
-                        y1 = min(b[1] for b in all_boxes)
-                        x2 = max(b[2] for b in all_boxes)
-                        y2 = max(b[3] for b in all_boxes)
-                        
-                        # 가장 높은 confidence 사용
-                        max_conf = max(d['confidence'] for d in shoe_group)
-                        
-                        result.append({
-                            "label": "shoes",
-                            "confidence": max_conf,
-                            "box": np.array([x1, y1, x2, y2])
-                        })
-            else:
-                # 다른 라벨은 IoU 기반 NMS
-                group = sorted(group, key=lambda x: x['confidence'], reverse=True)
-                keep = []
-                
-                while group:
-                    best = group.pop(0)
-                    keep.append(best)
-                    
-                    # IoU가 threshold 이상인 박스 제거
-                    group = [d for d in group 
-                            if self._calculate_iou(best['box'], d['box']) < iou_threshold]
-                
-                result.extend(keep)
-        
-        return result
+        """같은 라벨끼리 NMS + 신발 한 켤레 묶기 (postprocess.nms_by_label)"""
+        return postprocess.nms_by_label(detections, iou_threshold)
     
     def _group_nearby_shoes(self, shoe_detections, proximity_ratio=2.0):
-        """가까이 있는 신발 박스들을 그룹으로 묶음 (한 쌍의 신발 처리)
-        
-        Args:
-            shoe_detections: 신발 탐지 결과 리스트
-            proximity_ratio: 박스 크기 대비 거리 비율 (이 비율 이내면 같은 그룹)
-        
-        Returns:
-            list: 그룹화된 신발 탐지 리스트의 리스트
-        """
-        if len(shoe_detections) <= 1:
-            return [shoe_detections] if shoe_detections else []
-        
-        # 이미 그룹에 할당된 인덱스 추적
-        assigned = set()
-        groups = []
-        
-        for i, det1 in enumerate(shoe_detections):
-            if i in assigned:
-                continue
-            
-            # 새 그룹 시작
-            current_group = [det1]
-            assigned.add(i)
-            
-            box1 = det1['box']
-            center1 = ((box1[0] + box1[2]) / 2, (box1[1] + box1[3]) / 2)
-            size1 = max(box1[2] - box1[0], box1[3] - box1[1])
-            
-            for j, det2 in enumerate(shoe_detections):
-                if j in assigned:
-                    continue
-                
-                box2 = det2['box']
-                center2 = ((box2[0] + box2[2]) / 2, (box2[1] + box2[3]) / 2)
-                size2 = max(box2[2] - box2[0], box2[3] - box2[1])
-                
-                # 두 박스 중심 간 거리 계산
-                distance = ((center1[0] - center2[0])**2 + (center1[1] - center2[1])**2)**0.5
-                avg_size = (size1 + size2) / 2
-                
-                # 거리가 박스 크기의 proximity_ratio 배 이내면 같은 그룹
-                # 또는 Y좌표가 비슷하면 (같은 줄에 있는 신발)
-                y_diff = abs(center1[1] - center2[1])
-                
-                if distance < avg_size * proximity_ratio or (y_diff < avg_size * 0.5 and distance < avg_size * 3.0):
-                    current_group.append(det2)
-                    assigned.add(j)
-            
-            groups.append(current_group)
-        
-        logger.info(f"[Shoes] {len(shoe_detections)}개 신발 박스 → {len(groups)}개 그룹으로 병합")
-        return groups
+        """가까이 있는 신발 박스를 한 켤레(최대 2개)씩 묶음 (postprocess.group_nearby_shoes)"""
+        return postprocess.group_nearby_shoes(shoe_detections, proximity_ratio)
 
-    def predict_sam2(self, image, boxes):
+    def predict_sam2(self, image, boxes, image_key: str = None, variant: str = None, with_info: bool = False):
         """
         SAM2 모델을 사용하여 주어진 바운딩 박스에 대한 세그멘테이션 마스크를 생성합니다.
+        모든 박스를 한 번의 마스크 디코더 호출로 처리하고, 각 마스크는 박스 영역으로 잘라 반환합니다.
         Args:
             image (numpy.ndarray): 입력 이미지 (RGB)
             boxes (list): 바운딩 박스 리스트 (xyxy 형식)
+            image_key (str): 업로드 콘텐츠 해시 (지정 시 SAM2 이미지 임베딩을 세션 캐시에 보관/재사용)
+            variant (str): SAM2 모델 크기 (None이면 로드된 가장 큰 모델)
+            with_info (bool): True면 (마스크 리스트, info) 반환 (info: 실제 사용한 'variant', 이미지 인코더 실행 여부 'encoded')
         Returns:
-            list: 마스크 리스트
+            list: 박스 영역으로 크롭된 bool 마스크 리스트 (각 shape: box_h x box_w)
         """
-        if 'sam2' not in self.models:
+        info = {'variant': None, 'encoded': False}
+        masks = self._predict_sam2(image, boxes, image_key, variant, info)
+        return (masks, info) if with_info else masks
+
+    def _predict_sam2(self, image, boxes, image_key, variant, info):
+        if not self.ensure_loaded('sam2'):
             logger.warning("SAM2 모델이 로드되지 않았습니다. (체크포인트 필요)")
             return None
+
+        if len(boxes) == 0:
+            return []
         
         try:
-            predictor = self.models['sam2']
-            predictor.set_image(image)
+            variant = self._resolve_sam2_variant(variant)
+            # box expects [N, 4] (x1, y1, x2, y2) - 모든 박스를 한 번에 디코딩
+            box_array = np.asarray([np.asarray(b, dtype=np.float32) for b in boxes])
             
-            masks = []
-            for box in boxes:
-                # box expects [x1, y1, x2, y2]
-                mask, _, _ = predictor.predict(
+            with self._sam2_locks[variant]:
+                predictor = self._set_sam2_image(image, image_key, variant, info)
+                masks, _, _ = predictor.predict(
                     point_coords=None,
                     point_labels=None,
-                    box=box,
+                    box=box_array,
                     multimask_output=False
                 )
-                # mask shape: (1, H, W) -> squeeze to (H, W)
-                masks.append(mask.squeeze())
+            # masks shape: (N, 1, H, W) 또는 (1, H, W) -> (N, H, W)
+            masks = masks.reshape(len(boxes), *masks.shape[-2:])
+
+            h, w = image.shape[:2]
+            # 박스 영역만 bool로 복사해 보관 (전체 프레임 float 마스크는 이 함수 밖으로 나가지 않음)
+            cropped_masks = []
+            for box, mask in zip(boxes, masks):
+                x1, y1, x2, y2 = utils.clip_box(box, w, h)
+                cropped_masks.append(mask[y1:y2, x1:x2] > 0)
             
-            return masks
+            return cropped_masks
         except Exception as e:
             logger.error(f"SAM2 예측 실패: {e}")
             return None
-
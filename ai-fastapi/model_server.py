@@ -0,0 +1,191 @@
+"""
+모델 서버 (디바이스당 하나의 모델 소유 프로세스)
+
+uvicorn --workers N으로 띄우면 워커마다 ModelManager가 모든 모델을 로드해 RAM/VRAM이 N배가 됩니다.
+이 모드에서는 디바이스마다 모델 서버 프로세스 하나만 모델을 로드하고,
+가벼운 HTTP 워커들(main.py)이 RemoteModelManager(model_client.py)로 추론을 요청합니다.
+- 제어 메시지: multiprocessing.connection (Unix 소켓 또는 TCP, authkey 인증)
+- 이미지 / 크롭 / 마스크: shm_transport 공유 메모리
+- 연결마다 스레드 하나, 모델별 동시 실행 수는 INFERENCE_CONCURRENCY와 같은 기준으로 서버 전체에 적용
+- 보안: 인증 키는 실행마다 secrets로 생성해 환경 변수로 자식 프로세스에만 전달하고 (직접 지정 가능),
+  Unix 소켓은 소유자만 접근할 수 있는 임시 폴더(0700)에 만듭니다
+
+실행:
+    python model_server.py                     # 모델 서버(들) + uvicorn HTTP 워커 실행
+    python model_server.py --serve <address>   # 모델 서버 하나만 실행 (위 명령이 내부적으로 사용)
+"""
+
+import logging
+import os
+import secrets
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing.connection import Listener
+
+from inference_executor import MODEL_GROUP_LIMITS, parse_concurrency
+from model_client import parse_address, require_authkey
+import shm_transport
+
+logger = logging.getLogger(__name__)
+
+# HTTP 워커 수 / 디바이스 목록 (CUDA 장치 번호 콤마 구분, 비우면 기본 장치에 서버 하나)
+HTTP_WORKERS = int(os.getenv("HTTP_WORKERS", "4"))
+MODEL_SERVER_DEVICES = os.getenv("MODEL_SERVER_DEVICES", "")
+# 소켓 폴더를 만들 상위 폴더 (비우면 시스템 임시 폴더) / 인증 키 (비우면 launch()가 실행마다 생성)
+MODEL_SERVER_SOCKET_DIR = os.getenv("MODEL_SERVER_SOCKET_DIR", "")
+MODEL_SERVER_AUTHKEY = os.getenv("MODEL_SERVER_AUTHKEY", "")
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "55554"))
+
+# 원격 호출 가능한 메서드 -> 동시 실행 제한 이름 (None: 제한 없음, "group": 첫 인자가 모델 그룹)
+METHOD_LIMITS = {
+    "predict_yolo_batch": "yolo",
+    "predict_sam2": "sam2",
+    "predict_sam2_with_points": "sam2",
+    "refine_sam2_mask": "sam2",
+    "get_sam2_session_image": None,
+    "extract_embeddings": "embedding",
+    "extract_text_embeddings": "clip",
+    "detect_item_type_with_clip": "clip",
+    "ensure_loaded": "group",
+    "describe": None,
+    "status": None,
+}
+
+
+class ModelServer:
+    """ModelManager를 소유하고 HTTP 워커의 추론 요청을 처리"""
+
+    def __init__(self, manager, address, authkey: bytes, model_limits: dict):
+        self.manager = manager
+        self.address = parse_address(address)
+        self.authkey = require_authkey(authkey)
+        self._semaphores = {
+            name: threading.BoundedSemaphore(limit) for name, limit in model_limits.items()
+        }
+
+    def serve_forever(self):
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)  # 이전 실행에서 남은 소켓 파일
+        with Listener(self.address, authkey=self.authkey) as listener:
+            logger.info(f"[ModelServer] 요청 대기 중: {self.address}")
+            while True:
+                try:
+                    connection = listener.accept()
+                except Exception as e:  # 인증 실패 등
+                    logger.warning(f"[ModelServer] 연결 거부: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+
+    def _dispatch(self, method: str, args: tuple, kwargs: dict):
+        if method not in METHOD_LIMITS:
+            raise ValueError(f"지원하지 않는 메서드입니다: {method}")
+        limit = METHOD_LIMITS[method]
+        if limit == "group":
+            limit = MODEL_GROUP_LIMITS[args[0]]
+        semaphore = self._semaphores.get(limit) if limit else None
+
+        if semaphore is None:
+            return getattr(self.manager, method)(*args, **kwargs)
+        with semaphore:
+            return getattr(self.manager, method)(*args, **kwargs)
+
+    def _handle(self, connection):
+        with connection:
+            while True:
+                try:
+                    method, args, kwargs = connection.recv()
+                except (EOFError, OSError):
+                    return
+
+                owned = []
+                try:
+                    result = self._dispatch(method, shm_transport.unpack(args), shm_transport.unpack(kwargs))
+                    response = ("ok", shm_transport.pack(result, owned))
+                except Exception as e:
+                    logger.error(f"[ModelServer] {method} 실패: {e}")
+                    shm_transport.release(owned)
+                    response = ("error", f"{type(e).__name__}: {e}")
+
+                try:
+                    connection.send(response)
+                except (EOFError, OSError):
+                    shm_transport.release(owned)  # 클라이언트가 끊김: 응답 버퍼는 여기서 삭제
+                    return
+                # 응답 버퍼는 클라이언트가 읽고 삭제
+                shm_transport.release(owned, unlink=False)
+
+
+def _warmup(manager, sizes, rounds):
+    """요청을 받기 전에 로드된 모델을 합성 이미지로 워밍업 (main._warmup과 같은 내용, 동기 실행)"""
+    from model_manager import MODEL_GROUPS, synthetic_image
+
+    groups = [group for group in MODEL_GROUPS if manager.is_loaded(group)]
+    start = time.time()
+    for _ in range(rounds):
+        for width, height in sizes:
+            image = synthetic_image(height, width)
+            for group in groups:
+                manager.warmup_model(group, image)
+    logger.info(f"[ModelServer] 워밍업 완료: {groups}, {time.time() - start:.2f}초")
+
+
+def serve(address: str):
+    """모델 서버 하나 실행: main.py와 같은 환경 변수로 모델 / 캐시를 준비한 뒤 요청 대기"""
+    import main
+
+    manager = main.setup_model_manager()
+    # HTTP 워커의 /ready는 모델 서버 연결 시점이므로 지연 로딩 그룹도 요청을 받기 전에 로드
+    for group in main._background_load_groups():
+        manager.ensure_loaded(group)
+    if main.WARMUP_SIZES and main.WARMUP_ROUNDS > 0:
+        _warmup(manager, main.WARMUP_SIZES, main.WARMUP_ROUNDS)
+    server = ModelServer(
+        manager, address, MODEL_SERVER_AUTHKEY.encode(), parse_concurrency(main.INFERENCE_CONCURRENCY)
+    )
+    try:
+        server.serve_forever()
+    finally:
+        main.teardown_model_manager(manager)
+
+
+def launch():
+    """디바이스마다 모델 서버를 띄우고, 그 주소로 uvicorn HTTP 워커들을 실행"""
+    import uvicorn
+
+    devices = [device.strip() for device in MODEL_SERVER_DEVICES.split(",") if device.strip()] or [None]
+    # 모델 서버와 HTTP 워커만 아는 키 (환경 변수로 자식 프로세스에 전달), 소켓은 0700 폴더 안에 생성
+    os.environ["MODEL_SERVER_AUTHKEY"] = MODEL_SERVER_AUTHKEY or secrets.token_bytes(32).hex()
+    socket_dir = tempfile.mkdtemp(prefix="closzit-model-", dir=MODEL_SERVER_SOCKET_DIR or None)
+    processes, addresses = [], []
+    for index, device in enumerate(devices):
+        address = os.path.join(socket_dir, f"model-{index}.sock")
+        env = dict(os.environ)
+        if device is not None:
+            env["CUDA_VISIBLE_DEVICES"] = device
+        processes.append(subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", address], env=env))
+        addresses.append(address)
+        logger.info(f"[ModelServer] 디바이스 {device or '기본'} -> {address}")
+
+    # HTTP 워커는 모델 없이 시작하고, 모델 서버가 준비될 때까지 /ready가 503
+    os.environ["MODEL_SERVER_ADDRESSES"] = ",".join(addresses)
+    try:
+        uvicorn.run("main:app", host=HOST, port=PORT, workers=HTTP_WORKERS)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        shutil.rmtree(socket_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) == 3 and sys.argv[1] == "--serve":
+        serve(sys.argv[2])
+    else:
+        launch()
@@ -0,0 +1,149 @@
+"""
+ONNX Runtime YOLO 탐지기 (CPU 전용 replica용)
+
+ultralytics PyTorch 모델(yolov8n-clothing) 대신 ONNX로 내보낸 모델을 ONNX Runtime으로 실행합니다.
+- 체크포인트(.pt)보다 오래되었거나 없는 .onnx는 시작 시 ultralytics로 다시 내보냄
+- 전처리(letterbox)와 후처리(confidence 필터 + 클래스별 NMS)는 ultralytics 기본값과 동일
+- 결과는 DetectionResult (names, data [N, 6])로 반환하여 ModelManager의 기존 파싱 로직을 그대로 사용
+"""
+
+import ast
+import logging
+import os
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+logger = logging.getLogger(__name__)
+
+# ultralytics 기본 후처리 값
+NMS_IOU_THRESHOLD = 0.7
+MAX_DETECTIONS = 300
+MAX_WH = 7680  # 클래스별 NMS를 위한 박스 오프셋
+LETTERBOX_COLOR = (114, 114, 114)
+
+
+class DetectionResult:
+    """ultralytics Results 중 파싱에 필요한 부분 (names, boxes.data와 같은 [N, 6] 배열)"""
+
+    __slots__ = ("names", "data")
+
+    def __init__(self, names: Dict[int, str], data: np.ndarray):
+        self.names = names
+        self.data = data  # (x1, y1, x2, y2, conf, cls)
+
+
+def export_onnx(checkpoint: str, onnx_path: str, imgsz: int = 640) -> str:
+    """
+    .pt 체크포인트를 ONNX(동적 배치)로 내보냅니다. 이미 최신 .onnx가 있으면 그대로 사용합니다.
+    Returns:
+        str: .onnx 파일 경로
+    """
+    if os.path.exists(onnx_path) and os.path.getmtime(onnx_path) >= os.path.getmtime(checkpoint):
+        return onnx_path
+
+    from ultralytics import YOLO
+
+    logger.info(f"[ONNX] {checkpoint} -> {onnx_path} 내보내는 중...")
+    exported = YOLO(checkpoint).export(format="onnx", imgsz=imgsz, dynamic=True)
+    if os.path.abspath(exported) != os.path.abspath(onnx_path):
+        os.replace(exported, onnx_path)
+    logger.info("[ONNX] 내보내기 완료.")
+    return onnx_path
+
+
+def _letterbox(image: np.ndarray, size: int):
+    """비율을 유지해 size x size에 맞추고 남는 영역은 회색으로 채움 (ultralytics LetterBox와 동일)"""
+    h, w = image.shape[:2]
+    gain = min(size / h, size / w)
+    new_w, new_h = int(round(w * gain)), int(round(h * gain))
+    pad_x, pad_y = (size - new_w) / 2, (size - new_h) / 2
+
+    if (new_w, new_h) != (w, h):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=LETTERBOX_COLOR)
+    return image, gain, (left, top)
+
+
+class OnnxYoloDetector:
+    """
+    ONNX Runtime CPU 세션으로 YOLOv8 탐지를 실행합니다.
+    model(images, conf=0.5) 형태로 ultralytics YOLO와 같은 방식으로 호출합니다.
+    """
+
+    def __init__(self, onnx_path: str, threads: int = 0):
+        if ort is None:
+            raise ImportError("onnxruntime 라이브러리를 찾을 수 없습니다. pip install onnxruntime 실행 필요")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+        # ultralytics가 내보낸 메타데이터: names="{0: 'Clothing', ...}", imgsz="[640, 640]"
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata["names"]) if "names" in metadata else {}
+        self.imgsz = int(ast.literal_eval(metadata["imgsz"])[0]) if "imgsz" in metadata else 640
+
+    def __call__(self, images: List[np.ndarray], conf: float = 0.5) -> List[DetectionResult]:
+        if not images:
+            return []
+
+        # 전처리: letterbox → BGR→RGB → [0, 1] → NCHW
+        batch, transforms = [], []
+        for image in images:
+            padded, gain, pad = _letterbox(image, self.imgsz)
+            batch.append(padded[:, :, ::-1])
+            transforms.append((gain, pad, image.shape[:2]))
+        inputs = np.ascontiguousarray(np.stack(batch).transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+
+        # 출력: [B, 4 + 클래스 수, 앵커 수] (cx, cy, w, h, 클래스 점수...)
+        outputs = self.session.run(None, {self.input_name: inputs})[0]
+        return [
+            DetectionResult(self.names, self._postprocess(output, conf, *transform))
+            for output, transform in zip(outputs, transforms)
+        ]
+
+    @staticmethod
+    def _postprocess(output: np.ndarray, conf: float, gain: float, pad, shape) -> np.ndarray:
+        """confidence 필터 → 클래스별 NMS → 원본 좌표로 복원, [N, 6] 반환"""
+        predictions = output.T  # [앵커 수, 4 + 클래스 수]
+        scores = predictions[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+        keep = confidences > conf
+        if not keep.any():
+            return np.zeros((0, 6), dtype=np.float32)
+
+        cxcywh, confidences, class_ids = predictions[keep, :4], confidences[keep], class_ids[keep]
+        xyxy = np.empty_like(cxcywh)
+        xyxy[:, :2] = cxcywh[:, :2] - cxcywh[:, 2:] / 2
+        xyxy[:, 2:] = cxcywh[:, :2] + cxcywh[:, 2:] / 2
+
+        # 클래스별 NMS: 클래스마다 박스를 멀리 떨어뜨려 한 번의 NMS로 처리 (ultralytics와 동일한 방식)
+        offset = xyxy + (class_ids * MAX_WH)[:, None]
+        xywh = np.concatenate([offset[:, :2], offset[:, 2:] - offset[:, :2]], axis=1)
+        indices = cv2.dnn.NMSBoxes(xywh.tolist(), confidences.tolist(), conf, NMS_IOU_THRESHOLD)
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)[:MAX_DETECTIONS]
+
+        # letterbox 역변환 후 이미지 경계로 클리핑
+        boxes = xyxy[indices]
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / gain
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / gain
+        h, w = shape
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, w)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, h)
+
+        return np.concatenate(
+            [boxes, confidences[indices, None], class_ids[indices, None].astype(np.float32)], axis=1
+        ).astype(np.float32)
@@ -0,0 +1,126 @@
+"""
+YOLO 탐지 후처리 (라벨별 NMS / 신발 한 켤레 묶기)
+
+torch / ultralytics 없이 NumPy만 사용하므로 ModelManager와 오프라인 벤치마크(benchmark.py)가
+같은 구현을 공유합니다. 탐지 결과는 {"label", "confidence", "box"(xyxy)} 딕셔너리 리스트입니다.
+"""
+
+import logging
+from collections import defaultdict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def iou_matrix(boxes: np.ndarray) -> np.ndarray:
+    """[N, 4] xyxy 박스들의 쌍별 IoU 행렬 [N, N] 계산"""
+    x1 = np.maximum(boxes[:, None, 0], boxes[None, :, 0])
+    y1 = np.maximum(boxes[:, None, 1], boxes[None, :, 1])
+    x2 = np.minimum(boxes[:, None, 2], boxes[None, :, 2])
+    y2 = np.minimum(boxes[:, None, 3], boxes[None, :, 3])
+
+    inter_area = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    union_area = areas[:, None] + areas[None, :] - inter_area
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(union_area > 0, inter_area / union_area, 0.0)
+
+
+def nms_by_label(detections, iou_threshold=0.3):
+    """같은 라벨끼리 NMS 적용하여 중복 박스 제거
+    - shoes 라벨은 가까운 박스 두 개(한 켤레)를 하나의 union box로 합침
+    - 다른 라벨은 IoU 기반 NMS 적용 (IoU 행렬을 NumPy로 한 번에 계산)
+    """
+    if not detections:
+        return detections
+
+    # 라벨별로 그룹화
+    label_groups = defaultdict(list)
+    for d in detections:
+        label_groups[d['label']].append(d)
+
+    result = []
+    for label, group in label_groups.items():
+
+        # shoes는 가까운 박스들을 그룹으로 합침 (한 쌍의 신발 처리)
+        if label.lower() == 'shoes':
+            shoe_groups = group_nearby_shoes(group)
+            for shoe_group in shoe_groups:
+                # 그룹 내 모든 박스를 포함하는 union box 계산
+                group_boxes = np.asarray([d['box'] for d in shoe_group]).reshape(-1, 4)
+                union_box = np.concatenate([group_boxes[:, :2].min(axis=0), group_boxes[:, 2:].max(axis=0)])
+
+                result.append({
+                    "label": "shoes",
+                    "confidence": max(d['confidence'] for d in shoe_group),  # 가장 높은 confidence 사용
+                    "box": union_box
+                })
+        else:
+            # 다른 라벨은 IoU 기반 NMS: confidence 내림차순으로 보며 IoU가 threshold 이상인 박스 제거
+            boxes = np.asarray([d['box'] for d in group], dtype=np.float64).reshape(-1, 4)
+            confidences = np.asarray([d['confidence'] for d in group])
+            order = np.argsort(-confidences, kind='stable')
+            iou = iou_matrix(boxes[order])
+            suppressed = np.zeros(len(order), dtype=bool)
+
+            for i in range(len(order)):
+                if suppressed[i]:
+                    continue
+                result.append(group[order[i]])
+                suppressed |= iou[i] >= iou_threshold
+
+    return result
+
+
+def group_nearby_shoes(shoe_detections, proximity_ratio=2.0):
+    """가까이 있는 신발 박스들을 그룹으로 묶음 (한 쌍의 신발 처리)
+
+    쌍별 중심 거리 / 크기 행렬을 NumPy로 계산하고, 가까운 박스 쌍을 거리가 짧은 순서로
+    탐욕적으로 매칭합니다. 그룹은 최대 2개(한 켤레)이므로 신발장 / 진열대처럼
+    신발이 한 줄로 이어진 사진에서도 전체가 하나로 합쳐지지 않습니다.
+
+    Args:
+        shoe_detections: 신발 탐지 결과 리스트
+        proximity_ratio: 박스 크기 대비 거리 비율 (이 비율 이내면 같은 그룹)
+
+    Returns:
+        list: 그룹화된 신발 탐지 리스트의 리스트 (각 그룹 1~2개, 가장 앞선 인덱스 순서)
+    """
+    if len(shoe_detections) <= 1:
+        return [shoe_detections] if shoe_detections else []
+
+    boxes = np.asarray([d['box'] for d in shoe_detections], dtype=np.float64).reshape(-1, 4)
+    centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+    sizes = np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+
+    # 두 박스 중심 간 거리 / 평균 크기 / Y좌표 차이 (쌍별 행렬)
+    deltas = centers[:, None, :] - centers[None, :, :]
+    distance = np.hypot(deltas[..., 0], deltas[..., 1])
+    avg_size = (sizes[:, None] + sizes[None, :]) / 2
+    y_diff = np.abs(deltas[..., 1])
+
+    # 거리가 박스 크기의 proximity_ratio 배 이내면 같은 그룹
+    # 또는 Y좌표가 비슷하면 (같은 줄에 있는 신발)
+    near = (distance < avg_size * proximity_ratio) | ((y_diff < avg_size * 0.5) & (distance < avg_size * 3.0))
+
+    # 가까운 쌍부터 매칭 (거리가 같으면 앞선 인덱스 우선), 이미 짝이 있는 박스는 건너뜀
+    rows, cols = np.nonzero(np.triu(near, k=1))
+    order = np.lexsort((cols, rows, distance[rows, cols]))
+    partner = {}
+    for k in order:
+        i, j = int(rows[k]), int(cols[k])
+        if i not in partner and j not in partner:
+            partner[i] = j
+            partner[j] = i
+
+    groups = []
+    for i, det in enumerate(shoe_detections):
+        if i not in partner:
+            groups.append([det])
+        elif partner[i] > i:
+            groups.append([det, shoe_detections[partner[i]]])
+
+    logger.info(f"[Shoes] {len(shoe_detections)}개 신발 박스 → {len(groups)}개 그룹으로 병합")
+    return groups
@@ -0,0 +1,96 @@
+"""
+임베딩 모델 INT8 동적 양자화 (CPU 전용)
+
+FashionSigLIP / CLIP ViT의 nn.Linear(트랜스포머 MLP, 프로젝션)를 로딩 시점에 INT8 동적 양자화합니다.
+가중치는 INT8로 저장되고 활성값은 실행 시 배치마다 스케일을 계산하므로 보정 데이터가 필요 없습니다.
+양자화 후 샘플 입력에 대해 fp32 임베딩과의 코사인 유사도를 측정하여,
+기준(min_cosine)에 못 미치면 fp32 모델을 그대로 사용합니다.
+"""
+
+import logging
+import os
+import time
+from typing import Callable, List
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ("none", "int8")
+SAMPLE_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def quantize_dynamic_int8(model: "torch.nn.Module") -> "torch.nn.Module":
+    """nn.Linear를 INT8 동적 양자화한 사본을 반환 (원본은 유지)"""
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=False)
+
+
+def load_sample_images(sample_dir: str = None, limit: int = 16) -> List[np.ndarray]:
+    """
+    정확도 검증용 샘플 이미지 (BGR). sample_dir이 있으면 그 안의 이미지를,
+    없으면 합성 이미지(색 블록 + 노이즈)를 사용합니다. 실제 크롭을 넣을수록 측정이 정확합니다.
+    """
+    images = []
+    if sample_dir and os.path.isdir(sample_dir):
+        for name in sorted(os.listdir(sample_dir)):
+            if name.lower().endswith(SAMPLE_IMAGE_EXTENSIONS):
+                image = cv2.imread(os.path.join(sample_dir, name), cv2.IMREAD_COLOR)
+                if image is not None:
+                    images.append(image)
+            if len(images) >= limit:
+                break
+    if images:
+        return images
+
+    rng = np.random.default_rng(0)
+    for i in range(limit):
+        h, w = int(rng.integers(160, 640)), int(rng.integers(160, 640))
+        image = np.full((h, w, 3), rng.integers(0, 256, size=3), dtype=np.uint8)
+        # 옷/신발 실루엣을 흉내 낸 임의의 사각형 몇 개
+        for _ in range(3):
+            x1, y1 = int(rng.integers(0, w // 2)), int(rng.integers(0, h // 2))
+            x2, y2 = int(rng.integers(x1 + 10, w)), int(rng.integers(y1 + 10, h))
+            color = tuple(int(c) for c in rng.integers(0, 256, size=3))
+            cv2.rectangle(image, (x1, y1), (x2, y2), color, thickness=-1)
+        noise = rng.normal(0, 8, size=image.shape)
+        images.append(np.clip(image + noise, 0, 255).astype(np.uint8))
+    return images
+
+
+def compare_embeddings(
+    reference: Callable[[], "torch.Tensor"],
+    candidate: Callable[[], "torch.Tensor"],
+) -> dict:
+    """
+    같은 입력에 대한 fp32 / 양자화 임베딩의 코사인 유사도와 실행 시간을 측정합니다.
+    Args:
+        reference, candidate: 인자 없이 [N, D] 임베딩을 반환하는 함수
+    Returns:
+        dict: {'cosine_mean', 'cosine_min', 'fp32_ms', 'int8_ms', 'speedup'}
+    """
+    import torch
+
+    with torch.no_grad():
+        # 첫 호출은 지연 초기화 비용이 섞이므로 한 번씩 먼저 실행
+        reference()
+        candidate()
+
+        start = time.perf_counter()
+        ref = reference().float()
+        fp32_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        cand = candidate().float()
+        int8_ms = (time.perf_counter() - start) * 1000
+
+    cosine = torch.nn.functional.cosine_similarity(ref, cand, dim=-1)
+    return {
+        "cosine_mean": round(float(cosine.mean()), 5),
+        "cosine_min": round(float(cosine.min()), 5),
+        "fp32_ms": round(fp32_ms, 2),
+        "int8_ms": round(int8_ms, 2),
+        "speedup": round(fp32_ms / int8_ms, 2) if int8_ms > 0 else None,
+    }
@@ -0,0 +1,171 @@
+"""
+/analyze-all 결과 캐시 (콘텐츠 주소 기반)
+
+같은 사진을 여러 번 업로드하거나 프론트엔드가 재시도하는 경우
+YOLO → SAM2 → 임베딩 → 인코딩 전체를 다시 수행하지 않도록 결과를 보관합니다.
+- 키: SHA-256(업로드 바이트) + 파이프라인 설정 지문 (USE_SAM2, 임계값, 모델 버전)
+- L1: 메모리 (SessionCache, TTL + 바이트 상한)
+- L2: 디스크 (JSON 파일, 선택, 읽기/쓰기는 스레드 풀에서 실행해 이벤트 루프를 막지 않음)
+- Single-flight: 동일 키의 동시 요청은 하나의 계산 결과를 공유
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from session_cache import SessionCache
+
+logger = logging.getLogger(__name__)
+
+
+def config_fingerprint(config: dict) -> str:
+    """파이프라인 설정을 짧은 해시로 변환 (설정이 바뀌면 캐시 키도 바뀜)"""
+    payload = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class AnalyzeResultCache:
+    """메모리 + 디스크 2단계 결과 캐시와 single-flight"""
+
+    def __init__(
+        self,
+        memory_max_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: float = 3600,
+        disk_dir: Optional[str] = None,
+        disk_max_files: int = 10000,
+        disk_trim_interval: int = 100,
+    ):
+        self.memory = SessionCache(memory_max_bytes, ttl_seconds, name="ResultCache")
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_files = disk_max_files
+        self.disk_trim_interval = max(disk_trim_interval, 1)
+        self._puts_since_trim = 0
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.disk_hits = 0
+        self.shared_inflight = 0
+
+    @staticmethod
+    def make_key(content_hash: str, fingerprint: str) -> str:
+        return f"{content_hash}-{fingerprint}"
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    async def get(self, key: str) -> Optional[Any]:
+        """L1 → L2 순서로 조회, L2 hit은 L1으로 승격 (디스크 I/O는 스레드 풀에서 실행)"""
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        if self.disk_dir is None:
+            return None
+        value = await asyncio.get_running_loop().run_in_executor(None, self._read_disk, key)
+        if value is None:
+            return None
+        self.disk_hits += 1
+        self.memory.put(key, value)
+        return value
+
+    async def put(self, key: str, value: Any):
+        self.memory.put(key, value)
+        if self.disk_dir is None:
+            return
+        # 정리(glob + stat)는 매번 하지 않고 disk_trim_interval번 저장할 때마다 한 번
+        self._puts_since_trim += 1
+        trim = self._puts_since_trim >= self.disk_trim_interval
+        if trim:
+            self._puts_since_trim = 0
+        await asyncio.get_running_loop().run_in_executor(None, self._write_disk, key, value, trim)
+
+    def _read_disk(self, key: str) -> Optional[Any]:
+        path = self._disk_path(key)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"[ResultCache] 디스크 캐시 읽기 실패: {e}")
+            return None
+
+    def _write_disk(self, key: str, value: Any, trim: bool):
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+            if trim:
+                self._trim_disk()
+        except Exception as e:
+            logger.error(f"[ResultCache] 디스크 캐시 저장 실패: {e}")
+
+    def _trim_disk(self):
+        """디스크 파일 수가 상한을 넘으면 오래된 파일부터 삭제"""
+        files = list(self.disk_dir.glob("*/*.json"))
+        if len(files) <= self.disk_max_files:
+            return
+        mtimes = {}
+        for path in files:
+            try:
+                mtimes[path] = path.stat().st_mtime
+            except FileNotFoundError:
+                pass
+        oldest = sorted(mtimes, key=mtimes.get)
+        for path in oldest[: len(oldest) - self.disk_max_files]:
+            path.unlink(missing_ok=True)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        캐시에 있으면 바로 반환하고, 없으면 compute()를 실행합니다.
+        같은 키로 이미 실행 중인 계산이 있으면 새로 실행하지 않고 그 결과를 기다립니다.
+        계산은 별도 태스크로 실행하므로 처음 요청한 클라이언트가 연결을 끊어도
+        다른 대기자는 결과를 받고, 결과는 캐시에 저장됩니다.
+        """
+        value = await self.get(key)
+        if value is not None:
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.shared_inflight += 1
+            logger.info(f"[ResultCache] 동일 요청 처리 중 - 결과 공유: {key[:12]}")
+        else:
+            task = asyncio.ensure_future(self._compute_and_store(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish_inflight(key, done))
+        return await asyncio.shield(task)
+
+    async def _compute_and_store(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        value = await compute()
+        await self.put(key, value)
+        return value
+
+    def _finish_inflight(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 대기자가 모두 떠난 경우 "exception was never retrieved" 경고 방지
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        stats = self.memory.stats()
+        stats.update({
+            "disk_enabled": self.disk_dir is not None,
+            "disk_hits": self.disk_hits,
+            "shared_inflight": self.shared_inflight,
+            "inflight": len(self._inflight),
+        })
+        return stats
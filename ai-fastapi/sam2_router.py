@@ -0,0 +1,158 @@
+"""
+SAM2 모델 크기 라우팅
+
+SAM2_MODELS로 여러 크기(tiny, small, base_plus, large)를 함께 로드했을 때
+요청마다 어느 모델로 세그멘테이션할지 고릅니다.
+- 지연 시간 예산: 클라이언트가 보낸 sam2_budget_ms, 없으면 SAM2_LATENCY_BUDGET_MS (0이면 예산 없음)
+- 예상 지연 시간 = 모델별 호출 시간 추정치 × 아이템 수 보정 × (대기열 깊이 / 동시 실행 수 + 1)
+- 예산 안에 드는 가장 큰(정확한) 모델을 선택하고, 어느 것도 맞지 않으면 가장 빠른 모델
+- 작은 이미지(긴 변 ≤ SAM2_SMALL_IMAGE_DIM)는 가장 큰 모델을 쓰지 않음
+  (SAM2는 입력을 1024로 리사이즈하므로 저해상도에서는 large의 이점이 거의 없음)
+
+호출 시간 추정치는 SAM2_LATENCY_PRIOR_MS(large 기준)와 모델별 상대 비용으로 시작해
+실제 측정값(record)의 지수 이동 평균으로 갱신되므로 장치(GPU/CPU)에 맞게 수렴합니다.
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+# 빠른 순서 (ModelManager.SAM2_VARIANTS와 같은 이름)
+SAM2_VARIANT_ORDER = ("tiny", "small", "base_plus", "large")
+
+# large 대비 이미지 인코더 상대 비용 (초기 추정치, 측정값으로 갱신)
+RELATIVE_COST = {
+    "tiny": 0.25,
+    "small": 0.3,
+    "base_plus": 0.5,
+    "large": 1.0,
+}
+
+# 박스가 하나 늘 때마다 늘어나는 비용 비율 (마스크 디코더는 이미지 인코더보다 훨씬 가벼움)
+DECODER_COST_PER_ITEM = 0.05
+
+
+class Sam2Router:
+    """요청별 SAM2 모델 크기 선택기 (스레드 안전)"""
+
+    def __init__(
+        self,
+        variants: List[str],
+        default_budget_ms: float = 0,
+        small_image_dim: int = 0,
+        prior_ms: float = 500.0,
+        ewma_alpha: float = 0.2,
+    ):
+        """
+        Args:
+            variants (list): 사용할 모델 크기 (SAM2_VARIANT_ORDER 중, 순서 무관)
+            default_budget_ms (float): 요청에 예산이 없을 때의 예산 (0이면 항상 가장 큰 모델)
+            small_image_dim (int): 긴 변이 이 값 이하인 이미지는 가장 큰 모델 제외 (0이면 비활성화)
+            prior_ms (float): large 모델 호출 시간 초기 추정치 (박스 1개 기준)
+            ewma_alpha (float): 측정값 반영 비율
+        """
+        unknown = set(variants) - set(SAM2_VARIANT_ORDER)
+        if unknown:
+            raise ValueError(
+                f"알 수 없는 SAM2 모델입니다: {sorted(unknown)} (지원: {', '.join(SAM2_VARIANT_ORDER)})"
+            )
+        if not variants:
+            raise ValueError("SAM2 모델을 하나 이상 지정해야 합니다.")
+        self.variants = [v for v in SAM2_VARIANT_ORDER if v in variants]
+        self.default_budget_ms = default_budget_ms
+        self.small_image_dim = small_image_dim
+        self.ewma_alpha = ewma_alpha
+        self._base_ms: Dict[str, float] = {v: prior_ms * RELATIVE_COST[v] for v in self.variants}
+        self._samples = {v: 0 for v in self.variants}
+        self._selected = {v: 0 for v in self.variants}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _item_factor(items: int) -> float:
+        return 1.0 + DECODER_COST_PER_ITEM * (max(items, 1) - 1)
+
+    def _base(self, variant: str) -> float:
+        """박스 1개 기준 호출 시간 추정치. 아직 측정되지 않은 모델은 측정된 모델에서 상대 비용으로 환산"""
+        if self._samples[variant]:
+            return self._base_ms[variant]
+        for measured in self.variants:
+            if self._samples[measured]:
+                return self._base_ms[measured] / RELATIVE_COST[measured] * RELATIVE_COST[variant]
+        return self._base_ms[variant]
+
+    def estimate_ms(self, variant: str, items: int = 1, queue_depth: int = 0, concurrency: int = 1) -> float:
+        """대기열을 포함한 예상 지연 시간 (ms)"""
+        per_call = self._base(variant) * self._item_factor(items)
+        return per_call * (queue_depth / max(concurrency, 1) + 1)
+
+    def choose(
+        self,
+        width: int,
+        height: int,
+        items: int,
+        budget_ms: Optional[float] = None,
+        queue_depth: int = 0,
+        concurrency: int = 1,
+        requested: Optional[str] = None,
+        available: Optional[List[str]] = None,
+    ) -> str:
+        """
+        요청 하나에 사용할 SAM2 모델 크기를 고릅니다.
+        Args:
+            width, height (int): 디코딩된 이미지 크기
+            items (int): 세그멘테이션할 박스 수
+            budget_ms (float): 클라이언트 지연 시간 예산 (None이면 기본값)
+            queue_depth (int): 앞서 대기 / 실행 중인 SAM2 작업 수
+            concurrency (int): SAM2 동시 실행 수
+            requested (str): 클라이언트가 지정한 모델 (있으면 그대로 사용)
+            available (list): 실제로 로드된 모델 (비어 있으면 설정된 모델 전체, 지연 로딩 전)
+        Returns:
+            str: 모델 크기 이름
+        """
+        if requested is not None:
+            if requested not in self.variants:
+                raise ValueError(
+                    f"사용할 수 없는 SAM2 모델입니다: {requested} (사용 가능: {', '.join(self.variants)})"
+                )
+            variant = requested
+        else:
+            candidates = [v for v in self.variants if v in (available or self.variants)] or self.variants
+            variant = self._route(candidates, width, height, items, budget_ms, queue_depth, concurrency)
+        with self._lock:
+            self._selected[variant] += 1
+        return variant
+
+    def _route(self, candidates, width, height, items, budget_ms, queue_depth, concurrency) -> str:
+        if len(candidates) > 1 and self.small_image_dim and max(width, height) <= self.small_image_dim:
+            candidates = candidates[:-1]
+
+        budget = budget_ms if budget_ms is not None else self.default_budget_ms
+        if not budget or budget <= 0:
+            return candidates[-1]
+
+        for variant in reversed(candidates):
+            if self.estimate_ms(variant, items, queue_depth, concurrency) <= budget:
+                return variant
+        return candidates[0]
+
+    def record(self, variant: str, items: int, elapsed_ms: float):
+        """실제 SAM2 호출 시간(대기 제외)으로 추정치 갱신"""
+        if variant not in self._base_ms:
+            return
+        base = elapsed_ms / self._item_factor(items)
+        with self._lock:
+            if self._samples[variant] == 0:
+                self._base_ms[variant] = base  # 첫 측정값은 초기 추정치를 대체
+            else:
+                self._base_ms[variant] += self.ewma_alpha * (base - self._base_ms[variant])
+            self._samples[variant] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "variants": list(self.variants),
+                "default_budget_ms": self.default_budget_ms,
+                "small_image_dim": self.small_image_dim,
+                "estimated_ms": {v: round(self._base(v), 1) for v in self.variants},
+                "samples": dict(self._samples),
+                "selected": dict(self._selected),
+            }
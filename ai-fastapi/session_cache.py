@@ -0,0 +1,102 @@
+"""
+TTL + 바이트 상한 기반 인메모리 캐시
+
+SAM2 이미지 임베딩처럼 크기가 큰 값을 업로드 해시 단위로 잠시 보관할 때 사용합니다.
+- 마지막 접근 후 ttl_seconds가 지나면 만료
+- 전체 크기가 max_bytes를 넘으면 가장 오래 사용되지 않은 항목부터 제거
+"""
+
+import sys
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_nbytes(value: Any) -> int:
+    """텐서/배열/컨테이너의 대략적인 메모리 크기 계산"""
+    # 텐서가 들어왔다면 torch는 이미 로드되어 있음 (모델 서버 모드 HTTP 워커는 torch를 import하지 않음)
+    torch = sys.modules.get("torch")
+    if torch is not None and isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(estimate_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_nbytes(v) for v in value)
+    if isinstance(value, (int, float)):
+        return 32
+    return 64
+
+
+class SessionCache:
+    """TTL과 바이트 상한을 가진 스레드 안전 LRU 캐시"""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, name: str = "SessionCache"):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, size, accessed_at)
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, _ = entry
+            self._entries[key] = (value, size, now)
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any, size: Optional[int] = None):
+        size = estimate_nbytes(value) if size is None else size
+        if size > self.max_bytes:
+            logger.info(f"[{self.name}] 항목이 캐시 상한보다 커서 저장하지 않음: {size} bytes")
+            return
+        now = time.monotonic()
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self._entries[key] = (value, size, now)
+            self.total_bytes += size
+            self._expire(now)
+            while self.total_bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def _expire(self, now: float):
+        """TTL이 지난 항목 제거 (호출 시 lock 보유 필요, 앞쪽이 가장 오래된 항목)"""
+        while self._entries:
+            key, (_, size, accessed_at) = next(iter(self._entries.items()))
+            if now - accessed_at <= self.ttl_seconds:
+                break
+            self._entries.popitem(last=False)
+            self.total_bytes -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
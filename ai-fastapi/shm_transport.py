@@ -0,0 +1,123 @@
+"""
+프로세스 간 numpy 배열 공유 메모리 전달
+
+HTTP 워커 ↔ 모델 서버 사이에서 디코딩된 이미지 / 크롭 / 마스크를 pickle로 직렬화해
+소켓으로 보내는 대신, 공유 메모리 블록에 한 번 복사하고 (이름, shape, dtype)만 전송합니다.
+- pack(obj): obj 안의 큰 배열을 SharedArray 설명자로 치환 (중첩 list/tuple/dict 지원)
+- unpack(obj): 설명자를 읽어 배열로 복원 (받는 쪽 소유이므로 복사 후 연결 해제)
+
+소유권 규칙
+- 요청 버퍼: 보낸 쪽(HTTP 워커)이 응답을 받은 뒤 release()로 해제
+- 응답 버퍼: 받은 쪽(HTTP 워커)이 unpack(..., unlink=True)로 읽고 바로 해제
+"""
+
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, List
+
+import numpy as np
+
+# 이보다 작은 배열은 그냥 pickle (공유 메모리 생성 비용이 더 큼)
+MIN_SHARED_BYTES = 64 * 1024
+
+
+class SharedArray:
+    """공유 메모리에 올린 배열의 설명자 (pickle로 전송되는 부분)"""
+
+    __slots__ = ("name", "shape", "dtype")
+
+    def __init__(self, name: str, shape: tuple, dtype: str):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+    def __getstate__(self):
+        return (self.name, self.shape, self.dtype)
+
+    def __setstate__(self, state):
+        self.name, self.shape, self.dtype = state
+
+
+def _open(name: str = None, size: int = 0) -> shared_memory.SharedMemory:
+    """
+    공유 메모리 블록 생성(name=None) 또는 연결.
+    Python 3.11은 생성/연결할 때마다 resource_tracker에 등록하고, 프로세스 종료 시 등록된 블록을 지우며
+    (HTTP 워커와 모델 서버가 tracker를 공유하면 등록/해제 짝이 어긋나 경고가 남음)
+    수명은 위 소유권 규칙대로 직접 관리하므로 바로 등록을 취소합니다.
+    """
+    if name is None:
+        shm = shared_memory.SharedMemory(create=True, size=max(1, size))
+    else:
+        shm = shared_memory.SharedMemory(name=name)
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+def _unlink(shm: shared_memory.SharedMemory):
+    # unlink()는 내부에서 등록 취소를 다시 하므로 짝을 맞추기 위해 먼저 등록
+    resource_tracker.register(shm._name, "shared_memory")
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _share(array: np.ndarray, owned: List[shared_memory.SharedMemory]) -> SharedArray:
+    array = np.ascontiguousarray(array)
+    shm = _open(size=array.nbytes)
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    owned.append(shm)
+    return SharedArray(shm.name, array.shape, array.dtype.str)
+
+
+def pack(obj: Any, owned: List[shared_memory.SharedMemory]) -> Any:
+    """
+    obj 안의 큰 numpy 배열을 공유 메모리로 옮기고 설명자로 치환합니다.
+    Args:
+        owned (list): 생성한 SharedMemory가 추가됨 (전송 후 release()로 정리)
+    """
+    if isinstance(obj, np.ndarray) and obj.nbytes >= MIN_SHARED_BYTES:
+        return _share(obj, owned)
+    if isinstance(obj, list):
+        return [pack(item, owned) for item in obj]
+    if isinstance(obj, tuple):
+        return tuple(pack(item, owned) for item in obj)
+    if isinstance(obj, dict):
+        return {key: pack(value, owned) for key, value in obj.items()}
+    return obj
+
+
+def unpack(obj: Any, unlink: bool = False) -> Any:
+    """
+    설명자를 배열로 복원합니다. 블록 수명과 분리되도록 한 번 복사합니다
+    (SAM2 세션 캐시처럼 호출이 끝난 뒤에도 배열을 보관하는 경우가 있음).
+    Args:
+        unlink (bool): 읽은 뒤 블록을 삭제 (응답 버퍼를 받는 쪽)
+    """
+    if isinstance(obj, SharedArray):
+        shm = _open(obj.name)
+        try:
+            return np.ndarray(obj.shape, dtype=np.dtype(obj.dtype), buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            if unlink:
+                _unlink(shm)
+    if isinstance(obj, list):
+        return [unpack(item, unlink) for item in obj]
+    if isinstance(obj, tuple):
+        return tuple(unpack(item, unlink) for item in obj)
+    if isinstance(obj, dict):
+        return {key: unpack(value, unlink) for key, value in obj.items()}
+    return obj
+
+
+def release(owned: List[shared_memory.SharedMemory], unlink: bool = True):
+    """
+    pack()으로 만든 블록 정리
+    Args:
+        unlink (bool): False면 연결만 닫음 (응답 버퍼: 받는 쪽이 unpack에서 삭제)
+    """
+    for shm in owned:
+        shm.close()
+        if unlink:
+            _unlink(shm)
+    owned.clear()
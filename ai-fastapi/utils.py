@@ -1,96 +1,191 @@
 import cv2
 import numpy as np
 import base64
+import hashlib
+import io
+from PIL import Image
 
-def decode_image(file_bytes: bytes) -> np.ndarray:
+import image_encoder
+
+class ImageDecodeError(ValueError):
+    """디코딩 전에 거부된 이미지 (압축 폭탄, 과도한 해상도 등)"""
+
+
+# EXIF Orientation 태그 값 → OpenCV 변환
+_EXIF_TRANSFORMS = {
+    2: lambda img: cv2.flip(img, 1),
+    3: lambda img: cv2.rotate(img, cv2.ROTATE_180),
+    4: lambda img: cv2.flip(img, 0),
+    5: lambda img: cv2.transpose(img),
+    6: lambda img: cv2.rotate(img, cv2.ROTATE_90_CLOCKWISE),
+    7: lambda img: cv2.rotate(cv2.transpose(img), cv2.ROTATE_180),
+    8: lambda img: cv2.rotate(img, cv2.ROTATE_90_COUNTERCLOCKWISE),
+}
+
+# max_dim 허용 오차: 축소 디코딩은 max_dim보다 이 비율만큼 작아도 되고 (4032 / 2 = 2016 ≤ 2048),
+# 이 비율 이내로 큰 이미지는 리사이즈하지 않음 (전체 크기 리사이즈가 디코딩보다 비싸므로)
+DECODE_DIM_SLACK = 0.1
+
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def read_image_header(file_bytes: bytes):
+    """
+    픽셀을 디코딩하지 않고 헤더에서 크기와 EXIF 방향만 읽습니다.
+    Returns:
+        tuple: (width, height, orientation) 또는 형식을 알 수 없으면 None
+    """
+    try:
+        with Image.open(io.BytesIO(file_bytes)) as img:
+            width, height = img.size
+            orientation = img.getexif().get(0x0112, 1) if hasattr(img, "getexif") else 1
+            return width, height, orientation
+    except Image.DecompressionBombError as e:
+        raise ImageDecodeError(str(e))
+    except Exception:
+        return None
+
+
+def decode_image(file_bytes: bytes, max_dim: int = None, max_pixels: int = None) -> np.ndarray:
     """
     업로드된 이미지 바이트를 OpenCV 이미지(Numpy array)로 디코딩합니다.
+    max_dim이 주어지면 헤더의 해상도를 보고 JPEG 축소 디코딩(IMREAD_REDUCED_*)으로
+    필요한 크기에 가깝게 디코딩한 뒤 긴 변을 max_dim으로 맞춥니다.
+    (DECODE_DIM_SLACK 이내의 차이는 허용 - 원본 디코딩보다 느려지지 않도록 전체 크기 리사이즈를 피함)
     Args:
         file_bytes (bytes): 이미지 파일의 바이트 데이터
+        max_dim (int): 디코딩 결과의 최대 긴 변 (None이면 원본 해상도)
+        max_pixels (int): 픽셀 수 상한, 초과 시 ImageDecodeError
+            (헤더를 읽을 수 있으면 메모리 할당 전에, PIL이 모르는 형식은 디코딩 직후 검사)
     Returns:
-        np.ndarray: BGR 형식의 OpenCV 이미지
+        np.ndarray: BGR 형식의 OpenCV 이미지 (EXIF 방향 적용), 디코딩 실패 시 None
     """
     nparr = np.frombuffer(file_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    return img
+    header = read_image_header(file_bytes)
+    if header is None:
+        # PIL이 모르는 형식: OpenCV에 맡김 (EXIF 방향은 OpenCV가 적용)
+        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if img is None:
+            return None
+        _check_pixels(img.shape[1], img.shape[0], max_pixels)
+        return _limit_size(img, max_dim)
+
+    width, height, orientation = header
+    _check_pixels(width, height, max_pixels)
+
+    # 목표 크기(허용 오차 포함) 이상을 유지하는 가장 큰 축소 비율 선택
+    flags = cv2.IMREAD_COLOR
+    if max_dim is not None:
+        for factor, reduced_flag in _REDUCED_FLAGS:
+            if max(width, height) / factor >= max_dim * (1 - DECODE_DIM_SLACK):
+                flags = reduced_flag
+                break
+
+    img = cv2.imdecode(nparr, flags | cv2.IMREAD_IGNORE_ORIENTATION)
+    if img is None:
+        return None
+
+    # EXIF 방향은 축소된 이미지에 직접 적용 (저렴함)
+    transform = _EXIF_TRANSFORMS.get(orientation)
+    if transform is not None:
+        img = transform(img)
+
+    return _limit_size(img, max_dim)
+
+
+def _check_pixels(width: int, height: int, max_pixels: int):
+    if max_pixels is not None and width * height > max_pixels:
+        raise ImageDecodeError(
+            f"이미지 해상도가 너무 큽니다: {width}x{height} ({width * height} > {max_pixels} pixels)"
+        )
+
 
-def apply_mask_and_crop(image: np.ndarray, mask: np.ndarray, box: list) -> np.ndarray:
+def _limit_size(img: np.ndarray, max_dim: int) -> np.ndarray:
+    """긴 변이 max_dim을 허용 오차 이상 넘으면 비율을 유지하며 max_dim으로 축소"""
+    if max_dim is None:
+        return img
+    h, w = img.shape[:2]
+    if max(h, w) <= max_dim * (1 + DECODE_DIM_SLACK):
+        return img
+    scale = max_dim / max(h, w)
+    return cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+def content_hash(file_bytes: bytes) -> str:
+    """
+    업로드 바이트의 SHA-256 해시 (캐시 키로 사용)
+    """
+    return hashlib.sha256(file_bytes).hexdigest()
+
+def clip_box(box, width: int, height: int) -> tuple:
+    """
+    바운딩 박스 좌표를 정수로 변환하고 이미지 범위로 클리핑합니다.
+    Returns:
+        tuple: (x1, y1, x2, y2)
+    """
+    x1, y1, x2, y2 = map(int, box)
+    x1 = max(0, x1); y1 = max(0, y1)
+    x2 = min(width, x2); y2 = min(height, y2)
+    return x1, y1, x2, y2
+
+def crop_mask_to_box(mask: np.ndarray, image_shape: tuple, box: list, roi: bool = False) -> tuple:
+    """
+    마스크를 바운딩 박스 영역으로 맞춥니다. (apply_mask_and_crop / mask_codec 공통)
+    Args:
+        mask (np.ndarray): 전체 프레임 마스크 또는 박스 크기로 크롭된 마스크
+        image_shape (tuple): 원본 이미지 shape
+        box (list): [x1, y1, x2, y2] 바운딩 박스
+        roi (bool): True면 mask가 박스 크기로 크롭된 마스크 (predict_sam2 반환값),
+            False면 전체 프레임 마스크 (predict_sam2_with_points / refine_sam2_mask 반환값)
+    Returns:
+        tuple: (박스 영역 마스크, 이미지 범위로 클리핑된 (x1, y1, x2, y2))
+    """
+    h, w = image_shape[:2]
+    x1, y1, x2, y2 = clip_box(box, w, h)
+
+    if roi:
+        expected = (max(0, y2 - y1), max(0, x2 - x1))
+        if mask.shape[:2] != expected:
+            raise ValueError(f"박스 크기 마스크의 shape이 박스와 다릅니다: {mask.shape[:2]} != {expected}")
+        return mask, (x1, y1, x2, y2)
+    if mask.shape[:2] == (h, w):
+        # 전체 프레임 마스크: 박스 영역만 사용
+        return mask[y1:y2, x1:x2], (x1, y1, x2, y2)
+    # 해상도가 다른 전체 프레임 마스크 (드문 경우): 이미지 크기로 최근접 리사이즈 후 박스 영역 사용
+    resized = cv2.resize((mask > 0).astype(np.uint8), (w, h), interpolation=cv2.INTER_NEAREST)
+    return resized[y1:y2, x1:x2], (x1, y1, x2, y2)
+
+def apply_mask_and_crop(image: np.ndarray, mask: np.ndarray, box: list, roi: bool = False) -> np.ndarray:
     """
     이미지에 마스크를 적용하여 투명 배경을 만들고, 바운딩 박스 영역만큼 잘라냅니다.
+    이미지와 마스크를 먼저 박스 영역으로 자른 뒤 알파 채널을 만들므로
+    전체 프레임 크기의 BGRA 이미지를 할당하지 않습니다.
     Args:
         image (np.ndarray): 원본 이미지 (BGR)
-        mask (np.ndarray): 바이너리 마스크 (0 or 1, Shape: HxW)
+        mask (np.ndarray): 바이너리 마스크 (0 or 1, Shape: HxW 전체 프레임 또는 박스 크기로 크롭된 마스크)
         box (list): [x1, y1, x2, y2] 바운딩 박스
+        roi (bool): mask가 박스 크기로 크롭된 마스크인지 여부 (crop_mask_to_box 참고)
     Returns:
         np.ndarray: 투명 배경이 적용되고 크롭된 이미지 (BGRA)
     """
-    # 마스크 크기를 이미지 크기에 맞게 조정 (필요한 경우)
-    if mask.shape != image.shape[:2]:
-        mask = cv2.resize(mask, (image.shape[1], image.shape[0]), interpolation=cv2.INTER_NEAREST)
+    mask_roi, (x1, y1, x2, y2) = crop_mask_to_box(mask, image.shape, box, roi)
+    roi = image[y1:y2, x1:x2]
 
-    # BGRA 이미지 생성
-    b, g, r = cv2.split(image)
     # 마스크를 0~255 범위로 변환 (1 -> 255)
-    alpha = (mask * 255).astype(np.uint8)
-    
-    rgba = cv2.merge([b, g, r, alpha])
-    
-    # 바운딩 박스 좌표 정수 변환 및 클리핑
-    h, w = image.shape[:2]
-    x1, y1, x2, y2 = map(int, box)
-    x1 = max(0, x1); y1 = max(0, y1)
-    x2 = min(w, x2); y2 = min(h, y2)
-    
-    # 크롭
-    cropped = rgba[y1:y2, x1:x2]
-    return cropped
+    alpha = (mask_roi > 0).astype(np.uint8) * 255
+    return np.dstack([roi, alpha])
 
 def encode_image_to_base64(image: np.ndarray, max_size_bytes: int = 4 * 1024 * 1024) -> str:
     """
     OpenCV 이미지를 Base64 문자열로 인코딩합니다.
-    이미지가 max_size_bytes를 초과하면 리사이즈 및 압축합니다.
+    이미지가 max_size_bytes를 초과하면 리사이즈 및 압축합니다. (image_encoder 참고)
     Args:
         image (np.ndarray): 이미지 배열
         max_size_bytes (int): 최대 허용 바이트 (기본 4MB, Bedrock 5MB 제한에 여유)
     Returns:
         str: Base64 인코딩된 문자열
     """
-    # 먼저 PNG로 시도
-    _, buffer = cv2.imencode('.png', image)
-    
-    # 크기가 작으면 바로 반환
-    if len(buffer) <= max_size_bytes:
-        return base64.b64encode(buffer).decode('utf-8')
-    
-    # 이미지가 크면 리사이즈 및 JPEG 압축 적용
-    h, w = image.shape[:2]
-    
-    # 최대 1024px로 리사이즈
-    max_dim = 1024
-    if max(h, w) > max_dim:
-        scale = max_dim / max(h, w)
-        new_w, new_h = int(w * scale), int(h * scale)
-        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_AREA)
-    
-    # RGBA -> RGB 변환 (JPEG는 알파 채널 미지원)
-    if image.shape[-1] == 4:
-        # 알파 채널을 사용하여 흰 배경 합성
-        alpha = image[:, :, 3:4] / 255.0
-        rgb = image[:, :, :3]
-        white_bg = np.ones_like(rgb, dtype=np.uint8) * 255
-        image = (rgb * alpha + white_bg * (1 - alpha)).astype(np.uint8)
-    
-    # JPEG로 압축 (품질 조정)
-    quality = 85
-    while quality >= 30:
-        _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
-        if len(buffer) <= max_size_bytes:
-            return base64.b64encode(buffer).decode('utf-8')
-        quality -= 10
-    
-    # 여전히 크면 추가 리사이즈
-    h, w = image.shape[:2]
-    image = cv2.resize(image, (w // 2, h // 2), interpolation=cv2.INTER_AREA)
-    _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 70])
-    
-    return base64.b64encode(buffer).decode('utf-8')
+    return image_encoder.encode_image(image, max_size_bytes)